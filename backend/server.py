@@ -1,4 +1,4 @@
-from fastapi import FastAPI, APIRouter
+from fastapi import FastAPI, APIRouter, Request, Response
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
@@ -6,7 +6,7 @@ import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict
-from typing import List
+from typing import List, Optional
 import uuid
 from datetime import datetime, timezone
 
@@ -14,6 +14,32 @@ from datetime import datetime, timezone
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+# Customer segmentation artifacts
+SEGMENTATION_DIR = Path(os.environ.get('SEGMENTATION_DIR', '/app/customer_segmentation'))
+MODEL_PATH = SEGMENTATION_DIR / 'model' / 'kmeans_model.pkl'
+PREPROCESSOR_PATH = SEGMENTATION_DIR / 'model' / 'preprocessor.pkl'
+CLUSTERED_DATA_PATH = SEGMENTATION_DIR / 'data' / 'customers_clustered.parquet'
+CLUSTERED_CSV_PATH = SEGMENTATION_DIR / 'data' / 'customers_clustered.csv'
+DRIFT_REFERENCE_PATH = SEGMENTATION_DIR / 'model' / 'drift_reference.json'
+CUSTOMER_INDEX_PATH = SEGMENTATION_DIR / 'model' / 'customer_index'
+
+# Per-brand/region segmentations, one directory per model id; 'default' is
+# the model above
+MODEL_STORE_DIR = Path(os.environ.get('MODEL_STORE_DIR', SEGMENTATION_DIR / 'model_store'))
+MODEL_CACHE_BYTES = int(os.environ.get('MODEL_CACHE_BYTES', 256 * 2**20))
+DEFAULT_MODEL_ID = 'default'
+
+# Streaming drift monitor for scored requests, rebuilt when the training
+# pipeline writes a new reference
+_drift_monitor = None
+_drift_reference_mtime = None
+
+# Memory-mapped CustomerID -> cluster index, following retrains
+_customer_index = None
+
+# Byte-bounded LRU of loaded models, created on first use
+_model_store = None
+
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
 client = AsyncIOMotorClient(mongo_url)
@@ -67,6 +93,52 @@ async def get_status_checks():
     return status_checks
 
 
+def get_drift_monitor():
+    global _drift_monitor, _drift_reference_mtime
+    try:
+        mtime = os.stat(DRIFT_REFERENCE_PATH).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    if _drift_monitor is None or mtime != _drift_reference_mtime:
+        import sys
+        if str(SEGMENTATION_DIR) not in sys.path:
+            sys.path.append(str(SEGMENTATION_DIR))
+        from src.monitoring import DriftMonitor
+        _drift_monitor = DriftMonitor.load(str(DRIFT_REFERENCE_PATH))
+        _drift_reference_mtime = mtime
+    return _drift_monitor
+
+
+def get_model_store():
+    global _model_store
+    if _model_store is None:
+        import sys
+        if str(SEGMENTATION_DIR) not in sys.path:
+            sys.path.append(str(SEGMENTATION_DIR))
+        from src.model_store import ModelStore
+        _model_store = ModelStore(str(MODEL_STORE_DIR), max_bytes=MODEL_CACHE_BYTES, default_paths={
+            'model': str(MODEL_PATH),
+            'preprocessor': str(PREPROCESSOR_PATH),
+            'clustered_parquet': str(CLUSTERED_DATA_PATH),
+            'clustered_csv': str(CLUSTERED_CSV_PATH),
+        })
+    return _model_store
+
+
+def get_customer_index():
+    global _customer_index
+    if _customer_index is None:
+        import sys
+        if str(SEGMENTATION_DIR) not in sys.path:
+            sys.path.append(str(SEGMENTATION_DIR))
+        from src.customer_index import CustomerIndexReader
+        _customer_index = CustomerIndexReader(str(CUSTOMER_INDEX_PATH))
+    try:
+        return _customer_index.current()
+    except FileNotFoundError:
+        return None
+
+
 # Customer Segmentation Models
 class CustomerInput(BaseModel):
     age: int = Field(..., ge=18, le=100)
@@ -82,69 +154,311 @@ class ClusterPrediction(BaseModel):
     cluster: int
     cluster_size: int
     cluster_characteristics: dict
+    # Set by two-level models: the sub-cluster within `cluster`
+    sub_cluster: Optional[int] = None
 
+# CustomerInput field -> training column, for columnar batches
+INPUT_COLUMNS = {
+    'age': 'Age',
+    'gender': 'Gender',
+    'income': 'Income',
+    'spending_score': 'SpendingScore',
+    'region': 'Region',
+    'purchase_frequency': 'PurchaseFrequency',
+    'avg_order_value': 'AvgOrderValue',
+    'recency': 'Recency',
+}
+ARROW_STREAM_MEDIA_TYPE = 'application/vnd.apache.arrow.stream'
+BATCH_ERROR_ROWS = 5
 
-@api_router.post("/predict_cluster", response_model=ClusterPrediction)
-async def predict_customer_cluster(customer: CustomerInput):
+class CustomerCluster(BaseModel):
+    customer_id: str
+    cluster: int
+    distance: float
+    indexed_at: str
+
+
+def _score_customer(customer, entry, monitor):
     """
-    Predict which cluster a customer belongs to based on their attributes
+    Preprocess and predict one customer and profile its cluster from the
+    stored partition. Blocking; called from a worker thread.
     """
-    try:
-        import sys
-        sys.path.append('/app/customer_segmentation')
-        
-        import pandas as pd
-        import joblib
-        from src.clustering_model import CustomerSegmentation
-        
-        # Load models
-        model = CustomerSegmentation.load_model('/app/customer_segmentation/model/kmeans_model.pkl')
-        preprocessor = joblib.load('/app/customer_segmentation/model/preprocessor.pkl')
-        
-        # Calculate total spend
-        total_spend = customer.purchase_frequency * customer.avg_order_value
-        
-        # Create dataframe
-        customer_data = pd.DataFrame({
-            'Age': [customer.age],
-            'Gender': [customer.gender],
-            'Income': [customer.income],
-            'SpendingScore': [customer.spending_score],
-            'Region': [customer.region],
-            'PurchaseFrequency': [customer.purchase_frequency],
-            'AvgOrderValue': [customer.avg_order_value],
-            'Recency': [customer.recency],
-            'TotalSpend': [total_spend]
-        })
-        
-        # Preprocess
-        customer_processed = preprocessor.preprocess(customer_data, remove_outliers=False, fit=False)
-        
-        # Predict
+    import pandas as pd
+    from src.data_store import read_clustered_dataset
+    
+    model = entry.model
+    preprocessor = entry.preprocessor
+    
+    # Create dataframe (derived features such as TotalSpend come from
+    # the preprocessor's registry)
+    record = {
+        'Age': customer.age,
+        'Gender': customer.gender,
+        'Income': customer.income,
+        'SpendingScore': customer.spending_score,
+        'Region': customer.region,
+        'PurchaseFrequency': customer.purchase_frequency,
+        'AvgOrderValue': customer.avg_order_value,
+        'Recency': customer.recency,
+    }
+    record = preprocessor.add_derived_features(record)
+    customer_data = pd.DataFrame([record])
+    
+    # Preprocess
+    customer_processed = preprocessor.preprocess(customer_data, remove_outliers=False, fit=False)
+    
+    # Predict (two-level models also pick a sub-cluster within the cluster)
+    sub_cluster = None
+    if getattr(model, 'sub_models', None) is not None:
+        clusters, sub_clusters = model.predict_hierarchy(customer_processed)
+        cluster, sub_cluster = int(clusters[0]), int(sub_clusters[0])
+    else:
         cluster = int(model.predict(customer_processed)[0])
-        
-        # Load reference data for cluster info
-        df_ref = pd.read_csv('/app/customer_segmentation/data/customers_clustered.csv')
-        cluster_data = df_ref[df_ref['Cluster'] == cluster]
-        
-        cluster_chars = {
-            'avg_income': float(cluster_data['Income'].mean()),
-            'avg_spending_score': float(cluster_data['SpendingScore'].mean()),
-            'avg_total_spend': float(cluster_data['TotalSpend'].mean()),
-            'avg_purchase_frequency': float(cluster_data['PurchaseFrequency'].mean()),
-            'avg_recency': float(cluster_data['Recency'].mean())
-        }
-        
-        return ClusterPrediction(
-            cluster=cluster,
-            cluster_size=len(cluster_data),
-            cluster_characteristics=cluster_chars
+    
+    # Add the request to the drift sketches
+    if monitor is not None:
+        offset = customer_processed.to_numpy(dtype=float)[0] - model.get_cluster_centers()[cluster]
+        monitor.update(record, cluster=cluster, distance=float((offset @ offset) ** 0.5))
+    
+    # Load reference data for cluster info (only this cluster's partition);
+    # models shipped without their clustered data report no profile
+    try:
+        cluster_data = read_clustered_dataset(
+            entry.paths['clustered_parquet'],
+            clusters=[cluster],
+            columns=['Income', 'SpendingScore', 'TotalSpend', 'PurchaseFrequency', 'Recency'],
+            csv_path=entry.paths['clustered_csv']
         )
-        
+    except FileNotFoundError:
+        return ClusterPrediction(cluster=cluster, cluster_size=0, cluster_characteristics={},
+                                 sub_cluster=sub_cluster)
+    
+    cluster_chars = {
+        'avg_income': float(cluster_data['Income'].mean()),
+        'avg_spending_score': float(cluster_data['SpendingScore'].mean()),
+        'avg_total_spend': float(cluster_data['TotalSpend'].mean()),
+        'avg_purchase_frequency': float(cluster_data['PurchaseFrequency'].mean()),
+        'avg_recency': float(cluster_data['Recency'].mean())
+    }
+    
+    return ClusterPrediction(
+        cluster=cluster,
+        cluster_size=len(cluster_data),
+        cluster_characteristics=cluster_chars,
+        sub_cluster=sub_cluster
+    )
+
+
+async def _predict_cluster(customer, model_id):
+    from fastapi import HTTPException
+    from starlette.concurrency import run_in_threadpool
+    store = get_model_store()
+    try:
+        # Cold loads block, so they run off the event loop; concurrent
+        # requests for the same model wait on one load
+        entry = await run_in_threadpool(store.get, model_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Model {model_id} not found")
+
+    # The drift reference describes the default model's training data
+    monitor = get_drift_monitor() if model_id == DEFAULT_MODEL_ID else None
+    try:
+        # Preprocessing, prediction and the partition read all block
+        return await run_in_threadpool(_score_customer, customer, entry, monitor)
     except Exception as e:
-        from fastapi import HTTPException
         raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
 
+@api_router.post("/predict_cluster", response_model=ClusterPrediction)
+async def predict_customer_cluster(customer: CustomerInput):
+    """
+    Predict which cluster a customer belongs to based on their attributes
+    """
+    return await _predict_cluster(customer, DEFAULT_MODEL_ID)
+
+@api_router.post("/models/{model_id}/predict_cluster", response_model=ClusterPrediction)
+async def predict_customer_cluster_with_model(model_id: str, customer: CustomerInput):
+    """
+    Predict a customer's cluster with a model from the model store
+    """
+    return await _predict_cluster(customer, model_id)
+
+def validate_input_table(table):
+    """
+    CustomerInput validation for a whole Arrow table at once: the same
+    required columns, types and bounds (read from the model's field
+    constraints), checked with vectorized compute kernels. Returns one
+    error per failing column, with the number and first positions of the
+    offending rows; an empty list means the batch is valid.
+    """
+    import numpy as np
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    violations = {'ge': pc.less, 'gt': pc.less_equal, 'le': pc.greater, 'lt': pc.greater_equal}
+    errors = []
+    for name, field in CustomerInput.model_fields.items():
+        if name not in table.column_names:
+            errors.append({'column': name, 'error': 'missing column'})
+            continue
+        column = table[name]
+        kind = column.type.value_type if pa.types.is_dictionary(column.type) else column.type
+        if field.annotation is str:
+            if not (pa.types.is_string(kind) or pa.types.is_large_string(kind)):
+                errors.append({'column': name, 'error': f"expected strings, got {column.type}"})
+                continue
+            bad = column.is_null()
+        else:
+            if not (pa.types.is_integer(kind) or pa.types.is_floating(kind)):
+                errors.append({'column': name, 'error': f"expected numbers, got {column.type}"})
+                continue
+            bad = column.is_null()
+            if pa.types.is_floating(kind):
+                # NaN fails every bound, and ints only accept whole floats
+                bad = pc.or_kleene(bad, pc.is_nan(column))
+                if field.annotation is int:
+                    bad = pc.or_kleene(bad, pc.not_equal(column, pc.floor(column)))
+            for constraint in field.metadata:
+                for attr, violates in violations.items():
+                    bound = getattr(constraint, attr, None)
+                    if bound is not None:
+                        bad = pc.or_kleene(bad, violates(column, bound))
+        rows = np.flatnonzero(pc.fill_null(bad, True).to_numpy(zero_copy_only=False))
+        if len(rows):
+            errors.append({'column': name, 'error': 'invalid or missing values', 'rows': len(rows),
+                           'first_rows': rows[:BATCH_ERROR_ROWS].tolist()})
+    return errors
+
+
+def _score_batch(body, entry, monitor):
+    """
+    Arrow IPC stream or Parquet bytes in, Arrow IPC stream bytes out
+    """
+    import io
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+    from fastapi import HTTPException
+    try:
+        if body[:4] == b'PAR1':
+            table = pq.read_table(io.BytesIO(body))
+        else:
+            table = pa.ipc.open_stream(body).read_all()
+    except (pa.ArrowInvalid, OSError) as e:
+        raise HTTPException(status_code=400, detail=f"Body is not an Arrow IPC stream or Parquet file: {e}")
+    errors = validate_input_table(table)
+    if errors:
+        raise HTTPException(status_code=422, detail=errors)
+
+    # String columns go over as pandas categoricals, so no Python object
+    # is created per row
+    columns = {}
+    for name, column in INPUT_COLUMNS.items():
+        values = table[name]
+        if CustomerInput.model_fields[name].annotation is str and not pa.types.is_dictionary(values.type):
+            values = pc.dictionary_encode(values)
+        columns[column] = values
+    df = entry.preprocessor.add_derived_features(pa.table(columns).to_pandas())
+
+    compiled = entry.compiled
+    try:
+        X = compiled.transform(df)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    labels, distances = compiled.score_matrix(X)
+    if monitor is not None:
+        monitor.update_batch(df, labels, distances)
+
+    result = {}
+    if 'customer_id' in table.column_names:
+        result['customer_id'] = table['customer_id']
+    result['cluster'] = pa.array(labels)
+    result['distance'] = pa.array(distances)
+    if getattr(entry.model, 'sub_models', None) is not None:
+        # Sub-clusters within the parents the compiled model already chose
+        result['sub_cluster'] = pa.array(entry.model.predict_hierarchy(X, parents=labels)[1])
+    result = pa.table(result)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, result.schema) as writer:
+        writer.write_table(result)
+    return sink.getvalue().to_pybytes()
+
+
+async def _predict_batch(request, model_id):
+    from fastapi import HTTPException
+    from starlette.concurrency import run_in_threadpool
+    store = get_model_store()
+    try:
+        entry = await run_in_threadpool(store.get, model_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Model {model_id} not found")
+    body = await request.body()
+    monitor = get_drift_monitor() if model_id == DEFAULT_MODEL_ID else None
+    content = await run_in_threadpool(_score_batch, body, entry, monitor)
+    return Response(content=content, media_type=ARROW_STREAM_MEDIA_TYPE)
+
+@api_router.post("/predict_batch")
+async def predict_batch(request: Request):
+    """
+    Score a columnar batch: the body is an Arrow IPC stream (or a Parquet
+    file) with the CustomerInput columns, and the response an Arrow IPC
+    stream with cluster and distance per row (plus customer_id when sent)
+    """
+    return await _predict_batch(request, DEFAULT_MODEL_ID)
+
+@api_router.post("/models/{model_id}/predict_batch")
+async def predict_batch_with_model(model_id: str, request: Request):
+    """
+    Columnar batch scoring with a model from the model store
+    """
+    return await _predict_batch(request, model_id)
+
+@api_router.get("/models")
+async def list_models():
+    """
+    Available model ids, with cache residency and load latency per model
+    """
+    store = get_model_store()
+    return dict(store.stats(), available=store.list_models())
+
+@api_router.get("/customers/{customer_id}/cluster", response_model=CustomerCluster)
+async def get_customer_cluster(customer_id: str):
+    """
+    Cluster of a known customer, looked up in the index built at training time
+    """
+    from fastapi import HTTPException
+    index = get_customer_index()
+    if index is None:
+        raise HTTPException(status_code=503, detail="No customer index found. Run the training pipeline.")
+    found = index.lookup(customer_id)
+    if found is None:
+        raise HTTPException(status_code=404, detail=f"Customer {customer_id} not found")
+    cluster, distance = found
+    return CustomerCluster(customer_id=customer_id, cluster=cluster, distance=distance,
+                           indexed_at=index.meta['created_at'])
+
+@api_router.get("/drift")
+async def get_drift():
+    """
+    Drift of the inputs, cluster frequencies and distance-to-centroid seen
+    since startup (or the last reset) against the training reference
+    """
+    from fastapi import HTTPException
+    monitor = get_drift_monitor()
+    if monitor is None:
+        raise HTTPException(status_code=404, detail="No drift reference found. Run the training pipeline.")
+    return monitor.report()
+
+@api_router.post("/drift/reset")
+async def reset_drift():
+    """
+    Start a new monitoring window
+    """
+    from fastapi import HTTPException
+    monitor = get_drift_monitor()
+    if monitor is None:
+        raise HTTPException(status_code=404, detail="No drift reference found. Run the training pipeline.")
+    monitor.reset()
+    return {'since': monitor.since}
+
 # Include the router in the main app
 app.include_router(api_router)
 
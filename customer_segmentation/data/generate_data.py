@@ -1,59 +1,91 @@
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
+import argparse
 import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
 
-np.random.seed(42)
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(DATA_DIR)
+if PROJECT_DIR not in sys.path:
+    sys.path.append(PROJECT_DIR)
 
-def generate_customer_data(n_customers=1000):
+from src.features import derive_features
+
+DEFAULT_SEED = 42
+DEFAULT_BLOCK_ROWS = 100_000
+MISSING_COLUMNS = ('Age', 'Income', 'SpendingScore')
+
+GENDERS = np.array(['Male', 'Female', 'Other'])
+REGIONS = np.array(['North', 'South', 'East', 'West', 'Central'])
+
+
+def _segment_centers(n_segments, seed):
+    """
+    Latent segment centres (age, income, spending score), shared by every
+    block so that all shards describe the same cluster structure
+    """
+    rng = np.random.default_rng([seed, n_segments, 0x5E6])
+    return np.column_stack([
+        rng.uniform(22, 70, n_segments),
+        rng.uniform(25000, 130000, n_segments),
+        rng.uniform(10, 95, n_segments)
+    ])
+
+
+def generate_customer_data(n_customers=1000, seed=DEFAULT_SEED, start_id=1, missing_rate=0.02,
+                           n_segments=None, cluster_spread=1.0, rng=None, id_width=5):
     """
     Generate synthetic customer data for segmentation
+
+    Without n_segments, spending behaviour follows income bands as before;
+    with n_segments, customers are drawn around that many latent segment
+    centres whose spread is scaled by cluster_spread. missing_rate is the
+    share of Age/Income/SpendingScore values blanked out.
     """
+    if rng is None:
+        rng = np.random.default_rng(seed)
+    n = n_customers
+
     # Customer IDs
-    customer_ids = [f"CUST_{str(i).zfill(5)}" for i in range(1, n_customers + 1)]
-    
-    # Demographics
-    ages = np.random.normal(40, 15, n_customers).astype(int)
-    ages = np.clip(ages, 18, 80)
-    
-    genders = np.random.choice(['Male', 'Female', 'Other'], n_customers, p=[0.48, 0.48, 0.04])
-    
-    # Income (correlated with age)
-    base_income = np.random.normal(50000, 20000, n_customers)
-    age_factor = (ages - 18) / 62  # Normalize age
-    income = base_income + (age_factor * 30000) + np.random.normal(0, 5000, n_customers)
-    income = np.clip(income, 20000, 150000).astype(int)
-    
-    # Spending Score (1-100, inversely correlated with some income groups)
-    spending_score = np.zeros(n_customers)
-    for i in range(n_customers):
-        if income[i] < 40000:
-            spending_score[i] = np.random.normal(35, 15)
-        elif income[i] < 70000:
-            spending_score[i] = np.random.normal(50, 20)
-        else:
-            spending_score[i] = np.random.normal(75, 15)
+    ids = np.arange(start_id, start_id + n).astype(str)
+    customer_ids = np.char.add('CUST_', np.char.zfill(ids, id_width))
+
+    genders = GENDERS[rng.choice(3, n, p=[0.48, 0.48, 0.04])]
+    regions = REGIONS[rng.integers(0, len(REGIONS), n)]
+
+    if n_segments is None:
+        # Demographics
+        ages = np.clip(rng.normal(40, 15, n).astype(int), 18, 80)
+
+        # Income (correlated with age)
+        age_factor = (ages - 18) / 62
+        income = rng.normal(50000, 20000, n) + (age_factor * 30000) + rng.normal(0, 5000, n)
+        income = np.clip(income, 20000, 150000).astype(int)
+
+        # Spending Score (1-100) by income band
+        band_mean = np.select([income < 40000, income < 70000], [35, 50], default=75)
+        band_std = np.select([income < 40000, income < 70000], [15, 20], default=15)
+        spending_score = rng.normal(band_mean, band_std)
+    else:
+        centers = _segment_centers(n_segments, seed)
+        segment = rng.integers(0, n_segments, n)
+        ages = np.clip(rng.normal(centers[segment, 0], 5 * cluster_spread).astype(int), 18, 80)
+        income = rng.normal(centers[segment, 1], 8000 * cluster_spread)
+        income = np.clip(income, 20000, 150000).astype(int)
+        spending_score = rng.normal(centers[segment, 2], 7 * cluster_spread)
     spending_score = np.clip(spending_score, 1, 100).astype(int)
-    
-    # Region
-    regions = np.random.choice(['North', 'South', 'East', 'West', 'Central'], n_customers)
-    
+
     # Purchase Frequency (per year)
-    purchase_frequency = np.random.poisson(spending_score / 5, n_customers)
-    purchase_frequency = np.clip(purchase_frequency, 1, 50)
-    
+    purchase_frequency = np.clip(rng.poisson(spending_score / 5), 1, 50)
+
     # Average Order Value
-    aov = income / 100 + np.random.normal(0, 50, n_customers)
-    aov = np.clip(aov, 50, 2000).astype(int)
-    
+    aov = np.clip(income / 100 + rng.normal(0, 50, n), 50, 2000).astype(int)
+
     # Recency (days since last purchase)
-    recency = np.random.exponential(30, n_customers).astype(int)
-    recency = np.clip(recency, 1, 365)
-    
-    # Total Spend (derived feature)
-    total_spend = (purchase_frequency * aov).astype(int)
-    
-    # Create DataFrame
+    recency = np.clip(rng.exponential(30, n).astype(int), 1, 365)
+
     df = pd.DataFrame({
         'CustomerID': customer_ids,
         'Age': ages,
@@ -64,28 +96,144 @@ def generate_customer_data(n_customers=1000):
         'PurchaseFrequency': purchase_frequency,
         'AvgOrderValue': aov,
         'Recency': recency,
-        'TotalSpend': total_spend
     })
-    
-    # Add some missing values randomly (2-3%)
-    for col in ['Age', 'Income', 'SpendingScore']:
-        missing_idx = np.random.choice(df.index, size=int(len(df) * 0.02), replace=False)
-        df.loc[missing_idx, col] = np.nan
-    
+    # Derived features (TotalSpend), from the same registry the model uses
+    df = df.assign(**derive_features(df))
+
+    # Blank out a share of values at random
+    for col in MISSING_COLUMNS:
+        mask = rng.random(n) < missing_rate
+        df[col] = df[col].astype(float)
+        df.loc[mask, col] = np.nan
+
     return df
 
+
+def generate_block(block_index, n_rows, seed=DEFAULT_SEED, block_rows=DEFAULT_BLOCK_ROWS,
+                   id_width=8, **kwargs):
+    """
+    Generate one fixed-size block. Each block has its own seed derived from
+    (seed, block_index), so the dataset depends only on seed, total rows and
+    block_rows, not on how blocks are grouped into shards or workers.
+    """
+    rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(block_index,)))
+    return generate_customer_data(n_rows, seed=seed, start_id=block_index * block_rows + 1,
+                                  rng=rng, id_width=id_width, **kwargs)
+
+
+def write_shard(path, blocks, seed=DEFAULT_SEED, block_rows=DEFAULT_BLOCK_ROWS, file_format='csv',
+                id_width=8, **kwargs):
+    """
+    Stream a list of (block_index, n_rows) blocks to a single CSV or Parquet
+    file, holding one block in memory at a time
+    """
+    rows = 0
+    writer = None
+    try:
+        for block_index, n_rows in blocks:
+            df = generate_block(block_index, n_rows, seed=seed, block_rows=block_rows,
+                                id_width=id_width, **kwargs)
+            if file_format == 'parquet':
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema, compression='snappy')
+                writer.write_table(table)
+            else:
+                df.to_csv(path, mode='w' if rows == 0 else 'a', header=rows == 0, index=False)
+            rows += len(df)
+    finally:
+        if writer is not None:
+            writer.close()
+    return path, rows
+
+
+def _write_shard_task(args):
+    path, blocks, options = args
+    return write_shard(path, blocks, **options)
+
+
+def plan_shards(n_rows, n_shards, block_rows=DEFAULT_BLOCK_ROWS):
+    """
+    Split n_rows into blocks of block_rows and deal contiguous runs of
+    blocks to n_shards shards
+    """
+    n_blocks = max(1, -(-n_rows // block_rows))
+    blocks = [(i, min(block_rows, n_rows - i * block_rows)) for i in range(n_blocks)]
+    n_shards = max(1, min(n_shards, n_blocks))
+    bounds = np.linspace(0, n_blocks, n_shards + 1).astype(int)
+    return [blocks[bounds[s]:bounds[s + 1]] for s in range(n_shards)]
+
+
+def generate_dataset(n_rows, output_dir=DATA_DIR, n_shards=1, workers=None, file_format='csv',
+                     prefix='customers', seed=DEFAULT_SEED, block_rows=DEFAULT_BLOCK_ROWS, **kwargs):
+    """
+    Generate n_rows customers as one or more shard files, in parallel
+    worker processes. Returns the list of (path, rows) written.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    shards = plan_shards(n_rows, n_shards, block_rows)
+    extension = 'parquet' if file_format == 'parquet' else 'csv'
+    options = dict(seed=seed, block_rows=block_rows, file_format=file_format,
+                   id_width=max(5, len(str(n_rows))), **kwargs)
+
+    tasks = []
+    for shard_index, blocks in enumerate(shards):
+        if len(shards) == 1:
+            name = f"{prefix}.{extension}"
+        else:
+            name = f"{prefix}-{shard_index:05d}-of-{len(shards):05d}.{extension}"
+        tasks.append((os.path.join(output_dir, name), blocks, options))
+
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    if workers <= 1:
+        return [_write_shard_task(task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_write_shard_task, tasks))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic customer data")
+    parser.add_argument('--rows', type=int, default=1000, help="Number of customers to generate")
+    parser.add_argument('--shards', type=int, default=1, help="Number of output files")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv', dest='file_format')
+    parser.add_argument('--output-dir', default=DATA_DIR)
+    parser.add_argument('--prefix', default='customers', help="Output file name prefix")
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--block-rows', type=int, default=DEFAULT_BLOCK_ROWS,
+                        help="Rows generated per seeded block (held in memory at once)")
+    parser.add_argument('--missing-rate', type=float, default=0.02,
+                        help="Share of Age/Income/SpendingScore values left missing")
+    parser.add_argument('--segments', type=int, default=None,
+                        help="Draw customers around this many latent segments")
+    parser.add_argument('--cluster-spread', type=float, default=1.0,
+                        help="Spread of customers around their segment centre")
+    return parser.parse_args(argv)
+
+
 if __name__ == "__main__":
-    # Generate data
-    df = generate_customer_data(1000)
-    
-    # Create data directory if it doesn't exist
-    os.makedirs('/app/customer_segmentation/data', exist_ok=True)
-    
-    # Save to CSV
-    output_path = '/app/customer_segmentation/data/customers.csv'
-    df.to_csv(output_path, index=False)
-    print(f"Dataset generated and saved to {output_path}")
-    print(f"Shape: {df.shape}")
-    print(f"\nFirst few rows:\n{df.head()}")
-    print(f"\nData Info:")
-    print(df.info())
+    args = parse_args()
+
+    start = time.perf_counter()
+    written = generate_dataset(
+        args.rows,
+        output_dir=args.output_dir,
+        n_shards=args.shards,
+        workers=args.workers,
+        file_format=args.file_format,
+        prefix=args.prefix,
+        seed=args.seed,
+        block_rows=args.block_rows,
+        missing_rate=args.missing_rate,
+        n_segments=args.segments,
+        cluster_spread=args.cluster_spread
+    )
+    elapsed = time.perf_counter() - start
+
+    total_rows = sum(rows for _, rows in written)
+    for path, rows in written:
+        print(f"  {path}: {rows:,} rows")
+    print(f"Dataset generated: {total_rows:,} rows in {len(written)} file(s), "
+          f"{elapsed:.1f}s ({total_rows / elapsed:,.0f} rows/sec)")
@@ -0,0 +1,313 @@
+import os
+import time
+import tempfile
+import numpy as np
+import pandas as pd
+
+from src.features import DERIVED_FEATURES, derive_features, input_columns, required_features
+
+
+def prepare_features(df, preprocessor):
+    """
+    Add the preprocessor's derived features and keep only the columns it
+    was fitted on (plus CustomerID)
+    """
+    df = preprocessor.add_derived_features(df)
+
+    if preprocessor.feature_columns is None:
+        return df
+    columns = list(preprocessor.feature_columns)
+    if 'CustomerID' in df.columns:
+        columns = ['CustomerID'] + columns
+    return df[columns]
+
+
+def score_chunk(df, model, preprocessor):
+    """
+    Preprocess one chunk of raw customer rows and return the predicted
+    clusters with each row's distance to its cluster centre
+    """
+    processed = preprocessor.preprocess(prepare_features(df, preprocessor),
+                                        remove_outliers=False, fit=False)
+    if 'CustomerID' in processed.columns:
+        processed = processed.drop('CustomerID', axis=1)
+    labels = model.predict(processed)
+    X = processed.to_numpy(dtype=np.float64)
+    distances = np.sqrt(((X - model.get_cluster_centers()[labels]) ** 2).sum(axis=1))
+    return labels, distances
+
+
+def predict_chunk(df, model, preprocessor):
+    """
+    Preprocess and predict one chunk of raw customer rows
+    """
+    return score_chunk(df, model, preprocessor)[0]
+
+
+def score_chunks(chunks, model, preprocessor, output_path, preview_rows=100,
+                 progress_callback=None, monitor=None):
+    """
+    Score an iterable of DataFrame chunks and append the results to a CSV.
+
+    Only a preview of the first rows and the running cluster counts are kept
+    in memory. progress_callback(rows_done, elapsed_seconds) is called after
+    each chunk. When a DriftMonitor is given, every chunk is added to it and
+    its report is returned under 'drift'.
+    """
+    start = time.perf_counter()
+    rows = 0
+    cluster_counts = np.zeros(0, dtype=np.int64)
+    preview = []
+    preview_len = 0
+
+    with open(output_path, 'w', newline='') as out:
+        for chunk in chunks:
+            labels, distances = score_chunk(chunk, model, preprocessor)
+            if monitor is not None:
+                monitor.update_batch(chunk, labels, distances)
+            chunk['Cluster'] = labels
+            chunk.to_csv(out, index=False, header=rows == 0)
+
+            counts = np.bincount(labels)
+            if len(counts) > len(cluster_counts):
+                cluster_counts = np.pad(cluster_counts, (0, len(counts) - len(cluster_counts)))
+            cluster_counts[:len(counts)] += counts
+
+            if preview_len < preview_rows:
+                preview.append(chunk.head(preview_rows - preview_len))
+                preview_len += len(preview[-1])
+
+            rows += len(chunk)
+            if progress_callback is not None:
+                progress_callback(rows, time.perf_counter() - start)
+
+    elapsed = time.perf_counter() - start
+    return {
+        'output_path': output_path,
+        'rows': rows,
+        'cluster_counts': {i: int(c) for i, c in enumerate(cluster_counts) if c > 0},
+        'preview': pd.concat(preview, ignore_index=True) if preview else pd.DataFrame(),
+        'elapsed': elapsed,
+        'rows_per_sec': rows / elapsed if elapsed > 0 else 0.0,
+        'drift': monitor.report() if monitor is not None else None
+    }
+
+
+def score_csv(source, model, preprocessor, output_path=None, chunksize=50000,
+              preview_rows=100, progress_callback=None, monitor=None):
+    """
+    Stream a CSV (path or file object) through preprocess/predict in chunks.
+
+    Results are written to output_path, or to a temporary file when it is
+    not given. progress_callback(rows_done, elapsed_seconds, fraction) gets
+    the share of the input consumed so far when the source size is known.
+    """
+    if output_path is None:
+        fd, output_path = tempfile.mkstemp(prefix='customer_predictions_', suffix='.csv')
+        os.close(fd)
+
+    total_bytes = None
+    if hasattr(source, 'seek') and hasattr(source, 'tell'):
+        source.seek(0, os.SEEK_END)
+        total_bytes = source.tell()
+        source.seek(0)
+    elif isinstance(source, (str, os.PathLike)):
+        total_bytes = os.path.getsize(source)
+
+    reader = pd.read_csv(source, chunksize=chunksize)
+
+    def report(rows, elapsed):
+        if progress_callback is None:
+            return
+        fraction = None
+        if total_bytes and hasattr(source, 'tell'):
+            fraction = min(source.tell() / total_bytes, 1.0)
+        progress_callback(rows, elapsed, fraction)
+
+    with reader:
+        return score_chunks(reader, model, preprocessor, output_path,
+                            preview_rows=preview_rows, progress_callback=report, monitor=monitor)
+
+
+class CompiledModel:
+    """
+    The fitted DataPreprocessor and K-Means parameters flattened into NumPy
+    arrays: imputation fill values, label-encoder classes, scaler mean/scale
+    and cluster centres. Raw rows are scored with a few vectorized operations
+    and no scikit-learn calls, and the numeric parameters can be packed into
+    a single shared-memory block for worker processes.
+
+    Scoring matches preprocess(remove_outliers=False, fit=False) followed by
+    predict, except that numeric columns without a fitted imputer are filled
+    with the training mean instead of the batch median.
+    """
+    def __init__(self, columns, categories, fill_values, mean, scale, centers,
+                 derived_features=DERIVED_FEATURES):
+        self.columns = list(columns)
+        self.derived_features = required_features(self.columns, derived_features)
+        self.categories = categories
+        self.fill_values = fill_values
+        self.mean = mean
+        self.scale = scale
+        self.centers = centers
+        self.center_norms = np.einsum('ij,ij->i', centers, centers)
+
+    @classmethod
+    def from_artifacts(cls, preprocessor, segmentation):
+        """
+        Build from a fitted DataPreprocessor and a CustomerSegmentation (or
+        a fitted KMeans)
+        """
+        if preprocessor.feature_columns is None:
+            raise ValueError("Preprocessor is not fitted.")
+        kmeans = getattr(segmentation, 'model', segmentation)
+        if kmeans is None:
+            raise ValueError("Model not trained yet.")
+
+        columns = [c for c in preprocessor.feature_columns if c != 'CustomerID']
+        categories = {col: np.asarray(encoder.classes_).astype(str)
+                      for col, encoder in preprocessor.label_encoders.items() if col in columns}
+        scaler = preprocessor.scaler
+        mean = np.asarray(scaler.mean_, dtype=np.float64)
+        scale = np.asarray(scaler.scale_ if scaler.scale_ is not None else np.ones_like(mean),
+                           dtype=np.float64)
+
+        fill_values = mean.copy()
+        for j, col in enumerate(columns):
+            imputer = preprocessor.imputers.get(col)
+            if col in categories:
+                fill_values[j] = np.nan
+                if imputer is not None:
+                    fill = str(imputer.statistics_[0])
+                    fill_values[j] = int(np.searchsorted(categories[col], fill))
+            elif imputer is not None:
+                fill_values[j] = float(imputer.statistics_[0])
+
+        centers = np.asarray(kmeans.cluster_centers_, dtype=np.float64)
+        return cls(columns, categories, fill_values, mean, scale, centers,
+                   getattr(preprocessor, 'derived_features', DERIVED_FEATURES))
+
+    @classmethod
+    def load(cls, model_path, preprocessor_path):
+        import joblib
+        from src.clustering_model import CustomerSegmentation
+        return cls.from_artifacts(joblib.load(preprocessor_path),
+                                  CustomerSegmentation.load_model(model_path))
+
+    @property
+    def n_clusters(self):
+        return len(self.centers)
+
+    @property
+    def input_columns(self):
+        """
+        Raw input columns scoring reads, derived-feature inputs included
+        """
+        return input_columns(self.columns, self.derived_features)
+
+    def add_derived_features(self, df):
+        """
+        df with the derived features the model uses added
+        """
+        derived = derive_features(df, self.derived_features)
+        return df.assign(**derived) if derived else df
+
+    def transform(self, df):
+        """
+        Raw customer rows -> scaled float64 feature matrix in training
+        column order
+        """
+        derived = derive_features(df, self.derived_features)
+        X = np.empty((len(df), len(self.columns)), dtype=np.float64)
+        for j, col in enumerate(self.columns):
+            if col in derived:
+                column = np.asarray(derived[col], dtype=np.float64)
+                missing = np.isnan(column)
+                if missing.any():
+                    column = np.where(missing, self.fill_values[j], column)
+            elif col in self.categories:
+                values = df[col]
+                if not isinstance(values.dtype, pd.CategoricalDtype):
+                    values = values.astype('string')
+                # Categorical inputs (e.g. dictionary-encoded Arrow columns)
+                # are recoded without materializing a string per row
+                codes = pd.Categorical(values, categories=self.categories[col]).codes
+                missing = values.isna().to_numpy()
+                unseen = (codes < 0) & ~missing
+                if unseen.any():
+                    raise ValueError(f"Unknown {col} values: {sorted(set(values[unseen].astype(str)))[:5]}")
+                column = codes.astype(np.float64)
+                if missing.any():
+                    if np.isnan(self.fill_values[j]):
+                        raise ValueError(f"Missing {col} values and no fitted imputer.")
+                    column[missing] = self.fill_values[j]
+            else:
+                column = pd.to_numeric(df[col]).to_numpy(dtype=np.float64, na_value=np.nan)
+                missing = np.isnan(column)
+                if missing.any():
+                    column = np.where(missing, self.fill_values[j], column)
+            X[:, j] = (column - self.mean[j]) / self.scale[j]
+        return X
+
+    def score_matrix(self, X):
+        """
+        Nearest centre and Euclidean distance to it for each scaled row
+        """
+        d2 = X @ self.centers.T
+        d2 *= -2
+        d2 += self.center_norms
+        labels = d2.argmin(axis=1)
+        nearest = d2[np.arange(len(X)), labels] + np.einsum('ij,ij->i', X, X)
+        return labels.astype(np.int32), np.sqrt(np.maximum(nearest, 0.0))
+
+    def score(self, df):
+        """
+        Cluster labels (int32) and distances to the assigned centre
+        (float64) for raw customer rows
+        """
+        return self.score_matrix(self.transform(df))
+
+    def to_shared_memory(self):
+        """
+        Copy the numeric parameters into one SharedMemory block. Returns the
+        block (the caller closes and unlinks it) and a small picklable spec
+        for attach().
+        """
+        from multiprocessing import shared_memory
+        arrays = [self.fill_values, self.mean, self.scale, self.centers]
+        nbytes = sum(a.nbytes for a in arrays)
+        shm = shared_memory.SharedMemory(create=True, size=max(nbytes, 1))
+        offset = 0
+        for a in arrays:
+            np.ndarray(a.shape, dtype=np.float64, buffer=shm.buf, offset=offset)[...] = a
+            offset += a.nbytes
+        spec = {
+            'name': shm.name,
+            'columns': self.columns,
+            'categories': {col: list(c) for col, c in self.categories.items()},
+            'n_clusters': self.n_clusters,
+            'derived_features': self.derived_features,
+        }
+        return shm, spec
+
+    @classmethod
+    def attach(cls, spec):
+        """
+        Build a CompiledModel whose arrays are views of the shared block
+        described by spec. Returns (model, shm); keep shm open while the
+        model is in use. Pool workers share the creator's resource tracker,
+        so the block is unlinked once, by the creator.
+        """
+        from multiprocessing import shared_memory
+        shm = shared_memory.SharedMemory(name=spec['name'])
+
+        d, k = len(spec['columns']), spec['n_clusters']
+        views, offset = [], 0
+        for shape in [(d,), (d,), (d,), (k, d)]:
+            view = np.ndarray(shape, dtype=np.float64, buffer=shm.buf, offset=offset)
+            view.flags.writeable = False
+            views.append(view)
+            offset += view.nbytes
+        categories = {col: np.asarray(c, dtype=str) for col, c in spec['categories'].items()}
+        return cls(spec['columns'], categories, *views,
+                   spec.get('derived_features', DERIVED_FEATURES)), shm
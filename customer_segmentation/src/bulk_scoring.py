@@ -0,0 +1,364 @@
+"""
+Offline bulk scoring of the whole customer base.
+
+Input shards (CSV or Parquet files, directories or glob patterns) are split
+into tasks (whole files, or row-group ranges of large Parquet files) and fanned
+out over a process pool. The fitted model is compiled once into NumPy arrays
+and shared with the workers through a single shared-memory block. Each worker
+reads and writes on background threads while it scores, so I/O overlaps
+compute. Output is one Parquet file per task with CustomerID, Cluster and
+Distance (Euclidean distance to the assigned centre, in scaled feature space).
+When the training drift reference is available, every task also sketches its
+inputs. The merged drift report is written to drift_report.json.
+
+Usage (from the customer_segmentation directory):
+    python -m src.bulk_scoring /data/customers_10m --output-dir /data/scored --workers 8
+"""
+import argparse
+import glob
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_DIR not in sys.path:
+    sys.path.append(PROJECT_DIR)
+
+from src.batch_scoring import CompiledModel
+from src.monitoring import DriftMonitor, load_reference
+
+DEFAULT_MODEL_PATH = os.path.join(PROJECT_DIR, 'model', 'kmeans_model.pkl')
+DEFAULT_PREPROCESSOR_PATH = os.path.join(PROJECT_DIR, 'model', 'preprocessor.pkl')
+DEFAULT_REFERENCE_PATH = os.path.join(PROJECT_DIR, 'model', 'drift_reference.json')
+DEFAULT_BATCH_ROWS = 100_000
+PREFETCH_DEPTH = 2
+INPUT_EXTENSIONS = ('.csv', '.parquet')
+
+# Set in each worker process by _init_worker
+_model = None
+_shm = None
+_reference = None
+
+
+def discover_inputs(paths):
+    """
+    Expand files, directories and glob patterns into a sorted list of
+    CSV/Parquet files
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            matches = [os.path.join(path, name) for name in os.listdir(path)]
+        else:
+            matches = glob.glob(path)
+        files.extend(m for m in matches if os.path.isfile(m) and m.endswith(INPUT_EXTENSIONS))
+    return sorted(set(files))
+
+
+def plan_tasks(files, workers=1):
+    """
+    One task per CSV file. Parquet files are split into contiguous row-group
+    ranges so that there are at least as many tasks as workers when the
+    input has fewer files than that.
+    """
+    import pyarrow.parquet as pq
+
+    parts_per_file = max(1, -(-workers // max(len(files), 1)))
+    tasks = []
+    for path in files:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        if not path.endswith('.parquet'):
+            tasks.append({'path': path, 'row_groups': None, 'name': stem})
+            continue
+        n_groups = pq.ParquetFile(path).num_row_groups
+        n_parts = max(1, min(parts_per_file, n_groups))
+        bounds = np.linspace(0, n_groups, n_parts + 1).astype(int)
+        for part in range(n_parts):
+            groups = list(range(bounds[part], bounds[part + 1]))
+            name = stem if n_parts == 1 else f"{stem}-part{part:03d}"
+            tasks.append({'path': path, 'row_groups': groups, 'name': name})
+    return tasks
+
+
+def _prefetch(iterable, depth=PREFETCH_DEPTH):
+    """
+    Pull items from iterable on a background thread, up to depth ahead of
+    the consumer. Parquet/CSV decoding releases the GIL, so reading the next
+    batch overlaps scoring the current one.
+    """
+    items = queue.Queue(maxsize=depth)
+    done = object()
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for item in iterable:
+                if stop.is_set():
+                    return
+                items.put(item)
+        except BaseException as exc:
+            items.put(exc)
+        finally:
+            items.put(done)
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = items.get()
+            if item is done:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        while thread.is_alive():
+            try:
+                items.get_nowait()
+            except queue.Empty:
+                thread.join(0.01)
+
+
+def read_batches(task, columns, batch_rows=DEFAULT_BATCH_ROWS):
+    """
+    Yield DataFrames of at most batch_rows rows holding the needed columns
+    """
+    path = task['path']
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        parquet = pq.ParquetFile(path)
+        available = set(parquet.schema_arrow.names)
+        wanted = [c for c in columns if c in available]
+        for batch in parquet.iter_batches(batch_size=batch_rows, row_groups=task['row_groups'],
+                                          columns=wanted):
+            yield batch.to_pandas()
+    else:
+        with pd.read_csv(path, chunksize=batch_rows, usecols=lambda c: c in columns) as reader:
+            yield from reader
+
+
+class _BackgroundWriter:
+    """
+    Parquet writer fed through a bounded queue and drained by a thread
+    """
+    def __init__(self, path, depth=PREFETCH_DEPTH):
+        self.path = path
+        self.queue = queue.Queue(maxsize=depth)
+        self.error = None
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        import pyarrow.parquet as pq
+        writer = None
+        try:
+            while True:
+                table = self.queue.get()
+                if table is None:
+                    break
+                if writer is None:
+                    writer = pq.ParquetWriter(self.path, table.schema, compression='snappy')
+                writer.write_table(table)
+        except BaseException as exc:
+            self.error = exc
+            while self.queue.get() is not None:
+                pass
+        finally:
+            if writer is not None:
+                writer.close()
+
+    def write(self, table):
+        if self.error is not None:
+            raise self.error
+        self.queue.put(table)
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
+
+
+def score_task(task, model, output_dir, batch_rows=DEFAULT_BATCH_ROWS, id_column='CustomerID',
+               reference=None):
+    """
+    Score one task and write its labels and distances to Parquet. Returns
+    per-task rows, seconds, cluster counts and, given a drift reference, a
+    DriftMonitor holding the task's sketches.
+    """
+    import pyarrow as pa
+
+    start = time.perf_counter()
+    columns = list(dict.fromkeys([id_column] + model.input_columns))
+    output_path = os.path.join(output_dir, f"{task['name']}.parquet")
+    tmp_path = output_path + '.tmp'
+    counts = np.zeros(model.n_clusters, dtype=np.int64)
+    monitor = DriftMonitor(reference) if reference is not None else None
+    rows = 0
+
+    writer = _BackgroundWriter(tmp_path)
+    try:
+        for df in _prefetch(read_batches(task, columns, batch_rows)):
+            labels, distances = model.score(df)
+            arrays = {}
+            if id_column in df.columns:
+                arrays[id_column] = pa.array(df[id_column].to_numpy(), type=pa.string())
+            arrays['Cluster'] = pa.array(labels)
+            arrays['Distance'] = pa.array(distances.astype(np.float32))
+            writer.write(pa.table(arrays))
+            counts += np.bincount(labels, minlength=model.n_clusters)
+            if monitor is not None:
+                # The reference sketches derived features too
+                monitor.update_batch(model.add_derived_features(df), labels, distances)
+            rows += len(df)
+    finally:
+        writer.close()
+    if rows:
+        os.replace(tmp_path, output_path)
+    else:
+        output_path = None
+
+    return {
+        'input': task['path'],
+        'output': output_path,
+        'rows': rows,
+        'seconds': time.perf_counter() - start,
+        'cluster_counts': counts,
+        'monitor': monitor,
+    }
+
+
+def _init_worker(spec, reference):
+    global _model, _shm, _reference
+    # One BLAS thread per process; parallelism comes from the pool
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(1)
+    except ImportError:
+        pass
+    _model, _shm = CompiledModel.attach(spec)
+    _reference = reference
+
+
+def _score_task_in_worker(task, output_dir, batch_rows, id_column):
+    return score_task(task, _model, output_dir, batch_rows, id_column, _reference)
+
+
+def bulk_score(inputs, output_dir, model, workers=None, batch_rows=DEFAULT_BATCH_ROWS,
+               id_column='CustomerID', reference=None, log=print):
+    """
+    Score every input shard with a CompiledModel over a process pool.
+    Returns a summary with total rows, elapsed seconds, rows/sec, cluster
+    counts, the per-task results and, given a drift reference, the merged
+    drift report.
+    """
+    files = discover_inputs(inputs)
+    if not files:
+        raise FileNotFoundError(f"No CSV or Parquet files found in {inputs}")
+    os.makedirs(output_dir, exist_ok=True)
+
+    workers = workers or os.cpu_count() or 1
+    tasks = plan_tasks(files, workers)
+    workers = min(workers, len(tasks))
+
+    start = time.perf_counter()
+    results = []
+    rows_done = 0
+
+    def record(result):
+        nonlocal rows_done
+        results.append(result)
+        rows_done += result['rows']
+        elapsed = time.perf_counter() - start
+        log(f"  [{len(results)}/{len(tasks)}] {os.path.basename(result['input'])}: "
+            f"{result['rows']:,} rows in {result['seconds']:.1f}s "
+            f"(total {rows_done:,}, {rows_done / elapsed:,.0f} rows/sec)")
+
+    if workers <= 1:
+        for task in tasks:
+            record(score_task(task, model, output_dir, batch_rows, id_column, reference))
+    else:
+        shm, spec = model.to_shared_memory()
+        try:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(spec, reference)) as pool:
+                futures = [pool.submit(_score_task_in_worker, task, output_dir, batch_rows, id_column)
+                           for task in tasks]
+                for future in as_completed(futures):
+                    record(future.result())
+        finally:
+            shm.close()
+            shm.unlink()
+
+    elapsed = time.perf_counter() - start
+    counts = np.sum([r['cluster_counts'] for r in results], axis=0)
+
+    drift = None
+    if reference is not None:
+        monitor = DriftMonitor(reference)
+        for result in results:
+            monitor.merge(result.pop('monitor'))
+        drift = monitor.report()
+        with open(os.path.join(output_dir, 'drift_report.json'), 'w') as f:
+            json.dump(drift, f, indent=1)
+    return {
+        'rows': rows_done,
+        'files': len(files),
+        'tasks': len(tasks),
+        'workers': workers,
+        'elapsed': elapsed,
+        'rows_per_sec': rows_done / elapsed if elapsed > 0 else 0.0,
+        'cluster_counts': {i: int(c) for i, c in enumerate(counts) if c > 0},
+        'outputs': sorted(r['output'] for r in results if r['output']),
+        'results': results,
+        'drift': drift,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk-score customer shards with the trained model")
+    parser.add_argument('inputs', nargs='+', help="CSV/Parquet files, directories or glob patterns")
+    parser.add_argument('--output-dir', required=True, help="Directory for the scored Parquet files")
+    parser.add_argument('--model', default=DEFAULT_MODEL_PATH)
+    parser.add_argument('--preprocessor', default=DEFAULT_PREPROCESSOR_PATH)
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument('--batch-rows', type=int, default=DEFAULT_BATCH_ROWS,
+                        help="Rows read, scored and written per batch")
+    parser.add_argument('--id-column', default='CustomerID')
+    parser.add_argument('--drift-reference', default=DEFAULT_REFERENCE_PATH,
+                        help="Training reference to score input drift against")
+    parser.add_argument('--no-drift', action='store_true', help="Skip drift sketches")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    model = CompiledModel.load(args.model, args.preprocessor)
+    reference = None
+    if not args.no_drift and os.path.exists(args.drift_reference):
+        reference = load_reference(args.drift_reference)
+    summary = bulk_score(args.inputs, args.output_dir, model, workers=args.workers,
+                         batch_rows=args.batch_rows, id_column=args.id_column, reference=reference)
+    print(f"Scored {summary['rows']:,} rows from {summary['files']} file(s) "
+          f"({summary['tasks']} tasks, {summary['workers']} workers) in {summary['elapsed']:.1f}s "
+          f"- {summary['rows_per_sec']:,.0f} rows/sec")
+    print(f"Cluster counts: {summary['cluster_counts']}")
+    drift = summary['drift']
+    if drift is not None:
+        shifted = [f"{name} ({entry['psi']:.2f})" for name, entry in drift['features'].items()
+                   if entry['status'] != 'stable']
+        print(f"Drift vs training data: {drift['status']} (max PSI {drift['max_psi']:.3f})"
+              + (f"; shifted inputs: {', '.join(shifted)}" if shifted else ""))
+    return summary
+
+
+if __name__ == "__main__":
+    main()
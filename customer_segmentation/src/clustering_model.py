@@ -2,10 +2,173 @@ import pandas as pd
 import numpy as np
 from sklearn.cluster import KMeans
 from sklearn.metrics import silhouette_score, davies_bouldin_score
-import matplotlib.pyplot as plt
-import seaborn as sns
 import joblib
 import os
+from src.profiling import span, traced
+
+CORESET_CHUNK_ROWS = 500_000
+# Rows drawn (in proportion to the coreset weights) to estimate silhouette
+# and Davies-Bouldin scores, which have no weighted form
+METRIC_SAMPLE_ROWS = 10_000
+# Parent clusters with more rows than this sweep and fit their sub-clusters
+# on a coreset of this size
+SUB_CORESET_ROWS = METRIC_SAMPLE_ROWS
+
+
+def _rows(X):
+    return X.to_numpy(dtype=np.float64) if isinstance(X, pd.DataFrame) else np.asarray(X, dtype=np.float64)
+
+
+def lightweight_coreset(X, size, sample_weight=None, random_state=None):
+    """
+    Weighted coreset of (weighted) points by sensitivity sampling: rows are
+    drawn with probability half uniform, half proportional to their squared
+    distance from the mean, and weighted by the inverse of that probability
+    (Bachem et al., "Scalable k-Means Clustering via Lightweight Coresets").
+    Returns (points, weights); rows drawn more than once are combined.
+    """
+    rng = np.random.default_rng(random_state)
+    X = _rows(X)
+    w = np.ones(len(X)) if sample_weight is None else np.asarray(sample_weight, dtype=np.float64)
+    total = w.sum()
+    mean = (w @ X) / total
+    spread = w * ((X - mean) ** 2).sum(axis=1)
+    q = 0.5 * w / total
+    q += 0.5 * spread / spread.sum() if spread.sum() > 0 else 0.5 * w / total
+    drawn, counts = np.unique(rng.choice(len(X), size=size, p=q / q.sum()), return_counts=True)
+    return X[drawn], counts * w[drawn] / (size * q[drawn])
+
+
+class CoresetBuilder:
+    """
+    Streaming single-pass coreset: every chunk is reduced to a coreset of
+    ``size`` points, and equal-level coresets are merged and reduced again
+    (merge-and-reduce), so at most log2(rows / chunk) coresets are held
+
+        builder = CoresetBuilder(20_000)
+        for chunk in chunks:
+            builder.update(chunk)
+        points, weights = builder.result()
+    """
+    def __init__(self, size, random_state=42):
+        self.size = size
+        self.rng = np.random.default_rng(random_state)
+        self.levels = []
+        self.rows = 0
+
+    def _reduce(self, X, weights):
+        if len(X) <= self.size:
+            return X, weights
+        return lightweight_coreset(X, self.size, weights, self.rng)
+
+    def update(self, X, sample_weight=None):
+        X = _rows(X)
+        self.rows += len(X)
+        weights = np.ones(len(X)) if sample_weight is None else np.asarray(sample_weight, dtype=np.float64)
+        carry = self._reduce(X, weights)
+        for level, held in enumerate(self.levels):
+            if held is None:
+                self.levels[level] = carry
+                return self
+            self.levels[level] = None
+            carry = self._reduce(np.vstack([held[0], carry[0]]), np.concatenate([held[1], carry[1]]))
+        self.levels.append(carry)
+        return self
+
+    def result(self):
+        held = [level for level in self.levels if level is not None]
+        if not held:
+            return np.empty((0, 0)), np.empty(0)
+        return self._reduce(np.vstack([X for X, _ in held]), np.concatenate([w for _, w in held]))
+
+
+def build_coreset(X, size, random_state=42, chunk_rows=CORESET_CHUNK_ROWS):
+    """
+    Weighted coreset (points, weights) of an in-memory feature matrix,
+    built in one streaming pass over chunks of rows
+    """
+    builder = CoresetBuilder(size, random_state)
+    for start in range(0, len(X), chunk_rows):
+        builder.update(X[start:start + chunk_rows])
+    return builder.result()
+
+
+def kmeans_cost(X, centers, chunk_rows=CORESET_CHUNK_ROWS):
+    """
+    Sum of squared distances of every row to its nearest centre, in chunks
+    """
+    centers = np.asarray(centers, dtype=np.float64)
+    norms = (centers ** 2).sum(axis=1)
+    cost = 0.0
+    for start in range(0, len(X), chunk_rows):
+        chunk = _rows(X[start:start + chunk_rows])
+        distances = (chunk ** 2).sum(axis=1)[:, None] - 2 * chunk @ centers.T + norms
+        cost += np.maximum(distances.min(axis=1), 0).sum()
+    return float(cost)
+
+
+def _metric_sample(X, labels, sample_weight, random_state, size=METRIC_SAMPLE_ROWS):
+    """
+    Rows for the unweighted quality scores: all of them, or for weighted
+    points a draw in proportion to the weights. A draw that hits a single
+    cluster (small k, or one dominant weight) falls back to all rows.
+    """
+    if sample_weight is None:
+        return X, labels
+    rng = np.random.default_rng(random_state)
+    weights = np.asarray(sample_weight, dtype=np.float64)
+    rows = rng.choice(len(X), size=min(size, np.count_nonzero(weights)), replace=False,
+                      p=weights / weights.sum())
+    sample_labels = np.asarray(labels)[rows]
+    if len(np.unique(sample_labels)) < 2:
+        return X, labels
+    return _rows(X)[rows], sample_labels
+
+
+def _scorable(labels):
+    """
+    Whether silhouette and Davies-Bouldin are defined for these labels
+    (between 2 and n - 1 distinct clusters)
+    """
+    return 2 <= len(np.unique(labels)) < len(labels)
+
+
+def _fit_sub_model(X, sample_weight, max_k, method, random_state, coreset_size):
+    """
+    Sub-cluster KMeans for the rows of one parent cluster, with k chosen by
+    the usual sweep (runs in a worker process)
+    """
+    import contextlib
+    import io
+    rows = len(X)
+    if coreset_size is not None and rows > coreset_size:
+        builder = CoresetBuilder(coreset_size, random_state)
+        for start in range(0, rows, CORESET_CHUNK_ROWS):
+            builder.update(X[start:start + CORESET_CHUNK_ROWS],
+                           None if sample_weight is None else sample_weight[start:start + CORESET_CHUNK_ROWS])
+        X, sample_weight = builder.result()
+    if rows == 0:
+        return {'model': None, 'k': 0, 'rows': 0, 'inertia_values': [], 'silhouette_scores': []}
+
+    segmentation = CustomerSegmentation(random_state=random_state)
+    max_k = min(max_k, len(X) - 1)
+    # Progress lines of a dozen parallel sweeps would interleave
+    with contextlib.redirect_stdout(io.StringIO()):
+        if max_k < 2:
+            segmentation.model = KMeans(n_clusters=1, random_state=random_state, n_init=1)
+            segmentation.model.fit(X, sample_weight=sample_weight)
+            segmentation.n_clusters = 1
+        else:
+            segmentation.find_optimal_clusters(X, max_k=max_k, method=method, sample_weight=sample_weight)
+            segmentation.train(X, sample_weight=sample_weight)
+    return {
+        'model': segmentation.model,
+        'k': segmentation.n_clusters,
+        'rows': rows,
+        'inertia_values': segmentation.inertia_values,
+        'silhouette_scores': segmentation.silhouette_scores,
+    }
+
 
 class CustomerSegmentation:
     def __init__(self, n_clusters=None, random_state=42):
@@ -15,10 +178,17 @@ class CustomerSegmentation:
         self.optimal_k = None
         self.inertia_values = []
         self.silhouette_scores = []
+        # Two-level segmentation: one KMeans per parent cluster (see
+        # train_hierarchy), None for a flat model
+        self.sub_models = None
+        self.sub_sweeps = []
         
-    def find_optimal_clusters(self, X, max_k=10, method='both'):
+    @traced('sweep')
+    def find_optimal_clusters(self, X, max_k=10, method='both', sample_weight=None):
         """
-        Find optimal number of clusters using Elbow Method and Silhouette Score
+        Find optimal number of clusters using Elbow Method and Silhouette Score.
+        With sample_weight (e.g. a coreset from build_coreset) the fits are
+        weighted and silhouette is scored on a weighted draw of the points.
         """
         self.inertia_values = []
         self.silhouette_scores = []
@@ -26,9 +196,13 @@ class CustomerSegmentation:
         
         for k in K_range:
             kmeans = KMeans(n_clusters=k, random_state=self.random_state, n_init=10)
-            kmeans.fit(X)
+            with span('sweep.fit', k=k, rows=len(X)):
+                kmeans.fit(X, sample_weight=sample_weight)
             self.inertia_values.append(kmeans.inertia_)
-            silhouette_avg = silhouette_score(X, kmeans.labels_)
+            with span('sweep.score', k=k, rows=len(X)):
+                sample = _metric_sample(X, kmeans.labels_, sample_weight, self.random_state)
+                # Undefined scores (a single occupied cluster) rank last
+                silhouette_avg = silhouette_score(*sample) if _scorable(sample[1]) else -1.0
             self.silhouette_scores.append(silhouette_avg)
         
         # Find optimal k based on silhouette score
@@ -49,6 +223,9 @@ class CustomerSegmentation:
         """
         Plot Elbow curve and Silhouette scores
         """
+        # Imported here so loading/predicting never pulls in matplotlib
+        import matplotlib.pyplot as plt
+        
         fig, axes = plt.subplots(1, 2, figsize=(14, 5))
         
         # Elbow Plot
@@ -78,9 +255,10 @@ class CustomerSegmentation:
         
         return fig
     
-    def train(self, X):
+    @traced('train')
+    def train(self, X, sample_weight=None):
         """
-        Train K-Means model
+        Train K-Means model, optionally on weighted points such as a coreset
         """
         if self.n_clusters is None:
             if self.optimal_k is None:
@@ -88,11 +266,20 @@ class CustomerSegmentation:
             self.n_clusters = self.optimal_k
         
         self.model = KMeans(n_clusters=self.n_clusters, random_state=self.random_state, n_init=10)
-        self.model.fit(X)
+        with span('train.fit', k=self.n_clusters, rows=len(X)):
+            self.model.fit(X, sample_weight=sample_weight)
         
         # Calculate metrics
-        silhouette = silhouette_score(X, self.model.labels_)
-        davies_bouldin = davies_bouldin_score(X, self.model.labels_)
+        with span('train.score', rows=len(X)):
+            sample = _metric_sample(X, self.model.labels_, sample_weight, self.random_state)
+            silhouette = davies_bouldin = float('nan')
+            if _scorable(sample[1]):
+                silhouette = silhouette_score(*sample)
+                davies_bouldin = davies_bouldin_score(*sample)
+        
+        # Models fitted on float32 features (low-memory preprocessing) keep
+        # float64 centres so they serve the usual float64 inputs
+        self.model.cluster_centers_ = self.model.cluster_centers_.astype(np.float64)
         
         print(f"\nModel Training Complete:")
         print(f"Number of clusters: {self.n_clusters}")
@@ -102,12 +289,125 @@ class CustomerSegmentation:
         
         return self.model
     
+    @traced('hierarchy')
+    def train_hierarchy(self, X, max_sub_k=10, method='both', sample_weight=None, workers=None,
+                        coreset_size=SUB_CORESET_ROWS):
+        """
+        Fit a sub-cluster model inside each cluster of the trained model,
+        one worker process per parent cluster. Each parent's k is chosen by
+        find_optimal_clusters on its own rows (a coreset of them above
+        coreset_size rows).
+        """
+        from concurrent.futures import ProcessPoolExecutor
+        if self.model is None:
+            raise ValueError("Model not trained yet. Please train the model first.")
+        X = _rows(X)
+        labels = self.predict(X)
+        weights = None if sample_weight is None else np.asarray(sample_weight, dtype=np.float64)
+        jobs = []
+        for parent in range(self.n_clusters):
+            rows = labels == parent
+            jobs.append((X[rows], None if weights is None else weights[rows], max_sub_k, method,
+                         self.random_state, coreset_size))
+
+        workers = min(workers or os.cpu_count() or 1, len(jobs))
+        with span('hierarchy.fit', parents=len(jobs), workers=workers):
+            if workers <= 1:
+                results = [_fit_sub_model(*job) for job in jobs]
+            else:
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    # Largest parents first so one big fit does not start last
+                    order = sorted(range(len(jobs)), key=lambda i: -len(jobs[i][0]))
+                    futures = {i: pool.submit(_fit_sub_model, *jobs[i]) for i in order}
+                    results = [futures[i].result() for i in range(len(jobs))]
+
+        self.sub_models = [result.pop('model') for result in results]
+        self.sub_sweeps = results
+        print(f"\nSub-clusters per parent ({workers} workers):")
+        for parent, result in enumerate(results):
+            print(f"  Cluster {parent}: {result['k']} sub-clusters over {result['rows']:,} rows")
+        return self.sub_models
+
+    @property
+    def n_sub_clusters(self):
+        """
+        Sub-cluster count per parent cluster (empty for a flat model)
+        """
+        return [sweep['k'] for sweep in self.sub_sweeps] if self.sub_models is not None else []
+
+    def predict_hierarchy(self, X, parents=None):
+        """
+        Parent cluster and sub-cluster (numbered within its parent) for each
+        row: the parent centres are searched first, then only the chosen
+        parent's sub-centres. Parent labels already computed for X (e.g. by
+        a CompiledModel) can be passed in, so they are not searched again.
+        """
+        if self.sub_models is None:
+            raise ValueError("No sub-cluster models. Please run train_hierarchy first.")
+        parents = self.predict(X) if parents is None else np.asarray(parents)
+        X = _rows(X)
+        sub_clusters = np.zeros(len(parents), dtype=np.int32)
+        # Rows grouped by parent with one sort, then nearest sub-centre per group
+        order = np.argsort(parents, kind='stable')
+        bounds = np.searchsorted(parents[order], np.arange(len(self.sub_models) + 1))
+        for parent, model in enumerate(self.sub_models):
+            rows = order[bounds[parent]:bounds[parent + 1]]
+            if model is None or model.n_clusters < 2 or not len(rows):
+                continue
+            centers = model.cluster_centers_
+            d2 = X[rows] @ centers.T
+            d2 *= -2
+            d2 += (centers ** 2).sum(axis=1)
+            sub_clusters[rows] = d2.argmin(axis=1)
+        return parents, sub_clusters
+
+    def stability_analysis(self, X, n_replicates=50, **kwargs):
+        """
+        Bootstrap stability of the trained model on features X: ARI and
+        per-cluster Jaccard against the model's labels and per-customer
+        assignment confidence, with replicates fitted in parallel (see
+        src.stability for the options)
+        """
+        from src.stability import stability_analysis
+        if self.model is None:
+            raise ValueError("Model not trained yet. Please train the model first.")
+        return stability_analysis(self, X, n_replicates, **kwargs)
+
+    def coreset_report(self, X, coreset_weights, full_fit=False):
+        """
+        Quality of a model trained on a coreset, measured on the full data X:
+        its real cost against the coreset's estimate and, with full_fit, the
+        cost gap and label agreement against K-Means trained on all rows
+        """
+        import time
+        from sklearn.metrics import adjusted_rand_score
+        full_cost = kmeans_cost(X, self.model.cluster_centers_)
+        report = {
+            'rows': len(X),
+            'coreset_size': len(coreset_weights),
+            'coreset_cost': float(self.model.inertia_),
+            'full_data_cost': full_cost,
+            'cost_estimate_error': float(self.model.inertia_) / full_cost - 1,
+        }
+        if full_fit:
+            start = time.perf_counter()
+            full = KMeans(n_clusters=self.n_clusters, random_state=self.random_state, n_init=10).fit(X)
+            report['full_fit_seconds'] = time.perf_counter() - start
+            report['full_fit_cost'] = float(full.inertia_)
+            report['cost_gap'] = full_cost / full.inertia_ - 1
+            report['label_agreement_ari'] = float(adjusted_rand_score(full.labels_, self.predict(X)))
+        return report
+    
+    @traced('predict')
     def predict(self, X):
         """
         Predict cluster labels for new data
         """
         if self.model is None:
             raise ValueError("Model not trained yet. Please train the model first.")
+        if isinstance(X, (np.ndarray, pd.DataFrame)):
+            # KMeans only predicts on the dtype of its centres
+            X = X.astype(self.model.cluster_centers_.dtype, copy=False)
         return self.model.predict(X)
     
     def get_cluster_centers(self):
@@ -133,7 +433,9 @@ class CustomerSegmentation:
             'n_clusters': self.n_clusters,
             'optimal_k': self.optimal_k,
             'inertia_values': self.inertia_values,
-            'silhouette_scores': self.silhouette_scores
+            'silhouette_scores': self.silhouette_scores,
+            'sub_models': self.sub_models,
+            'sub_sweeps': self.sub_sweeps
         }, filepath)
         
         print(f"Model saved to {filepath}")
@@ -149,4 +451,7 @@ class CustomerSegmentation:
         segmentation.optimal_k = data['optimal_k']
         segmentation.inertia_values = data['inertia_values']
         segmentation.silhouette_scores = data['silhouette_scores']
+        # Absent from models saved before two-level segmentation
+        segmentation.sub_models = data.get('sub_models')
+        segmentation.sub_sweeps = data.get('sub_sweeps', [])
         return segmentation
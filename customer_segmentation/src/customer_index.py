@@ -0,0 +1,123 @@
+"""
+CustomerID -> cluster lookup index built at training time.
+
+The index is a directory of versions. Each version holds the customer IDs as
+a sorted fixed-width byte array, with the cluster labels and
+distances-to-centroid aligned to it, as .npy files. Readers memory-map the
+arrays, so every server worker shares the same page cache, and a lookup is a
+binary search over the keys. A rebuild writes a new version directory and
+then atomically replaces the CURRENT pointer. Readers pick up the new version
+on their next lookup, and in-flight lookups keep their mapping of the old one.
+"""
+import json
+import os
+import shutil
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+CURRENT_FILE = 'CURRENT'
+KEEP_VERSIONS = 2
+
+
+def write_customer_index(customer_ids, labels, distances, path, metadata=None):
+    """
+    Build a new index version from aligned arrays and make it current.
+    Duplicate IDs keep their last row, like the assignment table.
+    Returns the version directory.
+    """
+    ids = np.char.encode(np.asarray(customer_ids).astype(str), 'utf-8')
+    keys, from_end = np.unique(ids[::-1], return_index=True)
+    last = len(ids) - 1 - from_end
+    duplicates = len(ids) - len(keys)
+
+    os.makedirs(path, exist_ok=True)
+    version = f"v{time.time_ns()}"
+    tmp_dir = os.path.join(path, f".{version}.tmp")
+    os.makedirs(tmp_dir)
+    np.save(os.path.join(tmp_dir, 'keys.npy'), keys)
+    np.save(os.path.join(tmp_dir, 'labels.npy'), np.asarray(labels, dtype=np.int32)[last])
+    np.save(os.path.join(tmp_dir, 'distances.npy'), np.asarray(distances, dtype=np.float32)[last])
+    meta = dict(metadata or {}, version=version, n=int(len(keys)), duplicates=int(duplicates),
+                created_at=datetime.now(timezone.utc).isoformat())
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=1)
+    os.replace(tmp_dir, os.path.join(path, version))
+
+    pointer = os.path.join(path, CURRENT_FILE)
+    with open(f"{pointer}.tmp", 'w') as f:
+        f.write(version)
+    os.replace(f"{pointer}.tmp", pointer)
+
+    # Older versions are dropped; open mappings of them stay valid
+    versions = sorted(v for v in os.listdir(path) if v.startswith('v') and v != version)
+    for old in versions[:max(0, len(versions) - (KEEP_VERSIONS - 1))]:
+        shutil.rmtree(os.path.join(path, old), ignore_errors=True)
+    return os.path.join(path, version)
+
+
+class CustomerIndex:
+    """
+    One memory-mapped index version
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        self.keys = np.load(os.path.join(directory, 'keys.npy'), mmap_mode='r')
+        self.labels = np.load(os.path.join(directory, 'labels.npy'), mmap_mode='r')
+        self.distances = np.load(os.path.join(directory, 'distances.npy'), mmap_mode='r')
+        with open(os.path.join(directory, 'meta.json')) as f:
+            self.meta = json.load(f)
+        self.width = self.keys.dtype.itemsize
+
+    def __len__(self):
+        return len(self.keys)
+
+    def position(self, customer_id):
+        """
+        Row of customer_id in the sorted keys, or None when absent
+        """
+        key = customer_id.encode('utf-8')
+        if not key or len(key) > self.width or key.endswith(b'\0'):
+            return None
+        i = int(self.keys.searchsorted(key))
+        if i < len(self.keys) and self.keys[i] == key:
+            return i
+        return None
+
+    def lookup(self, customer_id):
+        """
+        (cluster, distance) for customer_id, or None when it is not indexed
+        """
+        i = self.position(customer_id)
+        if i is None:
+            return None
+        return int(self.labels[i]), float(self.distances[i])
+
+
+class CustomerIndexReader:
+    """
+    Follows the CURRENT pointer of an index directory, re-opening the index
+    when a retrain publishes a new version
+    """
+    def __init__(self, path):
+        self.path = path
+        self._pointer = os.path.join(path, CURRENT_FILE)
+        self._mtime = None
+        self._index = None
+
+    def current(self):
+        """
+        The current CustomerIndex; raises FileNotFoundError when none has
+        been built
+        """
+        stat = os.stat(self._pointer)
+        # The pointer is replaced, never rewritten, so a new inode means a
+        # new version
+        mtime = (stat.st_ino, stat.st_mtime_ns)
+        if self._index is None or mtime != self._mtime:
+            with open(self._pointer) as f:
+                version = f.read().strip()
+            self._index = CustomerIndex(os.path.join(self.path, version))
+            self._mtime = mtime
+        return self._index
@@ -2,15 +2,62 @@ import pandas as pd
 import numpy as np
 from sklearn.preprocessing import StandardScaler, LabelEncoder
 from sklearn.impute import SimpleImputer
+from src.features import DERIVED_FEATURES, derive_features
+from src.profiling import span, traced
 import warnings
 warnings.filterwarnings('ignore')
 
+# Rows per block when scaling or moving rows in the low-memory path
+LOW_MEMORY_CHUNK_ROWS = 256 * 1024
+
+
+def downcast_numeric(df):
+    """
+    Shrink numeric columns in place to the smallest dtype that holds them
+    exactly: integers to int8/16/32, floats to float32 only when lossless
+    """
+    for col in df.select_dtypes(include=[np.number]).columns:
+        values = df[col].to_numpy()
+        if np.issubdtype(values.dtype, np.integer):
+            df[col] = pd.to_numeric(df[col], downcast='integer')
+        elif values.dtype == np.float64:
+            narrow = values.astype(np.float32)
+            if np.array_equal(narrow, values, equal_nan=True):
+                df[col] = narrow
+    return df
+
+
+def _compact_rows(X, rows, chunk_rows=LOW_MEMORY_CHUNK_ROWS):
+    """
+    Move the (ascending) selected rows to the front of X in place. Row
+    rows[i] >= i, so each block is read before anything overwrites it.
+    """
+    for start in range(0, len(rows), chunk_rows):
+        stop = min(start + chunk_rows, len(rows))
+        X[start:stop] = X[rows[start:stop]]
+    return X[:len(rows)]
+
+
 class DataPreprocessor:
     def __init__(self):
         self.scaler = StandardScaler()
         self.label_encoders = {}
         self.imputers = {}
         self.feature_columns = None
+        self.derived_features = dict(DERIVED_FEATURES)
+
+    def add_derived_features(self, columns):
+        """
+        Compute the derived features this preprocessor was fitted with. Works
+        on a DataFrame (whole frame or chunk) or on a single record given as
+        a dict. Derived values replace any supplied ones, so every path
+        computes them the same way.
+        """
+        # Artifacts pickled before the registry existed derived TotalSpend only
+        derived = derive_features(columns, getattr(self, 'derived_features', DERIVED_FEATURES))
+        if isinstance(columns, pd.DataFrame):
+            return columns.assign(**derived) if derived else columns
+        return {**columns, **derived}
         
     def handle_missing_values(self, df):
         """
@@ -87,6 +134,7 @@ class DataPreprocessor:
         
         return pd.DataFrame(scaled_data, columns=df.columns, index=df.index)
     
+    @traced('preprocess')
     def preprocess(self, df, remove_outliers=True, fit=True):
         """
         Complete preprocessing pipeline
@@ -97,8 +145,14 @@ class DataPreprocessor:
             customer_ids = df['CustomerID'].copy()
             df = df.drop('CustomerID', axis=1)
         
+        # Derived features, then the fitted column order
+        df = self.add_derived_features(df)
+        if not fit and self.feature_columns is not None:
+            df = df[list(self.feature_columns)]
+        
         # Handle missing values
-        df_clean = self.handle_missing_values(df)
+        with span('preprocess.impute', rows=len(df)):
+            df_clean = self.handle_missing_values(df)
         
         # Identify numerical and categorical columns
         numerical_cols = df_clean.select_dtypes(include=[np.number]).columns.tolist()
@@ -106,24 +160,140 @@ class DataPreprocessor:
         
         # Detect and optionally remove outliers
         if remove_outliers and fit:
-            outliers = self.detect_outliers(df_clean, numerical_cols)
-            print(f"Outliers detected: {outliers}")
-            df_clean = self.remove_outliers(df_clean, numerical_cols)
-            print(f"Shape after removing outliers: {df_clean.shape}")
+            with span('preprocess.outliers', rows=len(df_clean)) as s:
+                outliers = self.detect_outliers(df_clean, numerical_cols)
+                print(f"Outliers detected: {outliers}")
+                df_clean = self.remove_outliers(df_clean, numerical_cols)
+                print(f"Shape after removing outliers: {df_clean.shape}")
+                s.set(rows_out=len(df_clean))
         
         # Encode categorical variables
         if categorical_cols:
-            df_clean = self.encode_categorical(df_clean, categorical_cols)
+            with span('preprocess.encode', rows=len(df_clean)):
+                df_clean = self.encode_categorical(df_clean, categorical_cols)
         
         # Store feature columns
         if fit:
             self.feature_columns = df_clean.columns.tolist()
         
         # Scale features
-        df_scaled = self.scale_features(df_clean, fit=fit)
+        with span('preprocess.scale', rows=len(df_clean)):
+            df_scaled = self.scale_features(df_clean, fit=fit)
         
         # Add CustomerID back if it existed
         if customer_ids is not None:
             df_scaled.insert(0, 'CustomerID', customer_ids.values)
         
         return df_scaled
+
+    @traced('preprocess')
+    def preprocess_low_memory(self, df, remove_outliers=True, fit=True, threshold=3,
+                              chunk_rows=LOW_MEMORY_CHUNK_ROWS):
+        """
+        Memory-budgeted variant of preprocess
+
+        Every feature is written once into a single C-contiguous float32
+        array, which is then imputed, filtered for outliers, encoded and
+        scaled in place; the input is only read, one column at a time, and no
+        intermediate DataFrames are built. Returns (X, index): the scaled
+        features in feature_columns order and the index labels of the rows
+        kept. The fitted imputers, encoders and scaler are the same as
+        preprocess() would fit, so either path can serve the artifact.
+        Outliers are checked on every numeric column, whatever its dtype.
+        """
+        # Derived columns are evaluated once and read like input columns
+        derived = derive_features(df, getattr(self, 'derived_features', DERIVED_FEATURES))
+        if fit:
+            columns = [c for c in df.columns if c != 'CustomerID']
+            columns += [c for c in derived if c not in columns]
+        else:
+            if self.feature_columns is None:
+                raise ValueError("Preprocessor is not fitted.")
+            columns = list(self.feature_columns)
+        n = len(df)
+        X = np.empty((n, len(columns)), dtype=np.float32)
+        numerical_idx, categorical_codes = [], {}
+
+        # Numeric columns go straight into X; categorical columns are kept
+        # as small integer codes until the surviving rows are known
+        with span('preprocess.impute', rows=n):
+            for j, col in enumerate(columns):
+                series = derived[col] if col in derived else df[col]
+                if pd.api.types.is_numeric_dtype(series):
+                    numerical_idx.append(j)
+                    X[:, j] = series.to_numpy(dtype=np.float32, na_value=np.nan)
+                    missing = np.isnan(X[:, j])
+                    if missing.any():
+                        if col not in self.imputers:
+                            self.imputers[col] = SimpleImputer(strategy='median').fit(series.to_frame(col))
+                        X[missing, j] = self.imputers[col].statistics_[0]
+                    continue
+
+                if col in self.label_encoders:
+                    categories = self.label_encoders[col].classes_
+                    values = pd.Categorical(series, categories=categories)
+                else:
+                    values = pd.Categorical(series)
+                    categories = np.asarray(values.categories).astype(str)
+                codes = values.codes.copy()
+                missing = series.isna().to_numpy()
+                if missing.any():
+                    if col not in self.imputers:
+                        self.imputers[col] = SimpleImputer(strategy='most_frequent').fit(series.to_frame(col))
+                    fill = str(self.imputers[col].statistics_[0])
+                    codes[missing] = np.searchsorted(categories, fill)
+                unseen = codes < 0
+                if unseen.any():
+                    raise ValueError(f"{col} contains previously unseen labels: "
+                                     f"{sorted(set(series[unseen].astype(str)))[:5]}")
+                categorical_codes[j] = (codes, categories)
+
+        rows = None
+        if remove_outliers and fit:
+            with span('preprocess.outliers', rows=n) as s:
+                keep = np.ones(n, dtype=bool)
+                for j in numerical_idx:
+                    kept = X[keep, j].astype(np.float64)
+                    mean, std = kept.mean(), kept.std(ddof=1)
+                    keep &= np.abs(X[:, j] - mean) / std <= threshold
+                rows = np.flatnonzero(keep)
+                X = _compact_rows(X, rows, chunk_rows)
+                print(f"Shape after removing outliers: {X.shape}")
+                s.set(rows_out=len(rows))
+
+        if categorical_codes:
+            with span('preprocess.encode', rows=len(X)):
+                for j, (codes, categories) in categorical_codes.items():
+                    col = columns[j]
+                    if rows is not None:
+                        codes = codes[rows]
+                    if col not in self.label_encoders:
+                        # Like LabelEncoder.fit on the kept rows: sorted classes
+                        # that actually occur
+                        used = np.unique(codes)
+                        self.label_encoders[col] = LabelEncoder().fit(categories[used])
+                        remap = np.full(len(categories), -1, dtype=np.int64)
+                        remap[used] = np.arange(len(used))
+                        codes = remap[codes]
+                    X[:, j] = codes
+
+        if fit:
+            self.feature_columns = columns
+
+        # Fit incrementally on row blocks (DataFrame views keep the feature
+        # names), then scale in place
+        with span('preprocess.scale', rows=len(X)):
+            if fit:
+                self.scaler = StandardScaler()
+                for start in range(0, len(X), chunk_rows):
+                    self.scaler.partial_fit(pd.DataFrame(X[start:start + chunk_rows],
+                                                         columns=columns, copy=False))
+            mean = self.scaler.mean_.astype(np.float32)
+            scale = self.scaler.scale_.astype(np.float32)
+            for start in range(0, len(X), chunk_rows):
+                block = X[start:start + chunk_rows]
+                block -= mean
+                block /= scale
+
+        index = df.index if rows is None else df.index[rows]
+        return X, index
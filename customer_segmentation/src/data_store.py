@@ -0,0 +1,330 @@
+import os
+import json
+import shutil
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+CLUSTER_COL = 'Cluster'
+# Summary statistics saved inside the dataset directory; pyarrow skips
+# files starting with '_' when scanning
+DATASET_STATS_FILE = '_stats.json'
+STATS_BATCH_ROWS = 100_000
+
+
+def _partitioning(cluster_col=CLUSTER_COL):
+    return ds.partitioning(pa.schema([(cluster_col, pa.int32())]), flavor='hive')
+
+
+def _swap_directory(tmp_path, path):
+    """
+    Move a completed directory into place. The old one is renamed aside
+    first and only deleted after the swap, so ``path`` is never missing
+    for longer than two renames and never holds a half-deleted store.
+    """
+    old_path = f"{path}.old"
+    if os.path.exists(old_path):
+        shutil.rmtree(old_path)
+    if os.path.exists(path):
+        os.replace(path, old_path)
+    os.replace(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+
+def write_clustered_dataset(df, path, cluster_col=CLUSTER_COL, csv_path=None,
+                            max_rows_per_group=64 * 1024, stats=None):
+    """
+    Write clustered customers as a Parquet dataset partitioned by cluster.
+
+    Each cluster lands in its own ``Cluster=<id>`` directory and every row
+    group carries min/max statistics, so readers can skip whole clusters and
+    row groups. The dataset is written next to ``path`` and swapped in once
+    complete so readers never see a partially written store. Streaming
+    summary statistics of ``df`` (``stats``, computed here when not given)
+    are saved in the same directory. When ``csv_path`` is given the flat CSV
+    export is written as well.
+    """
+    from src.utils import StreamingStats
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.set_column(
+        table.schema.get_field_index(cluster_col),
+        cluster_col,
+        table.column(cluster_col).cast(pa.int32())
+    )
+
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    if os.path.exists(tmp_path):
+        shutil.rmtree(tmp_path)
+
+    file_format = ds.ParquetFileFormat()
+    ds.write_dataset(
+        table,
+        tmp_path,
+        format=file_format,
+        partitioning=_partitioning(cluster_col),
+        file_options=file_format.make_write_options(write_statistics=True, compression='snappy'),
+        max_rows_per_group=max_rows_per_group,
+        min_rows_per_group=min(max_rows_per_group, 1024),
+        basename_template='part-{i}.parquet'
+    )
+    if stats is None:
+        stats = StreamingStats.from_frame(df)
+    stats.save(os.path.join(tmp_path, DATASET_STATS_FILE))
+
+    _swap_directory(tmp_path, path)
+
+    if csv_path:
+        df.to_csv(csv_path, index=False)
+
+    return path
+
+
+def dataset_version(path, csv_path=None):
+    """
+    Cheap change token for the clustered data: (files, bytes, latest mtime)
+    of the Parquet dataset, or of the CSV export when the dataset is missing
+    """
+    files = []
+    if os.path.isdir(path):
+        for dirpath, _, filenames in os.walk(path):
+            files.extend(os.path.join(dirpath, name) for name in filenames)
+    elif csv_path is not None and os.path.exists(csv_path):
+        files.append(csv_path)
+
+    stats = [os.stat(f) for f in files]
+    return (len(stats), sum(st.st_size for st in stats), max((st.st_mtime_ns for st in stats), default=0))
+
+
+def _fragment_stats(task):
+    path, files, batch_rows, cluster_col = task
+    from src.utils import StreamingStats
+    dataset = ds.dataset(files, format='parquet', partitioning=_partitioning(cluster_col),
+                         partition_base_dir=path)
+    stats = StreamingStats()
+    for batch in dataset.to_batches(batch_size=batch_rows):
+        stats.update(batch.to_pandas())
+    return stats
+
+
+def compute_dataset_stats(path, cluster_col=CLUSTER_COL, csv_path=None, workers=1,
+                          batch_rows=STATS_BATCH_ROWS):
+    """
+    Scan the clustered data in batches into a StreamingStats, never holding
+    more than one batch per worker in memory. With several workers each
+    scans a share of the files and the results are merged.
+    """
+    from src.utils import StreamingStats
+    if not os.path.isdir(path):
+        if csv_path is None or not os.path.exists(csv_path):
+            raise FileNotFoundError(f"Clustered dataset not found at {path}")
+        stats = StreamingStats()
+        for chunk in pd.read_csv(csv_path, chunksize=batch_rows):
+            stats.update(chunk)
+        return stats
+
+    files = sorted(ds.dataset(path, format='parquet', partitioning=_partitioning(cluster_col)).files)
+    workers = max(1, min(workers, len(files)))
+    tasks = [(path, files[i::workers], batch_rows, cluster_col) for i in range(workers)]
+    if workers == 1:
+        parts = [_fragment_stats(tasks[0])]
+    else:
+        import multiprocessing
+        with multiprocessing.get_context().Pool(workers) as pool:
+            parts = pool.map(_fragment_stats, tasks)
+    stats = StreamingStats()
+    for part in parts:
+        stats.merge(part)
+    return stats
+
+
+def read_dataset_stats(path, cluster_col=CLUSTER_COL, csv_path=None, workers=1):
+    """
+    Summary statistics of the clustered data: the ones saved with the
+    dataset, or a streaming scan when the store predates them
+    """
+    from src.utils import StreamingStats
+    stats_path = os.path.join(path, DATASET_STATS_FILE)
+    if os.path.exists(stats_path):
+        return StreamingStats.load(stats_path)
+    return compute_dataset_stats(path, cluster_col=cluster_col, csv_path=csv_path, workers=workers)
+
+
+EMBEDDING_POINTS_FILE = 'points.parquet'
+EMBEDDING_DENSITY_FILE = 'density.parquet'
+EMBEDDING_META_FILE = 'embedding.json'
+
+
+def write_embedding(points, density, path, metadata=None):
+    """
+    Write a 2-D customer embedding: per-customer coordinates, their
+    density-binned summary and a JSON file describing the projection.
+    Like write_clustered_dataset, the directory is swapped in once complete.
+    """
+    tmp_path = f"{path}.tmp"
+    if os.path.exists(tmp_path):
+        shutil.rmtree(tmp_path)
+    os.makedirs(tmp_path)
+
+    pq.write_table(pa.Table.from_pandas(points, preserve_index=False),
+                   os.path.join(tmp_path, EMBEDDING_POINTS_FILE),
+                   compression='snappy', row_group_size=64 * 1024)
+    pq.write_table(pa.Table.from_pandas(density, preserve_index=False),
+                   os.path.join(tmp_path, EMBEDDING_DENSITY_FILE), compression='snappy')
+    with open(os.path.join(tmp_path, EMBEDDING_META_FILE), 'w') as f:
+        json.dump(metadata or {}, f, indent=1)
+
+    _swap_directory(tmp_path, path)
+    return path
+
+
+def read_embedding(path, kind='density', clusters=None, columns=None, cluster_col=CLUSTER_COL):
+    """
+    Read the binned ('density') or per-customer ('points') embedding,
+    optionally only for some clusters
+    """
+    name = EMBEDDING_DENSITY_FILE if kind == 'density' else EMBEDDING_POINTS_FILE
+    file_path = os.path.join(path, name)
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"Embedding not found at {path}")
+    row_filter = None
+    if clusters is not None:
+        row_filter = ds.field(cluster_col).isin([int(c) for c in clusters])
+    table = ds.dataset(file_path, format='parquet').to_table(
+        columns=list(columns) if columns is not None else None, filter=row_filter)
+    return table.to_pandas()
+
+
+def read_embedding_metadata(path):
+    with open(os.path.join(path, EMBEDDING_META_FILE)) as f:
+        return json.load(f)
+
+
+def list_clusters(path, cluster_col=CLUSTER_COL):
+    """
+    List cluster ids present in a partitioned dataset without reading any rows
+    """
+    prefix = f"{cluster_col}="
+    clusters = []
+    for name in os.listdir(path):
+        if name.startswith(prefix) and os.path.isdir(os.path.join(path, name)):
+            clusters.append(int(name[len(prefix):]))
+    return sorted(clusters)
+
+
+def read_clustered_dataset(path, clusters=None, columns=None, cluster_col=CLUSTER_COL,
+                           csv_path=None):
+    """
+    Load clustered customers, reading only the requested clusters and columns.
+
+    The cluster filter is pushed down to partition pruning and row-group
+    statistics, and ``columns`` is applied as a projection, so unselected
+    data is never decoded. If the Parquet dataset is missing and ``csv_path``
+    is given, the legacy CSV export is read and filtered instead.
+    """
+    if clusters is not None:
+        clusters = [int(c) for c in clusters]
+
+    if not os.path.isdir(path):
+        if csv_path is None or not os.path.exists(csv_path):
+            raise FileNotFoundError(f"Clustered dataset not found at {path}")
+        usecols = None
+        if columns is not None:
+            usecols = list(dict.fromkeys(list(columns) + [cluster_col]))
+        df = pd.read_csv(csv_path, usecols=usecols)
+        if clusters is not None:
+            df = df[df[cluster_col].isin(clusters)]
+        if columns is not None:
+            df = df[list(columns)]
+        return df.reset_index(drop=True)
+
+    dataset = ds.dataset(path, format='parquet', partitioning=_partitioning(cluster_col))
+    row_filter = None
+    if clusters is not None:
+        row_filter = ds.field(cluster_col).isin(clusters)
+
+    table = dataset.to_table(columns=list(columns) if columns is not None else None,
+                             filter=row_filter)
+    df = table.to_pandas()
+    if cluster_col in df.columns:
+        df[cluster_col] = df[cluster_col].astype('int64')
+    return df
+
+
+def open_clustered_dataset(path, cluster_col=CLUSTER_COL, csv_path=None):
+    """
+    Open the clustered data as a pyarrow Dataset (nothing is read yet).
+    The CSV export is opened the same way when the Parquet store is missing.
+    """
+    if os.path.isdir(path):
+        return ds.dataset(path, format='parquet', partitioning=_partitioning(cluster_col))
+    if csv_path is not None and os.path.exists(csv_path):
+        return ds.dataset(csv_path, format='csv')
+    raise FileNotFoundError(f"Clustered dataset not found at {path}")
+
+
+_FILTER_OPS = {
+    '==': lambda f, v: f == v,
+    '!=': lambda f, v: f != v,
+    '<': lambda f, v: f < v,
+    '<=': lambda f, v: f <= v,
+    '>': lambda f, v: f > v,
+    '>=': lambda f, v: f >= v,
+    'in': lambda f, v: f.isin(list(v)),
+    'contains': lambda f, v: pc.match_substring(f, str(v), ignore_case=True),
+}
+
+
+def build_filter(filters):
+    """
+    Turn [(column, op, value), ...] into a pyarrow expression (AND-ed).
+    Supported ops: ==, !=, <, <=, >, >=, in, contains.
+    """
+    expression = None
+    for column, op, value in filters or []:
+        if op not in _FILTER_OPS:
+            raise ValueError(f"Unsupported filter operator: {op}")
+        term = _FILTER_OPS[op](ds.field(column), value)
+        expression = term if expression is None else expression & term
+    return expression
+
+
+def query_page(path, filters=None, sort_by=None, ascending=True, offset=0, limit=50,
+               columns=None, cluster_col=CLUSTER_COL, csv_path=None):
+    """
+    Return one page of clustered customers and the total matching row count.
+
+    Filters are pushed down to the scan (partition pruning and row-group
+    statistics). When sorting, only the sort column is scanned to select
+    the top offset + limit row positions; the full rows are then fetched for
+    the visible page alone.
+    """
+    dataset = open_clustered_dataset(path, cluster_col=cluster_col, csv_path=csv_path)
+    row_filter = build_filter(filters)
+    total = dataset.count_rows(filter=row_filter)
+    columns = list(columns) if columns is not None else dataset.schema.names
+
+    offset = max(0, min(int(offset), total))
+    limit = max(0, min(int(limit), total - offset))
+    if limit == 0:
+        return pd.DataFrame(columns=columns), total
+
+    if sort_by is None:
+        indices = pa.array(range(offset, offset + limit), type=pa.int64())
+    else:
+        keys = dataset.to_table(columns=[sort_by], filter=row_filter)
+        order = 'ascending' if ascending else 'descending'
+        top = pc.select_k_unstable(keys, k=offset + limit, sort_keys=[(sort_by, order)])
+        if len(top) < offset + limit:
+            # select_k skips nulls; they sort last
+            null_rows = pc.indices_nonzero(pc.is_null(keys.column(sort_by)))
+            top = pa.concat_arrays([top, null_rows.cast(top.type)])
+        indices = top.slice(offset, limit)
+
+    page = dataset.take(indices, columns=columns, filter=row_filter).to_pandas()
+    if cluster_col in page.columns:
+        page[cluster_col] = page[cluster_col].astype('int64')
+    return page, total
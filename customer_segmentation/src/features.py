@@ -0,0 +1,67 @@
+"""
+Derived features, declared once.
+
+Each entry maps a feature name to an operator and its input columns. A
+feature is evaluated as one vectorized expression over whole columns, so the
+same definition serves a training frame, a scoring chunk, a dict of NumPy
+arrays or a single record of scalars. DataPreprocessor keeps the registry it
+was fitted with, which means training, batch scoring and per-request
+inference all derive the same values. Entries are evaluated in order, so a
+later feature may use an earlier one as input.
+"""
+from functools import reduce
+
+import numpy as np
+
+DERIVED_FEATURES = {
+    'TotalSpend': ('mul', ('PurchaseFrequency', 'AvgOrderValue')),
+}
+
+OPERATORS = {
+    'add': np.add,
+    'sub': np.subtract,
+    'mul': np.multiply,
+    'div': np.divide,
+}
+
+
+def derive_features(columns, derived=DERIVED_FEATURES):
+    """
+    Evaluate the derived features over `columns` (a DataFrame or any mapping
+    of column name -> values). Returns {name: values} for every feature
+    whose inputs are all available; the others are skipped.
+    """
+    values = {}
+    for name, (operator, inputs) in derived.items():
+        if operator not in OPERATORS:
+            raise ValueError(f"Unknown operator {operator!r} for derived feature {name}")
+        if not all(col in values or col in columns for col in inputs):
+            continue
+        operands = [values[col] if col in values else columns[col] for col in inputs]
+        values[name] = reduce(OPERATORS[operator], operands)
+    return values
+
+
+def required_features(columns, derived=DERIVED_FEATURES):
+    """
+    The registry entries needed to compute the derived features among
+    `columns`, including derived intermediates they are built from, in
+    registry order
+    """
+    needed = {col for col in columns if col in derived}
+    # Inputs always precede the features built from them
+    for name in reversed(list(derived)):
+        if name in needed:
+            needed.update(col for col in derived[name][1] if col in derived)
+    return {name: spec for name, spec in derived.items() if name in needed}
+
+
+def input_columns(columns, derived=DERIVED_FEATURES):
+    """
+    Raw columns to read to build `columns`: the ones that are not derived,
+    plus the inputs of the derived ones
+    """
+    required = required_features(columns, derived)
+    raw = [col for col in columns if col not in required]
+    raw += [col for _, inputs in required.values() for col in inputs if col not in required]
+    return list(dict.fromkeys(raw))
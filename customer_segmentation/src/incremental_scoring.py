@@ -0,0 +1,256 @@
+"""
+Incremental re-scoring of the customer base.
+
+The assignment table keeps, per CustomerID, a 64-bit fingerprint of the
+feature values, the assigned cluster, the distance to its centre and the
+version of the model that scored it. A rescore run fingerprints the new data,
+diffs it against the table with vectorized lookups and sends only new and
+changed customers through DataPreprocessor and CustomerSegmentation.predict.
+When the model version differs from the table's, every customer is rescored.
+The run writes the updated table and a change log of new, changed, removed
+and reassigned customers.
+
+Usage (from the customer_segmentation directory):
+    python -m src.incremental_scoring data/customers.csv
+"""
+import argparse
+import hashlib
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_DIR not in sys.path:
+    sys.path.append(PROJECT_DIR)
+
+from src.batch_scoring import prepare_features, score_chunk
+
+DEFAULT_MODEL_PATH = os.path.join(PROJECT_DIR, 'model', 'kmeans_model.pkl')
+DEFAULT_PREPROCESSOR_PATH = os.path.join(PROJECT_DIR, 'model', 'preprocessor.pkl')
+DEFAULT_ASSIGNMENTS_PATH = os.path.join(PROJECT_DIR, 'data', 'customer_assignments.parquet')
+DEFAULT_CHANGES_DIR = os.path.join(PROJECT_DIR, 'data', 'assignment_changes')
+SCORE_CHUNK_ROWS = 100_000
+
+
+def model_version(*paths):
+    """
+    Short content hash of the model artifacts (model and preprocessor pickles)
+    """
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+def row_fingerprints(df, columns):
+    """
+    uint64 hash per row of the given feature columns. Numeric values are
+    hashed as float64 and others as strings, so dtype differences between
+    CSV and Parquet reads of the same values do not count as changes.
+    """
+    normalized = {}
+    for col in columns:
+        values = df[col] if col in df.columns else pd.Series(pd.NA, index=df.index)
+        if pd.api.types.is_numeric_dtype(values):
+            normalized[col] = values.astype('float64')
+        else:
+            normalized[col] = values.astype('string')
+    return pd.util.hash_pandas_object(pd.DataFrame(normalized), index=False).to_numpy()
+
+
+def build_assignments(customer_ids, fingerprints, labels, distances, version, scored_at=None):
+    """
+    Assignment table in its stored layout (one row per CustomerID)
+    """
+    scored_at = scored_at or datetime.now(timezone.utc)
+    return pd.DataFrame({
+        'CustomerID': pd.Series(customer_ids, dtype='string').to_numpy(),
+        'Fingerprint': np.asarray(fingerprints, dtype=np.uint64),
+        'Cluster': np.asarray(labels, dtype=np.int32),
+        'Distance': np.asarray(distances, dtype=np.float32),
+        'ModelVersion': version,
+        'ScoredAt': pd.Timestamp(scored_at),
+    })
+
+
+def read_assignments(path):
+    if not os.path.exists(path):
+        return None
+    return pd.read_parquet(path)
+
+
+def write_assignments(assignments, path):
+    """
+    Replace the assignment table atomically
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    assignments.to_parquet(tmp_path, index=False, compression='snappy')
+    os.replace(tmp_path, path)
+    return path
+
+
+def _score(df, model, preprocessor, chunk_rows=SCORE_CHUNK_ROWS):
+    labels = np.empty(len(df), dtype=np.int32)
+    distances = np.empty(len(df), dtype=np.float64)
+    for start in range(0, len(df), chunk_rows):
+        chunk = df.iloc[start:start + chunk_rows].copy()
+        labels[start:start + len(chunk)], distances[start:start + len(chunk)] = \
+            score_chunk(chunk, model, preprocessor)
+    return labels, distances
+
+
+def rescore(df, model, preprocessor, version, previous=None, id_column='CustomerID',
+            chunk_rows=SCORE_CHUNK_ROWS):
+    """
+    Assign clusters to the customers in df, reusing previous assignments
+    whose fingerprint and model version are unchanged.
+
+    Returns (assignments, changes, summary): the full updated table, the
+    change log rows (Change is 'new', 'changed', 'removed' or, after a model
+    change, 'reassigned') and counts.
+    """
+    start = time.perf_counter()
+    scored_at = datetime.now(timezone.utc)
+    duplicates = int(df[id_column].duplicated(keep='last').sum())
+    if duplicates:
+        df = df.drop_duplicates(id_column, keep='last')
+    df = prepare_features(df.reset_index(drop=True), preprocessor)
+    ids = df[id_column].astype('string').to_numpy()
+    fingerprints = row_fingerprints(df, preprocessor.feature_columns)
+
+    full = previous is None or len(previous) == 0 or not (previous['ModelVersion'] == version).all()
+    if previous is None:
+        previous = build_assignments([], [], [], [], version)
+    # Object-dtype indexes hash noticeably faster than the 'string' extension dtype
+    position = pd.Index(previous['CustomerID'].astype('string').to_numpy(dtype=object)).get_indexer(
+        ids.astype(object))
+    known = position >= 0
+    same = known.copy()
+    same[known] = previous['Fingerprint'].to_numpy()[position[known]] == fingerprints[known]
+    todo = np.ones(len(df), dtype=bool) if full else ~same
+
+    labels = np.empty(len(df), dtype=np.int32)
+    distances = np.empty(len(df), dtype=np.float64)
+    kept = ~todo
+    labels[kept] = previous['Cluster'].to_numpy()[position[kept]]
+    distances[kept] = previous['Distance'].to_numpy()[position[kept]]
+    if todo.any():
+        labels[todo], distances[todo] = _score(df.loc[todo], model, preprocessor, chunk_rows)
+
+    assignments = build_assignments(ids, fingerprints, labels, distances, version, scored_at)
+    if not full and kept.any():
+        # Unchanged customers keep the time they were last scored (moved as
+        # integer microseconds; per-element timestamps are slow)
+        times = assignments['ScoredAt'].astype('datetime64[us, UTC]').array.asi8.copy()
+        times[kept] = previous['ScoredAt'].astype('datetime64[us, UTC]').array.asi8[position[kept]]
+        assignments['ScoredAt'] = pd.to_datetime(times, unit='us', utc=True)
+
+    old_labels = pd.array(np.zeros(len(df), dtype=np.int32), dtype='Int32')
+    old_labels[known] = previous['Cluster'].to_numpy()[position[known]]
+    old_labels[~known] = pd.NA
+    change = np.full(len(df), '', dtype=object)
+    change[~known] = 'new'
+    change[known & ~same] = 'changed'
+    change[same & todo & (old_labels.to_numpy(dtype=np.int64, na_value=-1) != labels)] = 'reassigned'
+    logged = change != ''
+    removed = np.ones(len(previous), dtype=bool)
+    removed[position[known]] = False
+    changes = pd.concat([
+        pd.DataFrame({
+            'CustomerID': ids[logged],
+            'Change': change[logged],
+            'OldCluster': old_labels[logged],
+            'NewCluster': pd.array(labels[logged], dtype='Int32'),
+        }),
+        pd.DataFrame({
+            'CustomerID': previous['CustomerID'].astype('string').to_numpy()[removed],
+            'Change': 'removed',
+            'OldCluster': pd.array(previous['Cluster'].to_numpy()[removed], dtype='Int32'),
+            'NewCluster': pd.array([pd.NA] * int(removed.sum()), dtype='Int32'),
+        }),
+    ], ignore_index=True)
+    changes['ModelVersion'] = version
+    changes['ChangedAt'] = pd.Timestamp(scored_at)
+
+    summary = {
+        'rows': len(df),
+        'rescored': int(todo.sum()),
+        'reused': int(kept.sum()),
+        'new': int((~known).sum()),
+        'changed': int((known & ~same).sum()),
+        'removed': int(removed.sum()),
+        'reassigned': int((change == 'reassigned').sum()),
+        'duplicates_dropped': duplicates,
+        'full_rescore': bool(full),
+        'model_version': version,
+        'seconds': time.perf_counter() - start,
+    }
+    return assignments, changes, summary
+
+
+def write_changes(changes, changes_dir, scored_at=None):
+    """
+    Write one run's change log as its own Parquet file in changes_dir
+    """
+    scored_at = scored_at or datetime.now(timezone.utc)
+    os.makedirs(changes_dir, exist_ok=True)
+    path = os.path.join(changes_dir, f"changes-{scored_at.strftime('%Y%m%dT%H%M%S%fZ')}.parquet")
+    changes.to_parquet(path, index=False)
+    return path
+
+
+def read_inputs(paths, id_column='CustomerID'):
+    from src.bulk_scoring import discover_inputs
+    files = discover_inputs(paths)
+    if not files:
+        raise FileNotFoundError(f"No CSV or Parquet inputs in {paths}")
+    frames = [pd.read_parquet(f) if f.endswith('.parquet') else pd.read_csv(f) for f in files]
+    df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+    if id_column not in df.columns:
+        raise ValueError(f"Input has no {id_column} column")
+    return df
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Rescore only new and changed customers")
+    parser.add_argument('inputs', nargs='+', help="CSV/Parquet files, directories or glob patterns")
+    parser.add_argument('--assignments', default=DEFAULT_ASSIGNMENTS_PATH,
+                        help="Assignment table to diff against and update")
+    parser.add_argument('--changes-dir', default=DEFAULT_CHANGES_DIR, help="Directory for change logs")
+    parser.add_argument('--model', default=DEFAULT_MODEL_PATH)
+    parser.add_argument('--preprocessor', default=DEFAULT_PREPROCESSOR_PATH)
+    parser.add_argument('--id-column', default='CustomerID')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    import joblib
+    from src.clustering_model import CustomerSegmentation
+    args = parse_args(argv)
+    model = CustomerSegmentation.load_model(args.model)
+    preprocessor = joblib.load(args.preprocessor)
+    version = model_version(args.model, args.preprocessor)
+
+    df = read_inputs(args.inputs, args.id_column)
+    previous = read_assignments(args.assignments)
+    assignments, changes, summary = rescore(df, model, preprocessor, version, previous,
+                                            id_column=args.id_column)
+    write_assignments(assignments, args.assignments)
+    changes_path = write_changes(changes, args.changes_dir)
+    print(f"{summary['rows']:,} customers: rescored {summary['rescored']:,}, reused {summary['reused']:,} "
+          f"({summary['new']:,} new, {summary['changed']:,} changed, {summary['removed']:,} removed"
+          f"{', full rescore for model ' + version if summary['full_rescore'] else ''}) "
+          f"in {summary['seconds']:.1f}s")
+    print(f"Assignments written to {args.assignments}; change log {changes_path}")
+    return summary
+
+
+if __name__ == "__main__":
+    main()
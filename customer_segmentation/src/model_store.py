@@ -0,0 +1,240 @@
+"""
+Model store for serving several segmentations side by side.
+
+Each model lives in its own directory under the store root, laid out as the
+training pipeline writes it with --model-dir and --data-dir pointing at that
+directory:
+
+    model_store/
+        brand_a/kmeans_model.pkl
+        brand_a/preprocessor.pkl
+        brand_a/customers_clustered.parquet/   (optional, for cluster profiles)
+
+Loaded models are kept in an LRU cache bounded by total bytes. Concurrent
+requests for a model that is not loaded yet share a single load. A model is
+reloaded when its files change on disk.
+"""
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+MODEL_FILE = 'kmeans_model.pkl'
+PREPROCESSOR_FILE = 'preprocessor.pkl'
+CLUSTERED_PARQUET = 'customers_clustered.parquet'
+CLUSTERED_CSV = 'customers_clustered.csv'
+DEFAULT_MODEL_ID = 'default'
+DEFAULT_CACHE_BYTES = 256 * 2**20
+MODEL_ID_PATTERN = re.compile(r'^[A-Za-z0-9][A-Za-z0-9_.-]{0,127}$')
+
+
+def model_paths(model_dir, data_dir=None):
+    """
+    Artifact paths of a model whose files live in model_dir (and data_dir
+    for the clustered customers, model_dir by default)
+    """
+    data_dir = data_dir or model_dir
+    return {
+        'model': os.path.join(model_dir, MODEL_FILE),
+        'preprocessor': os.path.join(model_dir, PREPROCESSOR_FILE),
+        'clustered_parquet': os.path.join(data_dir, CLUSTERED_PARQUET),
+        'clustered_csv': os.path.join(data_dir, CLUSTERED_CSV),
+    }
+
+
+class LoadedModel:
+    """
+    A segmentation model with its fitted preprocessor, as held in the cache
+    """
+    def __init__(self, model_id, model, preprocessor, paths, nbytes, token):
+        self.model_id = model_id
+        self.model = model
+        self.preprocessor = preprocessor
+        self.paths = paths
+        self.nbytes = nbytes
+        self.token = token
+        self.loaded_at = time.time()
+        self._compiled = None
+
+    @property
+    def compiled(self):
+        """
+        CompiledModel for vectorized batch scoring, built on first use
+        """
+        if self._compiled is None:
+            from src.batch_scoring import CompiledModel
+            self._compiled = CompiledModel.from_artifacts(self.preprocessor, self.model)
+        return self._compiled
+
+
+class _PendingLoad:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class ModelStore:
+    """
+    Resolves model ids to directories under root and serves loaded models
+    from a byte-bounded LRU cache
+
+        store = ModelStore('model_store', default_paths=model_paths('model', 'data'))
+        entry = store.get('brand_a')
+        entry.model.predict(entry.preprocessor.preprocess(df, fit=False))
+    """
+    def __init__(self, root, default_paths=None, max_bytes=DEFAULT_CACHE_BYTES):
+        self.root = root
+        self.default_paths = default_paths
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._loading = {}
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def resolve(self, model_id):
+        """
+        Artifact paths for model_id; raises KeyError for unknown or
+        malformed ids
+        """
+        if model_id == DEFAULT_MODEL_ID and self.default_paths is not None:
+            paths = self.default_paths
+        elif MODEL_ID_PATTERN.match(model_id):
+            paths = model_paths(os.path.join(self.root, model_id))
+        else:
+            raise KeyError(model_id)
+        if not (os.path.exists(paths['model']) and os.path.exists(paths['preprocessor'])):
+            raise KeyError(model_id)
+        return paths
+
+    def list_models(self):
+        model_ids = []
+        if self.default_paths is not None and os.path.exists(self.default_paths['model']):
+            model_ids.append(DEFAULT_MODEL_ID)
+        if os.path.isdir(self.root):
+            for name in sorted(os.listdir(self.root)):
+                if (MODEL_ID_PATTERN.match(name) and name not in model_ids
+                        and os.path.exists(os.path.join(self.root, name, MODEL_FILE))):
+                    model_ids.append(name)
+        return model_ids
+
+    @staticmethod
+    def _token(paths):
+        stats = [os.stat(paths[name]) for name in ('model', 'preprocessor')]
+        return tuple((st.st_mtime_ns, st.st_size) for st in stats)
+
+    def _model_stats(self, model_id):
+        return self._stats.setdefault(model_id, {
+            'hits': 0, 'misses': 0, 'coalesced': 0, 'loads': 0, 'evictions': 0,
+            'load_seconds_total': 0.0, 'last_load_ms': None, 'last_used': None,
+        })
+
+    def _load(self, model_id, paths, token):
+        import joblib
+        from src.clustering_model import CustomerSegmentation
+        model = CustomerSegmentation.load_model(paths['model'])
+        preprocessor = joblib.load(paths['preprocessor'])
+        # The pickled size stands in for the resident size
+        nbytes = sum(size for _, size in token)
+        return LoadedModel(model_id, model, preprocessor, paths, nbytes, token)
+
+    def get(self, model_id):
+        """
+        The loaded model for model_id, loading it (once, however many
+        callers ask at the same time) when it is not cached or has changed
+        on disk
+        """
+        paths = self.resolve(model_id)
+        try:
+            token = self._token(paths)
+        except FileNotFoundError:
+            raise KeyError(model_id) from None
+
+        with self._lock:
+            stats = self._model_stats(model_id)
+            stats['last_used'] = time.time()
+            entry = self._entries.get(model_id)
+            if entry is not None and entry.token == token:
+                self._entries.move_to_end(model_id)
+                stats['hits'] += 1
+                return entry
+            pending = self._loading.get(model_id)
+            leader = pending is None
+            if leader:
+                pending = self._loading[model_id] = _PendingLoad()
+                stats['misses'] += 1
+            else:
+                stats['coalesced'] += 1
+
+        if not leader:
+            pending.event.wait()
+            if pending.error is not None:
+                raise pending.error
+            return pending.result
+
+        start = time.perf_counter()
+        try:
+            entry = self._load(model_id, paths, token)
+        except Exception as e:
+            pending.error = e
+            with self._lock:
+                del self._loading[model_id]
+            pending.event.set()
+            raise
+        seconds = time.perf_counter() - start
+
+        with self._lock:
+            stats['loads'] += 1
+            stats['load_seconds_total'] += seconds
+            stats['last_load_ms'] = seconds * 1e3
+            self._entries[model_id] = entry
+            self._entries.move_to_end(model_id)
+            self._evict(keep=model_id)
+            del self._loading[model_id]
+        pending.result = entry
+        pending.event.set()
+        return entry
+
+    def _evict(self, keep):
+        while self.resident_bytes > self.max_bytes and len(self._entries) > 1:
+            model_id = next(iter(self._entries))
+            if model_id == keep:
+                break
+            del self._entries[model_id]
+            self._stats[model_id]['evictions'] += 1
+
+    @property
+    def resident_bytes(self):
+        return sum(entry.nbytes for entry in self._entries.values())
+
+    def evict(self, model_id=None):
+        """
+        Drop one model (or all of them) from the cache
+        """
+        with self._lock:
+            if model_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(model_id, None)
+
+    def stats(self):
+        """
+        Cache residency and per-model hit, load and latency counters
+        """
+        with self._lock:
+            models = {}
+            for model_id, stats in self._stats.items():
+                entry = self._entries.get(model_id)
+                models[model_id] = dict(
+                    stats,
+                    resident=entry is not None,
+                    bytes=entry.nbytes if entry is not None else 0,
+                    mean_load_ms=stats['load_seconds_total'] * 1e3 / stats['loads'] if stats['loads'] else None,
+                )
+            return {
+                'max_bytes': self.max_bytes,
+                'resident_bytes': self.resident_bytes,
+                'resident_models': list(self._entries),
+                'models': models,
+            }
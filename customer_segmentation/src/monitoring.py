@@ -0,0 +1,341 @@
+"""
+Streaming input-drift monitoring for the prediction paths.
+
+The training pipeline saves reference statistics: fixed bins per input feature
+(deciles for numeric features, the known categories for categorical ones),
+cluster frequencies and the distribution of distance-to-centroid. A
+DriftMonitor keeps constant-size counts over those same bins for the
+traffic it sees. Drift against the reference is scored with the Population
+Stability Index (PSI) and a binned Kolmogorov-Smirnov statistic. Single
+records update plain Python lists (a few microseconds per record), and
+batches are binned with vectorized NumPy.
+"""
+import bisect
+import json
+import os
+import threading
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+REFERENCE_QUANTILES = np.linspace(0.1, 0.9, 9)
+DISTANCE_QUANTILES = np.linspace(0.05, 0.95, 19)
+PSI_EPSILON = 1e-4
+# Usual PSI reading: < 0.1 stable, 0.1-0.25 moderate shift, > 0.25 significant
+PSI_THRESHOLDS = (0.1, 0.25)
+
+
+def _numeric_edges(values, quantiles):
+    values = values[~np.isnan(values)]
+    if not len(values):
+        return []
+    return np.unique(np.quantile(values, quantiles)).tolist()
+
+
+def _bin_numeric(values, edges):
+    """
+    Bucket index per value: 0..len(edges) by the inner edges, and
+    len(edges) + 1 for missing values
+    """
+    values = np.asarray(values, dtype=np.float64)
+    index = np.searchsorted(np.asarray(edges, dtype=np.float64), values, side='right')
+    index[np.isnan(values)] = len(edges) + 1
+    return np.bincount(index, minlength=len(edges) + 2)
+
+
+def _bin_categorical(values, categories):
+    """
+    Bucket index per value: the category position, or len(categories) for
+    missing and unseen values
+    """
+    codes = pd.Categorical(values, categories=categories).codes.astype(np.int64)
+    codes[codes < 0] = len(categories)
+    return np.bincount(codes, minlength=len(categories) + 1)
+
+
+def build_reference(df, labels, distances, feature_columns, categorical_columns, n_clusters):
+    """
+    Reference statistics of the training customers, as a JSON-serialisable
+    dict: per-feature bins and counts, cluster frequencies and the
+    distance-to-centroid distribution (overall and mean per cluster)
+    """
+    features = {}
+    for col in feature_columns:
+        if col in categorical_columns:
+            categories = sorted(df[col].dropna().astype(str).unique().tolist())
+            features[col] = {'type': 'categorical', 'categories': categories,
+                             'counts': _bin_categorical(df[col], categories).tolist()}
+        else:
+            values = pd.to_numeric(df[col]).to_numpy(dtype=np.float64, na_value=np.nan)
+            edges = _numeric_edges(values, REFERENCE_QUANTILES)
+            features[col] = {'type': 'numeric', 'edges': edges,
+                             'counts': _bin_numeric(values, edges).tolist()}
+
+    labels = np.asarray(labels)
+    distances = np.asarray(distances, dtype=np.float64)
+    distance_edges = _numeric_edges(distances, DISTANCE_QUANTILES)
+    distance_sums = np.bincount(labels, weights=distances, minlength=n_clusters)
+    cluster_counts = np.bincount(labels, minlength=n_clusters)
+    return {
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'n_rows': int(len(df)),
+        'features': features,
+        'clusters': {'counts': cluster_counts.tolist()},
+        'distance': {
+            'edges': distance_edges,
+            'counts': _bin_numeric(distances, distance_edges).tolist(),
+            'mean': float(distances.mean()) if len(distances) else 0.0,
+            'mean_by_cluster': (distance_sums / np.maximum(cluster_counts, 1)).tolist(),
+        },
+    }
+
+
+def save_reference(reference, path):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(reference, f, indent=1)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_reference(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def psi(reference_counts, current_counts, epsilon=PSI_EPSILON):
+    """
+    Population Stability Index between two count vectors over the same bins
+    """
+    ref = np.asarray(reference_counts, dtype=np.float64)
+    cur = np.asarray(current_counts, dtype=np.float64)
+    if ref.sum() == 0 or cur.sum() == 0:
+        return None
+    ref = np.maximum(ref / ref.sum(), epsilon)
+    cur = np.maximum(cur / cur.sum(), epsilon)
+    return float(np.sum((cur - ref) * np.log(cur / ref)))
+
+
+def ks_binned(reference_counts, current_counts):
+    """
+    Kolmogorov-Smirnov statistic on binned data: the largest gap between
+    the two cumulative distributions at the bin edges
+    """
+    ref = np.asarray(reference_counts, dtype=np.float64)
+    cur = np.asarray(current_counts, dtype=np.float64)
+    if ref.sum() == 0 or cur.sum() == 0:
+        return None
+    return float(np.max(np.abs(np.cumsum(ref) / ref.sum() - np.cumsum(cur) / cur.sum())))
+
+
+def psi_status(value):
+    if value is None:
+        return 'no data'
+    if value < PSI_THRESHOLDS[0]:
+        return 'stable'
+    if value < PSI_THRESHOLDS[1]:
+        return 'moderate'
+    return 'significant'
+
+
+class DriftMonitor:
+    """
+    Constant-memory sketch of the records scored since creation (or the
+    last reset), compared against a training reference
+
+        monitor = DriftMonitor.load('model/drift_reference.json')
+        monitor.update({'Age': 41, 'Gender': 'Male', ...}, cluster=1, distance=2.3)
+        monitor.report()
+    """
+    def __init__(self, reference):
+        self.reference = reference
+        self._lock = threading.Lock()
+        self._numeric = []
+        self._categorical = []
+        for name, spec in reference['features'].items():
+            if spec['type'] == 'numeric':
+                self._numeric.append((name, spec['edges']))
+            else:
+                index = {category: i for i, category in enumerate(spec['categories'])}
+                self._categorical.append((name, index))
+        self._distance_edges = reference['distance']['edges']
+        self.reset()
+
+    @classmethod
+    def load(cls, path):
+        return cls(load_reference(path))
+
+    def reset(self):
+        with self._lock:
+            self.n = 0
+            self.since = datetime.now(timezone.utc).isoformat()
+            self.feature_counts = {name: [0] * len(spec['counts'])
+                                   for name, spec in self.reference['features'].items()}
+            n_clusters = len(self.reference['clusters']['counts'])
+            self.cluster_counts = [0] * n_clusters
+            self.distance_counts = [0] * len(self.reference['distance']['counts'])
+            self.distance_sums = [0.0] * n_clusters
+            # Per cluster, the assignments that came with a distance
+            self.distance_cluster_counts = [0] * n_clusters
+
+    def update(self, record, cluster=None, distance=None):
+        """
+        Add one record (a dict of raw feature values) with its assigned
+        cluster and distance to that cluster's centre
+        """
+        with self._lock:
+            self.n += 1
+            counts = self.feature_counts
+            for name, edges in self._numeric:
+                value = record.get(name)
+                if value is None or value != value:
+                    counts[name][-1] += 1
+                else:
+                    counts[name][bisect.bisect_right(edges, value)] += 1
+            for name, index in self._categorical:
+                counts[name][index.get(record.get(name), -1)] += 1
+            if cluster is not None:
+                self._add_assignment(cluster, distance)
+
+    def _add_assignment(self, cluster, distance):
+        if 0 <= cluster < len(self.cluster_counts):
+            self.cluster_counts[cluster] += 1
+            if distance is not None:
+                self.distance_sums[cluster] += distance
+                self.distance_cluster_counts[cluster] += 1
+                self.distance_counts[bisect.bisect_right(self._distance_edges, distance)] += 1
+
+    def update_batch(self, df, labels=None, distances=None):
+        """
+        Add a DataFrame of raw records, binned with vectorized operations
+        """
+        binned = {}
+        for name, spec in self.reference['features'].items():
+            if name not in df.columns:
+                continue
+            if spec['type'] == 'numeric':
+                values = pd.to_numeric(df[name]).to_numpy(dtype=np.float64, na_value=np.nan)
+                binned[name] = _bin_numeric(values, spec['edges'])
+            else:
+                binned[name] = _bin_categorical(df[name], spec['categories'])
+
+        clusters = distance_bins = distance_sums = distance_clusters = None
+        if labels is not None:
+            labels = np.asarray(labels)
+            n_clusters = len(self.cluster_counts)
+            valid = (labels >= 0) & (labels < n_clusters)
+            clusters = np.bincount(labels[valid], minlength=n_clusters)
+            if distances is not None:
+                distances = np.asarray(distances, dtype=np.float64)[valid]
+                distance_sums = np.bincount(labels[valid], weights=distances, minlength=n_clusters)
+                distance_clusters = clusters
+                distance_bins = _bin_numeric(distances, self._distance_edges)
+
+        with self._lock:
+            self.n += len(df)
+            for name, counts in binned.items():
+                self.feature_counts[name] = [a + int(b) for a, b in zip(self.feature_counts[name], counts)]
+            if clusters is not None:
+                self.cluster_counts = [a + int(b) for a, b in zip(self.cluster_counts, clusters)]
+            if distance_sums is not None:
+                self.distance_sums = [a + float(b) for a, b in zip(self.distance_sums, distance_sums)]
+                self.distance_cluster_counts = [a + int(b) for a, b in
+                                                zip(self.distance_cluster_counts, distance_clusters)]
+                self.distance_counts = [a + int(b) for a, b in zip(self.distance_counts, distance_bins)]
+
+    def merge(self, other):
+        """
+        Add another monitor's counts (same reference), e.g. from a worker
+        """
+        with self._lock:
+            self.n += other.n
+            for name, counts in other.feature_counts.items():
+                self.feature_counts[name] = [a + b for a, b in zip(self.feature_counts[name], counts)]
+            self.cluster_counts = [a + b for a, b in zip(self.cluster_counts, other.cluster_counts)]
+            self.distance_sums = [a + b for a, b in zip(self.distance_sums, other.distance_sums)]
+            self.distance_cluster_counts = [a + b for a, b in
+                                            zip(self.distance_cluster_counts, other.distance_cluster_counts)]
+            self.distance_counts = [a + b for a, b in zip(self.distance_counts, other.distance_counts)]
+        return self
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def report(self):
+        """
+        Drift scores per feature, for cluster frequencies and for the
+        distance-to-centroid distribution
+        """
+        with self._lock:
+            feature_counts = {name: list(c) for name, c in self.feature_counts.items()}
+            cluster_counts = list(self.cluster_counts)
+            distance_counts = list(self.distance_counts)
+            distance_sums = list(self.distance_sums)
+            distance_cluster_counts = list(self.distance_cluster_counts)
+            n = self.n
+
+        features = {}
+        for name, spec in self.reference['features'].items():
+            current = feature_counts[name]
+            entry = {'type': spec['type'], 'psi': psi(spec['counts'], current)}
+            if spec['type'] == 'numeric':
+                # KS over the ordered bins; the missing bucket is excluded
+                entry['ks'] = ks_binned(spec['counts'][:-1], current[:-1])
+                entry['missing_rate'] = current[-1] / n if n else None
+            else:
+                entry['unseen_rate'] = current[-1] / n if n else None
+            entry['status'] = psi_status(entry['psi'])
+            features[name] = entry
+
+        reference_clusters = self.reference['clusters']['counts']
+        ref_total, cur_total = sum(reference_clusters), sum(cluster_counts)
+        cluster_psi = psi(reference_clusters, cluster_counts)
+        ref_distance = self.reference['distance']
+        assigned_with_distance = sum(distance_counts)
+        clusters = {
+            'psi': cluster_psi,
+            'status': psi_status(cluster_psi),
+            'frequencies': {
+                str(c): {
+                    'reference': reference_clusters[c] / ref_total if ref_total else None,
+                    'current': cluster_counts[c] / cur_total if cur_total else None,
+                    'reference_mean_distance': ref_distance['mean_by_cluster'][c],
+                    'current_mean_distance': (distance_sums[c] / distance_cluster_counts[c]
+                                              if distance_cluster_counts[c] else None),
+                }
+                for c in range(len(reference_clusters))
+            },
+        }
+        distance_psi = psi(ref_distance['counts'], distance_counts)
+        distance = {
+            'psi': distance_psi,
+            'ks': ks_binned(ref_distance['counts'][:-1], distance_counts[:-1]),
+            'status': psi_status(distance_psi),
+            'reference_mean': ref_distance['mean'],
+            'current_mean': sum(distance_sums) / assigned_with_distance if assigned_with_distance else None,
+        }
+
+        scores = [e['psi'] for e in features.values()] + [cluster_psi, distance_psi]
+        scores = [s for s in scores if s is not None]
+        max_psi = max(scores) if scores else None
+        return {
+            'n': n,
+            'since': self.since,
+            'reference_rows': self.reference['n_rows'],
+            'reference_created_at': self.reference.get('created_at'),
+            'max_psi': max_psi,
+            'status': psi_status(max_psi),
+            'features': features,
+            'clusters': clusters,
+            'distance': distance,
+        }
@@ -0,0 +1,596 @@
+"""
+Stage-cached training pipeline.
+
+Stages: load -> preprocess -> coreset -> sweep -> train -> assign -> embed -> reference
+-> index -> profile -> export.
+Every stage result is stored under a content address: the SHA-256 of the
+stage name, its parameters and the addresses of the stages it depends on,
+with the load stage keyed on the input file contents. Re-running with the
+same data and parameters reuses cached results. Changing one parameter only
+re-runs the stages downstream of it.
+
+Usage (from the customer_segmentation directory):
+    python -m src.pipeline --max-k 10
+    python -m src.pipeline --n-clusters 4 --force train
+    python -m src.pipeline --force all --profile trace.json
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sys
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_DIR not in sys.path:
+    sys.path.append(PROJECT_DIR)
+
+from src.data_preprocessing import DataPreprocessor, downcast_numeric
+from src.clustering_model import CustomerSegmentation, build_coreset
+from src.utils import (compute_cluster_stats, get_cluster_profiles, generate_cluster_insights,
+                       bin_cluster_density)
+from src.data_store import write_clustered_dataset, write_embedding
+from src.profiling import Profiler, span
+from src.batch_scoring import CompiledModel
+from src.monitoring import build_reference, save_reference
+from src.customer_index import write_customer_index
+from src.incremental_scoring import build_assignments, model_version, row_fingerprints, write_assignments
+
+STAGES = ['load', 'preprocess', 'coreset', 'sweep', 'train', 'assign', 'embed', 'reference', 'index',
+          'profile', 'export']
+
+DEPENDENCIES = {
+    'load': [],
+    'preprocess': ['load'],
+    'coreset': ['preprocess'],
+    'sweep': ['preprocess', 'coreset'],
+    'train': ['preprocess', 'sweep', 'coreset'],
+    'assign': ['load', 'preprocess', 'train'],
+    'embed': ['preprocess', 'assign'],
+    'reference': ['preprocess', 'train', 'assign'],
+    'index': ['preprocess', 'train', 'assign'],
+    'profile': ['assign'],
+    'export': ['preprocess', 'sweep', 'train', 'assign', 'embed', 'reference', 'index'],
+}
+
+DEFAULT_CONFIG = {
+    'input': os.path.join(PROJECT_DIR, 'data', 'customers.csv'),
+    'model_dir': os.path.join(PROJECT_DIR, 'model'),
+    'data_dir': os.path.join(PROJECT_DIR, 'data'),
+    'cache_dir': os.path.join(PROJECT_DIR, '.pipeline_cache'),
+    'remove_outliers': True,
+    'low_memory': False,
+    'max_k': 10,
+    'method': 'both',
+    'n_clusters': None,
+    'random_state': 42,
+    'embed_bins': 80,
+    'embed_fit_rows': 200_000,
+    'coreset_size': None,
+    'coreset_compare': False,
+    'hierarchical': False,
+    'max_sub_k': 10,
+    'workers': None,
+}
+
+
+def input_files(path):
+    """
+    The data files behind an input path (a file or a directory of shards)
+    """
+    if os.path.isdir(path):
+        files = sorted(glob.glob(os.path.join(path, '*.parquet')) + glob.glob(os.path.join(path, '*.csv')))
+        if not files:
+            raise FileNotFoundError(f"No CSV or Parquet files in {path}")
+        return files
+    return [path]
+
+
+class StageCache:
+    """
+    Content-addressed on-disk store for stage results
+    """
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+        self._hash_index_path = os.path.join(cache_dir, 'file_hashes.json')
+        try:
+            with open(self._hash_index_path) as f:
+                self._hash_index = json.load(f)
+        except (OSError, ValueError):
+            self._hash_index = {}
+
+    @staticmethod
+    def key(*parts):
+        payload = json.dumps(parts, sort_keys=True, default=str).encode()
+        return hashlib.sha256(payload).hexdigest()
+
+    def file_hash(self, path):
+        """
+        SHA-256 of a file, remembered per (path, size, mtime) so unchanged
+        inputs are not re-read on every run
+        """
+        stat = os.stat(path)
+        path = os.path.abspath(path)
+        entry = self._hash_index.get(path)
+        if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            return entry['sha256']
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        self._hash_index[path] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                                  'sha256': digest.hexdigest()}
+        with open(self._hash_index_path, 'w') as f:
+            json.dump(self._hash_index, f, indent=1)
+        return digest.hexdigest()
+
+    def path(self, stage, key):
+        return os.path.join(self.cache_dir, f"{stage}-{key[:20]}.joblib")
+
+    def has(self, stage, key):
+        return os.path.exists(self.path(stage, key))
+
+    def load(self, stage, key):
+        return joblib.load(self.path(stage, key))
+
+    def save(self, stage, key, value):
+        # Write then rename so an interrupted run never leaves a partial entry
+        path = self.path(stage, key)
+        tmp_path = f"{path}.tmp"
+        joblib.dump(value, tmp_path)
+        os.replace(tmp_path, path)
+
+
+# Stage implementations: each takes the config and its dependencies' results
+
+def stage_load(config, deps):
+    frames = []
+    for path in input_files(config['input']):
+        frames.append(pd.read_parquet(path) if path.endswith('.parquet') else pd.read_csv(path))
+    df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+    if config['low_memory']:
+        downcast_numeric(df)
+    missing = df.isnull().sum()
+    print(f"  Dataset shape: {df.shape}")
+    print(f"  Missing values: {missing[missing > 0].to_dict()}")
+    return df
+
+
+def stage_preprocess(config, deps):
+    df = deps['load']
+    preprocessor = DataPreprocessor()
+    if config['low_memory']:
+        # One float32 block, wrapped without copying
+        X, index = preprocessor.preprocess_low_memory(df, remove_outliers=config['remove_outliers'])
+        X = pd.DataFrame(X, index=index, columns=preprocessor.feature_columns, copy=False)
+    else:
+        features = df.drop('CustomerID', axis=1) if 'CustomerID' in df.columns else df
+        X = preprocessor.preprocess(features, remove_outliers=config['remove_outliers'], fit=True)
+    print(f"  Processed data shape: {X.shape}")
+    return {'preprocessor': preprocessor, 'X': X}
+
+
+def stage_coreset(config, deps):
+    """
+    Weighted coreset the sweep and training run on instead of every row
+    (only when coreset_size is set and smaller than the data)
+    """
+    X = deps['preprocess']['X']
+    if config['coreset_size'] is None or config['coreset_size'] >= len(X):
+        return None
+    points, weights = build_coreset(X, config['coreset_size'], random_state=config['random_state'])
+    print(f"  Coreset: {len(points):,} weighted points for {len(X):,} rows")
+    return {'points': points, 'weights': weights}
+
+
+def _training_data(deps):
+    coreset = deps['coreset']
+    if coreset is None:
+        return deps['preprocess']['X'], None
+    return coreset['points'], coreset['weights']
+
+
+def stage_sweep(config, deps):
+    if config['n_clusters'] is not None:
+        return {'optimal_k': None, 'inertia_values': [], 'silhouette_scores': []}
+    segmentation = CustomerSegmentation(random_state=config['random_state'])
+    X, weights = _training_data(deps)
+    segmentation.find_optimal_clusters(X, max_k=config['max_k'], method=config['method'],
+                                       sample_weight=weights)
+    return {
+        'optimal_k': segmentation.optimal_k,
+        'inertia_values': segmentation.inertia_values,
+        'silhouette_scores': segmentation.silhouette_scores,
+    }
+
+
+def stage_train(config, deps):
+    sweep = deps['sweep']
+    segmentation = CustomerSegmentation(n_clusters=config['n_clusters'],
+                                        random_state=config['random_state'])
+    segmentation.optimal_k = sweep['optimal_k']
+    segmentation.inertia_values = sweep['inertia_values']
+    segmentation.silhouette_scores = sweep['silhouette_scores']
+    X, weights = _training_data(deps)
+    segmentation.train(X, sample_weight=weights)
+    segmentation.coreset_quality = None
+    if weights is not None:
+        report = segmentation.coreset_report(deps['preprocess']['X'], weights,
+                                             full_fit=config['coreset_compare'])
+        segmentation.coreset_quality = report
+        print(f"  Coreset cost estimate error: {report['cost_estimate_error']:+.2%}")
+        if 'cost_gap' in report:
+            print(f"  Cost gap vs full-data training: {report['cost_gap']:+.2%} "
+                  f"(ARI {report['label_agreement_ari']:.3f})")
+    if config['hierarchical']:
+        X, weights = _training_data(deps)
+        segmentation.train_hierarchy(X, max_sub_k=config['max_sub_k'], method=config['method'],
+                                     sample_weight=weights, workers=config['workers'])
+    return segmentation
+
+
+def stage_assign(config, deps):
+    X = deps['preprocess']['X']
+    preprocessor = deps['preprocess']['preprocessor']
+    # Derived features are computed once here, so the exported data, the
+    # drift reference and the rescoring fingerprints all see registry values
+    df = preprocessor.add_derived_features(deps['load']).copy()
+    segmentation = deps['train']
+
+    hierarchical = getattr(segmentation, 'sub_models', None) is not None
+
+    def assign(index, X):
+        if hierarchical:
+            df.loc[index, 'Cluster'], df.loc[index, 'SubCluster'] = segmentation.predict_hierarchy(X)
+        else:
+            df.loc[index, 'Cluster'] = segmentation.predict(X)
+
+    assign(X.index, X)
+
+    # Rows removed as outliers are assigned to their nearest cluster
+    outlier_indices = df.index.difference(X.index)
+    if len(outlier_indices):
+        print(f"  Assigning {len(outlier_indices)} outlier rows to nearest clusters...")
+        outlier_features = df.loc[outlier_indices].drop(['CustomerID', 'Cluster', 'SubCluster'], axis=1,
+                                                        errors='ignore')
+        outlier_processed = preprocessor.preprocess(outlier_features, remove_outliers=False, fit=False)
+        assign(outlier_indices, outlier_processed)
+
+    df['Cluster'] = df['Cluster'].astype(int)
+    if hierarchical:
+        df['SubCluster'] = df['SubCluster'].astype(int)
+    return df
+
+
+def stage_embed(config, deps):
+    """
+    Project every customer's scaled features onto the first two principal
+    components and bin the projection per cluster for the dashboard. Large
+    datasets fit a randomized PCA on a sample of the training rows.
+    """
+    from sklearn.decomposition import PCA
+    df = deps['assign']
+    X = deps['preprocess']['X']
+    preprocessor = deps['preprocess']['preprocessor']
+
+    fit_rows = config['embed_fit_rows']
+    if len(X) > fit_rows:
+        sample = np.random.default_rng(config['random_state']).choice(len(X), fit_rows, replace=False)
+        X_fit, solver = X.values[np.sort(sample)], 'randomized'
+    else:
+        X_fit, solver = X.values, 'full'
+    pca = PCA(n_components=2, svd_solver=solver, random_state=config['random_state']).fit(X_fit)
+
+    if config['low_memory']:
+        X_all, _ = preprocessor.preprocess_low_memory(df, remove_outliers=False, fit=False)
+    else:
+        features = df.drop(['CustomerID', 'Cluster', 'SubCluster'], axis=1, errors='ignore')
+        X_all = preprocessor.preprocess(features, remove_outliers=False, fit=False).values
+    coords = pca.transform(X_all).astype(np.float32)
+
+    points = pd.DataFrame({'PC1': coords[:, 0], 'PC2': coords[:, 1], 'Cluster': df['Cluster'].values})
+    if 'CustomerID' in df.columns:
+        points.insert(0, 'CustomerID', df['CustomerID'].values)
+    density = bin_cluster_density(points, 'PC1', 'PC2', 'Cluster', bins=config['embed_bins'])
+
+    ratios = pca.explained_variance_ratio_
+    print(f"  PCA explained variance: PC1 {ratios[0]:.1%}, PC2 {ratios[1]:.1%} "
+          f"({solver} solver, fitted on {len(X_fit):,} rows)")
+    metadata = {
+        'method': 'pca',
+        'solver': solver,
+        'fit_rows': len(X_fit),
+        'n_rows': len(points),
+        'bins': config['embed_bins'],
+        'explained_variance_ratio': [float(r) for r in ratios],
+        'loadings': {col: [float(v) for v in pca.components_[:, j]]
+                     for j, col in enumerate(X.columns)},
+    }
+    return {'points': points, 'density': density, 'metadata': metadata}
+
+
+def assignment_distances(df, compiled):
+    """
+    Distance of every customer to the centre of its assigned cluster
+    """
+    labels = df['Cluster'].to_numpy()
+    X = compiled.transform(df)
+    return labels, np.sqrt(((X - compiled.centers[labels]) ** 2).sum(axis=1))
+
+
+def stage_reference(config, deps):
+    """
+    Input, cluster-frequency and distance-to-centroid statistics of the
+    training customers, which the serving paths monitor drift against
+    """
+    df = deps['assign']
+    compiled = CompiledModel.from_artifacts(deps['preprocess']['preprocessor'], deps['train'])
+    labels, distances = assignment_distances(df, compiled)
+    reference = build_reference(df, labels, distances, compiled.columns, set(compiled.categories),
+                                compiled.n_clusters)
+    print(f"  Reference statistics for {len(reference['features'])} features, "
+          f"mean distance to centroid {reference['distance']['mean']:.3f}")
+    return reference
+
+
+def stage_index(config, deps):
+    """
+    CustomerID, cluster and distance arrays for the lookup index
+    """
+    df = deps['assign']
+    if 'CustomerID' not in df.columns:
+        print("  No CustomerID column; skipping the lookup index")
+        return None
+    compiled = CompiledModel.from_artifacts(deps['preprocess']['preprocessor'], deps['train'])
+    labels, distances = assignment_distances(df, compiled)
+    return {'customer_ids': df['CustomerID'].to_numpy(), 'labels': labels, 'distances': distances}
+
+
+def stage_profile(config, deps):
+    df = deps['assign']
+    stats = compute_cluster_stats(df, 'Cluster')
+    insights = generate_cluster_insights(df, 'Cluster', stats=stats)
+    for cluster_id, data in insights.items():
+        print(f"  Cluster {cluster_id}: {data['size']} customers ({data['percentage']:.1f}%), "
+              f"avg income ${data['stats']['Income']['mean']:.0f}, "
+              f"avg spending score {data['stats']['SpendingScore']['mean']:.1f}")
+    return {'profiles': get_cluster_profiles(df, 'Cluster', stats=stats), 'insights': insights}
+
+
+def stage_export(config, deps):
+    model_dir, data_dir = config['model_dir'], config['data_dir']
+    segmentation = deps['train']
+    outputs = {
+        'model': os.path.join(model_dir, 'kmeans_model.pkl'),
+        'preprocessor': os.path.join(model_dir, 'preprocessor.pkl'),
+        'clustered_parquet': os.path.join(data_dir, 'customers_clustered.parquet'),
+        'clustered_csv': os.path.join(data_dir, 'customers_clustered.csv'),
+        'embedding': os.path.join(data_dir, 'customers_embedding'),
+        'drift_reference': os.path.join(model_dir, 'drift_reference.json'),
+        'customer_index': os.path.join(model_dir, 'customer_index'),
+        'assignments': os.path.join(data_dir, 'customer_assignments.parquet'),
+    }
+
+    segmentation.save_model(outputs['model'])
+    joblib.dump(deps['preprocess']['preprocessor'], outputs['preprocessor'])
+    if segmentation.inertia_values:
+        outputs['elbow_plot'] = os.path.join(model_dir, 'elbow_silhouette.png')
+        segmentation.plot_elbow_silhouette(save_path=outputs['elbow_plot'])
+    write_clustered_dataset(deps['assign'], outputs['clustered_parquet'],
+                            csv_path=outputs['clustered_csv'])
+    embedding = deps['embed']
+    write_embedding(embedding['points'], embedding['density'], outputs['embedding'],
+                    metadata=embedding['metadata'])
+    save_reference(deps['reference'], outputs['drift_reference'])
+    quality = getattr(segmentation, 'coreset_quality', None)
+    if quality is not None:
+        outputs['coreset_report'] = os.path.join(model_dir, 'coreset_report.json')
+        with open(outputs['coreset_report'], 'w') as f:
+            json.dump(quality, f, indent=1)
+    index = deps['index']
+    if index is not None:
+        write_customer_index(index['customer_ids'], index['labels'], index['distances'],
+                             outputs['customer_index'])
+        # Baseline for incremental rescoring: fingerprint, cluster and model
+        # version per customer
+        keep = ~pd.Series(index['customer_ids']).duplicated(keep='last').to_numpy()
+        fingerprints = row_fingerprints(deps['assign'], deps['preprocess']['preprocessor'].feature_columns)
+        version = model_version(outputs['model'], outputs['preprocessor'])
+        write_assignments(build_assignments(index['customer_ids'][keep], fingerprints[keep],
+                                            index['labels'][keep], index['distances'][keep], version),
+                          outputs['assignments'])
+    else:
+        del outputs['customer_index']
+        del outputs['assignments']
+    return {'outputs': outputs}
+
+
+STAGE_FUNCTIONS = {
+    'load': stage_load,
+    'preprocess': stage_preprocess,
+    'coreset': stage_coreset,
+    'sweep': stage_sweep,
+    'train': stage_train,
+    'assign': stage_assign,
+    'embed': stage_embed,
+    'reference': stage_reference,
+    'index': stage_index,
+    'profile': stage_profile,
+    'export': stage_export,
+}
+
+# Config entries each stage's result depends on (beyond its dependencies)
+STAGE_PARAMS = {
+    'load': ['low_memory'],
+    'preprocess': ['remove_outliers', 'low_memory'],
+    'coreset': ['coreset_size', 'random_state'],
+    'sweep': ['n_clusters', 'max_k', 'method', 'random_state'],
+    'train': ['n_clusters', 'random_state', 'coreset_compare', 'hierarchical', 'max_sub_k'],
+    'assign': [],
+    'embed': ['embed_bins', 'embed_fit_rows', 'random_state'],
+    'reference': [],
+    'index': [],
+    'profile': [],
+    'export': ['model_dir', 'data_dir'],
+}
+
+
+class TrainingPipeline:
+    """
+    Runs the training stages, reusing cached results whose content address
+    (input hash + parameters + upstream addresses) is unchanged
+    """
+    def __init__(self, config=None, force=()):
+        self.config = dict(DEFAULT_CONFIG, **(config or {}))
+        self.cache = StageCache(self.config['cache_dir'])
+        self.force = set(STAGES) if 'all' in force else set(force)
+        self.keys = {}
+        self.results = {}
+        self.timings = []
+
+    def stage_key(self, stage):
+        if stage not in self.keys:
+            if stage == 'load':
+                upstream = [self.cache.file_hash(p) for p in input_files(self.config['input'])]
+            else:
+                upstream = [self.stage_key(dep) for dep in DEPENDENCIES[stage]]
+            params = {name: self.config[name] for name in STAGE_PARAMS[stage]}
+            self.keys[stage] = self.cache.key(stage, params, upstream)
+        return self.keys[stage]
+
+    def _is_fresh(self, stage, key):
+        if stage in self.force or not self.cache.has(stage, key):
+            return False
+        if stage == 'export':
+            # Side-effecting stage: only skip if its files are still on disk
+            outputs = self.cache.load(stage, key)['outputs']
+            return all(os.path.exists(path) for path in outputs.values())
+        return True
+
+    def get(self, stage):
+        """
+        Result of a stage, from cache when fresh, otherwise computed (which
+        in turn loads or computes only the upstream stages it needs)
+        """
+        if stage in self.results:
+            return self.results[stage]
+
+        key = self.stage_key(stage)
+        if self._is_fresh(stage, key):
+            start = time.perf_counter()
+            result = self.cache.load(stage, key)
+            self.timings.append((stage, 'cached', time.perf_counter() - start))
+        else:
+            deps = {dep: self.get(dep) for dep in DEPENDENCIES[stage]}
+            print(f"[{stage}] running...")
+            start = time.perf_counter()
+            with span(f'stage.{stage}'):
+                result = STAGE_FUNCTIONS[stage](self.config, deps)
+            elapsed = time.perf_counter() - start
+            self.cache.save(stage, key, result)
+            self.timings.append((stage, 'ran', elapsed))
+            print(f"[{stage}] done in {elapsed:.2f}s")
+
+        self.results[stage] = result
+        return result
+
+    def run(self, until='export'):
+        """
+        Run every stage up to and including `until` that is not fresh
+        """
+        targets = STAGES[:STAGES.index(until) + 1]
+        # Only leaf stages are requested; fresh upstream results are never
+        # loaded unless a stage that has to run needs them
+        leaves = [s for s in targets if not any(s in DEPENDENCIES[t] for t in targets)]
+        for stage in leaves:
+            self.get(stage)
+        return {stage: self.results.get(stage) for stage in targets}
+
+    def report(self):
+        lines = [f"{'stage':<12}{'status':<8}{'seconds':>10}"]
+        for stage, status, elapsed in self.timings:
+            lines.append(f"{stage:<12}{status:<8}{elapsed:>10.2f}")
+        lines.append(f"{'total':<20}{sum(t for _, _, t in self.timings):>10.2f}")
+        return '\n'.join(lines)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Customer segmentation training pipeline")
+    parser.add_argument('--input', default=DEFAULT_CONFIG['input'],
+                        help="Customer CSV/Parquet file or a directory of shards")
+    parser.add_argument('--model-dir', default=DEFAULT_CONFIG['model_dir'])
+    parser.add_argument('--data-dir', default=DEFAULT_CONFIG['data_dir'])
+    parser.add_argument('--cache-dir', default=DEFAULT_CONFIG['cache_dir'])
+    parser.add_argument('--max-k', type=int, default=DEFAULT_CONFIG['max_k'])
+    parser.add_argument('--method', choices=['both', 'silhouette', 'elbow'], default=DEFAULT_CONFIG['method'])
+    parser.add_argument('--n-clusters', type=int, default=None,
+                        help="Use a fixed number of clusters instead of the k sweep")
+    parser.add_argument('--random-state', type=int, default=DEFAULT_CONFIG['random_state'])
+    parser.add_argument('--embed-bins', type=int, default=DEFAULT_CONFIG['embed_bins'],
+                        help="Grid size of the density-binned 2-D projection")
+    parser.add_argument('--embed-fit-rows', type=int, default=DEFAULT_CONFIG['embed_fit_rows'],
+                        help="Fit the projection on at most this many rows (randomized PCA above it)")
+    parser.add_argument('--low-memory', action='store_true',
+                        help="Downcast inputs and preprocess into one in-place float32 block")
+    parser.add_argument('--coreset-size', type=int, default=None,
+                        help="Run the k sweep and training on a weighted coreset of this many points")
+    parser.add_argument('--coreset-compare', action='store_true',
+                        help="Also train on all rows and report the coreset's cost gap")
+    parser.add_argument('--hierarchical', action='store_true',
+                        help="Also split every cluster into sub-clusters, with k swept per parent")
+    parser.add_argument('--max-sub-k', type=int, default=DEFAULT_CONFIG['max_sub_k'],
+                        help="Largest sub-cluster count tried per parent")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Processes fitting sub-cluster models (default: CPU count)")
+    parser.add_argument('--keep-outliers', action='store_true', help="Do not drop Z-score outliers")
+    parser.add_argument('--until', choices=STAGES, default='export', help="Last stage to run")
+    parser.add_argument('--force', nargs='*', default=[], choices=STAGES + ['all'],
+                        help="Re-run these stages even if cached")
+    parser.add_argument('--profile', default=None, metavar='TRACE_JSON',
+                        help="Record per-step wall/CPU time and memory to a trace-event file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    config = {
+        'input': args.input,
+        'model_dir': args.model_dir,
+        'data_dir': args.data_dir,
+        'cache_dir': args.cache_dir,
+        'remove_outliers': not args.keep_outliers,
+        'low_memory': args.low_memory,
+        'max_k': args.max_k,
+        'method': args.method,
+        'n_clusters': args.n_clusters,
+        'random_state': args.random_state,
+        'embed_bins': args.embed_bins,
+        'embed_fit_rows': args.embed_fit_rows,
+        'coreset_size': args.coreset_size,
+        'coreset_compare': args.coreset_compare,
+        'hierarchical': args.hierarchical,
+        'max_sub_k': args.max_sub_k,
+        'workers': args.workers,
+    }
+    pipeline = TrainingPipeline(config, force=args.force)
+    if args.profile:
+        with Profiler() as profiler:
+            pipeline.run(until=args.until)
+        profiler.save(args.profile)
+        print("\n" + profiler.format_summary())
+        print(f"Trace written to {args.profile} (open in chrome://tracing or ui.perfetto.dev)")
+    else:
+        pipeline.run(until=args.until)
+    print("\n" + pipeline.report())
+    return pipeline
+
+
+if __name__ == "__main__":
+    main()
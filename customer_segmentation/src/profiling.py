@@ -0,0 +1,200 @@
+import os
+import json
+import time
+import threading
+import functools
+import tracemalloc
+
+# The active Profiler, or None when instrumentation is disabled
+_active = None
+
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **args):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class _Span:
+    def __init__(self, profiler, name, args):
+        self.profiler = profiler
+        self.name = name
+        self.args = args
+
+    def set(self, **args):
+        """
+        Attach extra values (e.g. rows produced) to the span
+        """
+        self.args.update(args)
+
+    def __enter__(self):
+        self.profiler._push(self)
+        self.start_cpu = time.process_time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.end = time.perf_counter()
+        self.end_cpu = time.process_time()
+        self.profiler._pop(self)
+        return False
+
+
+class Profiler:
+    """
+    Collects nested spans with wall time, CPU time, peak allocated memory
+    (tracemalloc) and row counts, and writes them as Chrome trace events
+    that open in chrome://tracing, Perfetto or speedscope.
+
+        with Profiler() as profiler:
+            preprocessor.preprocess(df)
+        profiler.save('trace.json')
+    """
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self.events = []
+        # Spans nest per thread; events from every thread share one list
+        self._local = threading.local()
+        self._origin = None
+        self._started_tracemalloc = False
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    def start(self):
+        global _active
+        self._origin = time.perf_counter()
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        _active = self
+        return self
+
+    def stop(self):
+        global _active
+        if _active is self:
+            _active = None
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _push(self, span):
+        stack = self._stack()
+        span.peak = 0
+        if self.trace_memory and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                parent = stack[-1]
+                parent.peak = max(parent.peak, peak)
+            span.base = current
+            tracemalloc.reset_peak()
+        stack.append(span)
+
+    def _pop(self, span):
+        stack = self._stack()
+        stack.pop()
+        args = dict(span.args)
+        if self.trace_memory and tracemalloc.is_tracing():
+            span.peak = max(span.peak, tracemalloc.get_traced_memory()[1])
+            if stack:
+                stack[-1].peak = max(stack[-1].peak, span.peak)
+            args['peak_alloc_mb'] = round((span.peak - span.base) / 2**20, 3)
+        args['cpu_ms'] = round((span.end_cpu - span.start_cpu) * 1e3, 3)
+
+        with self._lock:
+            self.events.append({
+                'name': span.name,
+                'cat': span.name.split('.')[0],
+                'ph': 'X',
+                'ts': round((span.start - self._origin) * 1e6, 1),
+                'dur': round((span.end - span.start) * 1e6, 1),
+                'pid': os.getpid(),
+                'tid': threading.get_ident(),
+                'args': args,
+            })
+
+    def trace(self):
+        return {'traceEvents': sorted(self.events, key=lambda e: e['ts']), 'displayTimeUnit': 'ms'}
+
+    def save(self, path):
+        """
+        Write the collected spans as a Chrome trace-event JSON file
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(self.trace(), f)
+        return path
+
+    def summary(self):
+        """
+        Per span name: calls, total wall/CPU seconds, max peak MB and rows
+        """
+        totals = {}
+        for event in self.events:
+            entry = totals.setdefault(event['name'], {'calls': 0, 'wall_s': 0.0, 'cpu_s': 0.0,
+                                                      'peak_alloc_mb': 0.0, 'rows': 0})
+            args = event['args']
+            entry['calls'] += 1
+            entry['wall_s'] += event['dur'] / 1e6
+            entry['cpu_s'] += args['cpu_ms'] / 1e3
+            entry['peak_alloc_mb'] = max(entry['peak_alloc_mb'], args.get('peak_alloc_mb', 0.0))
+            entry['rows'] += args.get('rows', 0) or 0
+        return totals
+
+    def format_summary(self):
+        lines = [f"{'span':<28}{'calls':>7}{'wall s':>10}{'cpu s':>10}{'peak MB':>10}{'rows':>12}"]
+        for name, t in sorted(self.summary().items(), key=lambda item: -item[1]['wall_s']):
+            lines.append(f"{name:<28}{t['calls']:>7}{t['wall_s']:>10.3f}{t['cpu_s']:>10.3f}"
+                         f"{t['peak_alloc_mb']:>10.1f}{t['rows']:>12,}")
+        return '\n'.join(lines)
+
+
+def is_enabled():
+    return _active is not None
+
+
+def span(name, **args):
+    """
+    Context manager timing a block; a shared no-op when profiling is off
+    """
+    if _active is None:
+        return _NOOP
+    return _Span(_active, name, args)
+
+
+def traced(name):
+    """
+    Decorator wrapping a method call in a span, recording len(first arg) as
+    rows when it has one
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(self, *args, **kwargs):
+            if _active is None:
+                return fn(self, *args, **kwargs)
+            rows = len(args[0]) if args and hasattr(args[0], '__len__') else None
+            with _Span(_active, name, {'rows': rows}):
+                return fn(self, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,357 @@
+"""
+Bootstrap stability of a trained segmentation.
+
+Each replicate refits K-Means with the model's k on a bootstrap sample (or a
+subsample without replacement) of the customers. It then assigns every
+customer with the replicate model and relabels the replicate's clusters to
+match the reference model (Hungarian matching on the label contingency
+table). Across replicates this gives:
+
+- the adjusted Rand index against the reference labels;
+- per-cluster Jaccard similarity between the reference cluster and its
+  matched replicate cluster (Hennig: below 0.5 the cluster dissolves,
+  above 0.75 it is stable);
+- per-customer confidence: the share of replicates that agree with the
+  reference assignment.
+
+Replicates run in worker processes that read the feature matrix from one
+shared-memory block. Each replicate's result is cached on disk, so a later
+run with more replicates only fits the new ones. With a time budget, no new
+replicate starts after the budget is spent.
+
+Usage (from the customer_segmentation directory):
+    python -m src.stability --replicates 100 --workers 4 --time-budget 300
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_DIR not in sys.path:
+    sys.path.append(PROJECT_DIR)
+
+DEFAULT_MODEL_PATH = os.path.join(PROJECT_DIR, 'model', 'kmeans_model.pkl')
+DEFAULT_PREPROCESSOR_PATH = os.path.join(PROJECT_DIR, 'model', 'preprocessor.pkl')
+DEFAULT_INPUT_PATH = os.path.join(PROJECT_DIR, 'data', 'customers.csv')
+DEFAULT_REPORT_PATH = os.path.join(PROJECT_DIR, 'model', 'stability_report.json')
+DEFAULT_CONFIDENCE_PATH = os.path.join(PROJECT_DIR, 'data', 'customer_stability.parquet')
+DEFAULT_CACHE_DIR = os.path.join(PROJECT_DIR, '.pipeline_cache', 'stability')
+DEFAULT_REPLICATES = 50
+DEFAULT_N_INIT = 10
+STABLE_JACCARD = 0.75
+DISSOLVED_JACCARD = 0.5
+
+# Set in each worker process by _init_worker
+_X = None
+_reference = None
+_shm = None
+
+
+def align_labels(reference, labels, k):
+    """
+    Relabel `labels` so each cluster takes the reference label it overlaps
+    most, under a one-to-one matching
+    """
+    from scipy.optimize import linear_sum_assignment
+    contingency = np.bincount(reference * k + labels, minlength=k * k).reshape(k, k)
+    ref_ids, label_ids = linear_sum_assignment(contingency, maximize=True)
+    mapping = np.empty(k, dtype=np.int32)
+    mapping[label_ids] = ref_ids
+    return mapping[labels]
+
+
+def fit_replicate(X, reference, k, replicate, method='bootstrap', sample_fraction=1.0,
+                  n_init=DEFAULT_N_INIT, random_state=42):
+    """
+    Refit on one resample and compare with the reference labels. Returns the
+    aligned labels of every row, the ARI and the per-cluster Jaccard.
+    """
+    from sklearn.cluster import KMeans
+    from sklearn.metrics import adjusted_rand_score
+    start = time.perf_counter()
+    rng = np.random.default_rng([random_state, replicate])
+    n = len(X)
+    size = max(k, int(round(n * sample_fraction)))
+    if method == 'bootstrap':
+        rows = rng.integers(0, n, size)
+    else:
+        rows = np.sort(rng.choice(n, min(size, n), replace=False))
+    model = KMeans(n_clusters=k, random_state=random_state + replicate, n_init=n_init).fit(X[rows])
+    labels = align_labels(reference, model.predict(X).astype(np.int64), k)
+
+    intersection = np.bincount(reference[labels == reference], minlength=k)
+    union = np.bincount(reference, minlength=k) + np.bincount(labels, minlength=k) - intersection
+    return {
+        'replicate': replicate,
+        'labels': labels.astype(np.int16),
+        'ari': float(adjusted_rand_score(reference, labels)),
+        'jaccard': intersection / np.maximum(union, 1),
+        'seconds': time.perf_counter() - start,
+    }
+
+
+def _init_worker(spec):
+    global _X, _reference, _shm
+    # One BLAS thread per process; parallelism comes from the pool
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(1)
+    except ImportError:
+        pass
+    from multiprocessing import shared_memory
+    _shm = shared_memory.SharedMemory(name=spec['name'])
+    n, d = spec['shape']
+    _X = np.ndarray((n, d), dtype=np.float64, buffer=_shm.buf)
+    _reference = np.ndarray((n,), dtype=np.int64, buffer=_shm.buf, offset=_X.nbytes)
+    _X.flags.writeable = False
+    _reference.flags.writeable = False
+
+
+def _fit_replicate_in_worker(*args, **kwargs):
+    return fit_replicate(_X, _reference, *args, **kwargs)
+
+
+def _to_shared_memory(X, reference):
+    from multiprocessing import shared_memory
+    shm = shared_memory.SharedMemory(create=True, size=max(X.nbytes + reference.nbytes, 1))
+    np.ndarray(X.shape, dtype=np.float64, buffer=shm.buf)[...] = X
+    np.ndarray(reference.shape, dtype=np.int64, buffer=shm.buf, offset=X.nbytes)[...] = reference
+    return shm, {'name': shm.name, 'shape': X.shape}
+
+
+def cache_key(X, centers, method, sample_fraction, n_init, random_state):
+    """
+    Replicate results depend on the data, the reference model and the
+    resampling settings
+    """
+    digest = hashlib.sha256()
+    for array in (X, centers):
+        digest.update(np.ascontiguousarray(array).tobytes())
+    digest.update(json.dumps([method, sample_fraction, n_init, random_state]).encode())
+    return digest.hexdigest()[:20]
+
+
+class ReplicateCache:
+    """
+    One .npz file per replicate under cache_dir/<key>/
+    """
+    def __init__(self, cache_dir, key):
+        self.path = os.path.join(cache_dir, key) if cache_dir else None
+        if self.path:
+            os.makedirs(self.path, exist_ok=True)
+
+    def _file(self, replicate):
+        return os.path.join(self.path, f"replicate-{replicate:05d}.npz")
+
+    def load(self, replicate):
+        if not self.path or not os.path.exists(self._file(replicate)):
+            return None
+        with np.load(self._file(replicate)) as data:
+            return {'replicate': replicate, 'labels': data['labels'], 'ari': float(data['ari']),
+                    'jaccard': data['jaccard'], 'seconds': float(data['seconds'])}
+
+    def save(self, result):
+        if not self.path:
+            return
+        buffer = io.BytesIO()
+        np.savez(buffer, labels=result['labels'], ari=result['ari'], jaccard=result['jaccard'],
+                 seconds=result['seconds'])
+        path = self._file(result['replicate'])
+        with open(f"{path}.tmp", 'wb') as f:
+            f.write(buffer.getvalue())
+        os.replace(f"{path}.tmp", path)
+
+
+def stability_analysis(segmentation, X, n_replicates=DEFAULT_REPLICATES, method='bootstrap',
+                       sample_fraction=None, workers=None, time_budget=None, cache_dir=DEFAULT_CACHE_DIR,
+                       n_init=DEFAULT_N_INIT, log=print):
+    """
+    Stability of a trained CustomerSegmentation over n_replicates bootstrap
+    ('bootstrap') or subsample ('subsample') refits on the preprocessed
+    features X. Returns a summary (ARI, per-cluster Jaccard, confidence
+    distribution) and the per-customer confidence array under 'confidence'.
+    """
+    from src.clustering_model import _rows
+    if method not in ('bootstrap', 'subsample'):
+        raise ValueError(f"Unknown resampling method {method!r}")
+    if sample_fraction is None:
+        sample_fraction = 1.0 if method == 'bootstrap' else 0.8
+    X = np.ascontiguousarray(_rows(X))
+    k = segmentation.model.n_clusters
+    random_state = segmentation.random_state
+    reference = segmentation.predict(X).astype(np.int64)
+    cache = ReplicateCache(cache_dir, cache_key(X, segmentation.get_cluster_centers(), method,
+                                                sample_fraction, n_init, random_state))
+
+    start = time.perf_counter()
+    agree = np.zeros(len(X), dtype=np.int32)
+    aris, jaccards, fit_seconds = [], [], []
+    cached = 0
+
+    def record(result):
+        agree[:] += result['labels'] == reference
+        aris.append(result['ari'])
+        jaccards.append(result['jaccard'])
+        fit_seconds.append(result['seconds'])
+
+    todo = []
+    for replicate in range(n_replicates):
+        result = cache.load(replicate)
+        if result is not None and len(result['labels']) == len(X):
+            record(result)
+            cached += 1
+        else:
+            todo.append(replicate)
+    if cached:
+        log(f"  {cached} replicates loaded from cache")
+
+    def budget_left():
+        return time_budget is None or time.perf_counter() - start < time_budget
+
+    args = (k,)
+    kwargs = {'method': method, 'sample_fraction': sample_fraction, 'n_init': n_init,
+              'random_state': random_state}
+    workers = min(workers or os.cpu_count() or 1, max(len(todo), 1))
+    if workers <= 1:
+        for replicate in todo:
+            if not budget_left():
+                break
+            result = fit_replicate(X, reference, *args, replicate, **kwargs)
+            cache.save(result)
+            record(result)
+    elif todo:
+        shm, spec = _to_shared_memory(X, reference)
+        try:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(spec,)) as pool:
+                pending = iter(todo)
+                running = set()
+
+                def submit():
+                    replicate = next(pending, None)
+                    if replicate is not None and budget_left():
+                        running.add(pool.submit(_fit_replicate_in_worker, *args, replicate, **kwargs))
+
+                # Keep one replicate per worker in flight, so nothing new
+                # starts once the budget is spent
+                for _ in range(workers):
+                    submit()
+                while running:
+                    done, running = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        result = future.result()
+                        cache.save(result)
+                        record(result)
+                        submit()
+        finally:
+            shm.close()
+            shm.unlink()
+
+    completed = len(aris)
+    elapsed = time.perf_counter() - start
+    if not completed:
+        raise RuntimeError("No replicates completed within the time budget")
+    confidence = agree / completed
+    jaccard = np.vstack(jaccards)
+    sizes = np.bincount(reference, minlength=k)
+    clusters = {}
+    for cluster in range(k):
+        mean = float(jaccard[:, cluster].mean())
+        clusters[cluster] = {
+            'size': int(sizes[cluster]),
+            'jaccard_mean': mean,
+            'jaccard_std': float(jaccard[:, cluster].std()),
+            'jaccard_min': float(jaccard[:, cluster].min()),
+            'mean_confidence': float(confidence[reference == cluster].mean()) if sizes[cluster] else None,
+            'status': ('stable' if mean >= STABLE_JACCARD
+                       else 'dissolved' if mean < DISSOLVED_JACCARD else 'weak'),
+        }
+    log(f"  {completed} replicates ({completed - cached} fitted, {cached} cached) in {elapsed:.1f}s, "
+        f"mean ARI {np.mean(aris):.3f}")
+    return {
+        'k': k,
+        'rows': len(X),
+        'method': method,
+        'sample_fraction': sample_fraction,
+        'n_init': n_init,
+        'replicates_requested': n_replicates,
+        'replicates': completed,
+        'replicates_cached': cached,
+        'budget_exhausted': completed < n_replicates,
+        'seconds': elapsed,
+        'mean_fit_seconds': float(np.mean(fit_seconds)),
+        'workers': workers,
+        'ari': {'mean': float(np.mean(aris)), 'std': float(np.std(aris)), 'min': float(np.min(aris))},
+        'clusters': clusters,
+        'confidence_summary': {
+            'mean': float(confidence.mean()),
+            'p10': float(np.quantile(confidence, 0.1)),
+            'share_below_0.5': float((confidence < 0.5).mean()),
+        },
+        'confidence': confidence,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Bootstrap stability of the trained segmentation")
+    parser.add_argument('--input', default=DEFAULT_INPUT_PATH, help="Customer CSV or Parquet file")
+    parser.add_argument('--model', default=DEFAULT_MODEL_PATH)
+    parser.add_argument('--preprocessor', default=DEFAULT_PREPROCESSOR_PATH)
+    parser.add_argument('--replicates', type=int, default=DEFAULT_REPLICATES)
+    parser.add_argument('--method', choices=['bootstrap', 'subsample'], default='bootstrap')
+    parser.add_argument('--sample-fraction', type=float, default=None,
+                        help="Rows per replicate as a fraction of the data (default 1.0 bootstrap, 0.8 subsample)")
+    parser.add_argument('--n-init', type=int, default=DEFAULT_N_INIT, help="K-Means restarts per replicate")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument('--time-budget', type=float, default=None, help="Seconds after which no replicate starts")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR)
+    parser.add_argument('--output', default=DEFAULT_REPORT_PATH, help="Stability report (JSON)")
+    parser.add_argument('--confidence-output', default=DEFAULT_CONFIDENCE_PATH,
+                        help="Per-customer confidence (Parquet)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    import joblib
+    import pandas as pd
+    from src.clustering_model import CustomerSegmentation
+    args = parse_args(argv)
+    segmentation = CustomerSegmentation.load_model(args.model)
+    preprocessor = joblib.load(args.preprocessor)
+    df = pd.read_parquet(args.input) if args.input.endswith('.parquet') else pd.read_csv(args.input)
+    features = df.drop(columns=['CustomerID', 'Cluster', 'SubCluster'], errors='ignore')
+    X = preprocessor.preprocess(features, remove_outliers=False, fit=False)
+
+    report = segmentation.stability_analysis(
+        X, n_replicates=args.replicates, method=args.method, sample_fraction=args.sample_fraction,
+        workers=args.workers, time_budget=args.time_budget, cache_dir=args.cache_dir, n_init=args.n_init)
+    confidence = report.pop('confidence')
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=1)
+    print(f"\nARI vs reference: {report['ari']['mean']:.3f} (min {report['ari']['min']:.3f})")
+    for cluster, stats in report['clusters'].items():
+        # Clusters the reference left empty have no confidence
+        confidence_text = 'n/a' if stats['mean_confidence'] is None else f"{stats['mean_confidence']:.3f}"
+        print(f"  Cluster {cluster}: Jaccard {stats['jaccard_mean']:.3f} ({stats['status']}), "
+              f"mean confidence {confidence_text}")
+    print(f"Report written to {args.output}")
+    if 'CustomerID' in df.columns:
+        pd.DataFrame({
+            'CustomerID': df['CustomerID'].to_numpy(),
+            'Cluster': segmentation.predict(X).astype(np.int32),
+            'Confidence': confidence.astype(np.float32),
+        }).to_parquet(args.confidence_output, index=False)
+        print(f"Per-customer confidence written to {args.confidence_output}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
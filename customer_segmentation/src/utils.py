@@ -1,26 +1,430 @@
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
+from collections import OrderedDict
 
-def get_cluster_profiles(df, cluster_col='Cluster'):
+DEFAULT_QUANTILES = (0.25, 0.5, 0.75)
+# Second-level labels of a hierarchical segmentation, never a profiled feature
+SUB_CLUSTER_COL = 'SubCluster'
+_STATS_CACHE_SIZE = 32
+_stats_cache = OrderedDict()
+
+
+class ClusterStats:
     """
-    Generate cluster profiles with statistics
+    Per-cluster statistics (size, count, mean, median, std, quantiles)
+    computed in a single groupby pass and shared by the utils functions.
     """
+    def __init__(self, sizes, agg, quantiles, numerical_cols, n_rows, cluster_col='Cluster'):
+        self.sizes = sizes
+        self.agg = agg
+        self.quantiles = quantiles
+        self.numerical_cols = numerical_cols
+        self.n_rows = n_rows
+        self.cluster_col = cluster_col
+
+    @property
+    def clusters(self):
+        return self.sizes.index.tolist()
+
+    def stat(self, name):
+        """
+        Return one statistic ('count', 'mean', 'median', 'std') as a
+        cluster x feature DataFrame
+        """
+        return self.agg.xs(name, axis=1, level=1)[self.numerical_cols]
+
+    @property
+    def mean(self):
+        return self.stat('mean')
+
+    @property
+    def median(self):
+        return self.stat('median')
+
+    def select(self, clusters):
+        """
+        Restrict the statistics to a subset of clusters
+        """
+        clusters = [c for c in self.sizes.index if c in set(clusters)]
+        sizes = self.sizes.loc[clusters]
+        return ClusterStats(
+            sizes=sizes,
+            agg=self.agg.loc[clusters],
+            quantiles=self.quantiles.loc[clusters],
+            numerical_cols=self.numerical_cols,
+            n_rows=int(sizes.sum()),
+            cluster_col=self.cluster_col
+        )
+
+    @classmethod
+    def concat(cls, parts):
+        """
+        Combine statistics of disjoint sets of clusters, e.g. computed one
+        partition at a time
+        """
+        parts = [part for part in parts if len(part.sizes)]
+        sizes = pd.concat([part.sizes for part in parts]).sort_index()
+        return cls(
+            sizes=sizes,
+            agg=pd.concat([part.agg for part in parts]).sort_index(),
+            quantiles=pd.concat([part.quantiles for part in parts]).sort_index(),
+            numerical_cols=parts[0].numerical_cols,
+            n_rows=int(sizes.sum()),
+            cluster_col=parts[0].cluster_col
+        )
+
+    def profiles(self, stats=('mean', 'median', 'std', 'count')):
+        """
+        Profiles table with (feature, statistic) columns
+        """
+        columns = pd.MultiIndex.from_product([self.numerical_cols, list(stats)])
+        return self.agg.reindex(columns=columns)
+
+
+def _numerical_columns(df, cluster_col):
     numerical_cols = df.select_dtypes(include=[np.number]).columns.tolist()
-    if cluster_col in numerical_cols:
-        numerical_cols.remove(cluster_col)
-    
-    profiles = df.groupby(cluster_col)[numerical_cols].agg(['mean', 'median', 'std', 'count'])
-    return profiles
+    for col in (cluster_col, SUB_CLUSTER_COL):
+        if col in numerical_cols:
+            numerical_cols.remove(col)
+    return numerical_cols
+
+
+def _aggregate(df, cluster_col, quantiles):
+    numerical_cols = _numerical_columns(df, cluster_col)
+    grouped = df.groupby(cluster_col, sort=True)[numerical_cols]
+    return ClusterStats(
+        sizes=grouped.size(),
+        agg=grouped.agg(['count', 'mean', 'median', 'std']),
+        quantiles=grouped.quantile(list(quantiles)),
+        numerical_cols=numerical_cols,
+        n_rows=len(df),
+        cluster_col=cluster_col
+    )
+
+
+def compute_cluster_stats(df, cluster_col='Cluster', clusters=None, quantiles=DEFAULT_QUANTILES,
+                          version=None):
+    """
+    Compute all per-cluster statistics for a DataFrame.
+
+    When ``version`` is given (e.g. the dataset_version of the data the
+    frame was read from) results are memoized on it and the cluster
+    selection, so callers must pass a new version whenever the data
+    changes. Without a version nothing is cached.
+    """
+    quantiles = tuple(quantiles)
+    selection = None if clusters is None else tuple(sorted(clusters))
+    key = None if version is None else (version, cluster_col, quantiles, selection)
+
+    if key is not None and key in _stats_cache:
+        _stats_cache.move_to_end(key)
+        return _stats_cache[key]
+
+    if selection is None:
+        stats = _aggregate(df, cluster_col, quantiles)
+    else:
+        stats = compute_cluster_stats(df, cluster_col, quantiles=quantiles, version=version).select(selection)
+
+    if key is not None:
+        _stats_cache[key] = stats
+        while len(_stats_cache) > _STATS_CACHE_SIZE:
+            _stats_cache.popitem(last=False)
+    return stats
+
+
+def clear_cluster_stats_cache():
+    """
+    Drop all memoized cluster statistics
+    """
+    _stats_cache.clear()
+
 
-def plot_cluster_distribution(df, cluster_col='Cluster'):
+STATS_CHUNK_ROWS = 100_000
+DEFAULT_SKETCH_SIZE = 1024
+
+
+def _compress_sketch(values, weights, size):
+    """
+    Merge sorted (value, weight) centroids: identical values are combined
+    exactly, then neighbours are pooled into at most ``size`` equal-weight
+    centroids
+    """
+    values, inverse = np.unique(values, return_inverse=True)
+    weights = np.bincount(inverse, weights=weights)
+    if len(values) <= size:
+        return values, weights
+    cumulative = np.cumsum(weights)
+    groups = ((cumulative - weights / 2) * size / cumulative[-1]).astype(np.int64)
+    group_weights = np.bincount(groups, weights=weights, minlength=size)
+    group_sums = np.bincount(groups, weights=values * weights, minlength=size)
+    keep = group_weights > 0
+    return group_sums[keep] / group_weights[keep], group_weights[keep]
+
+
+class StreamingStats:
     """
-    Plot cluster distribution
+    Mergeable summary statistics of a table, accumulated one chunk at a time.
+
+    Per numeric column it keeps counts, means, min/max and a quantile sketch,
+    and per column pair the co-moments over the rows where both are present
+    (pandas' pairwise-complete convention). Chunks are combined with Chan's
+    parallel update, so statistics from separate workers merge exactly. Only
+    the quantiles are approximate: columns with at most ``sketch_size``
+    distinct values are exact, and others have a rank error of about
+    1 / sketch_size.
+
+        stats = StreamingStats()
+        for chunk in pd.read_csv(path, chunksize=100_000):
+            stats.update(chunk)
+        stats.describe(), stats.corr()
     """
+    def __init__(self, sketch_size=DEFAULT_SKETCH_SIZE):
+        self.sketch_size = sketch_size
+        self.columns = None
+        self.numerical_cols = None
+        self.rows = 0
+
+    @classmethod
+    def from_frame(cls, df, chunk_rows=STATS_CHUNK_ROWS, sketch_size=DEFAULT_SKETCH_SIZE):
+        stats = cls(sketch_size)
+        for start in range(0, max(len(df), 1), chunk_rows):
+            stats.update(df.iloc[start:start + chunk_rows])
+        return stats
+
+    def _init_columns(self, columns, numerical_cols):
+        self.columns = list(columns)
+        self.numerical_cols = list(numerical_cols)
+        k = len(self.numerical_cols)
+        self.null_counts = np.zeros(len(self.columns), dtype=np.int64)
+        # Row i, column j: statistics of column i over the rows where
+        # column j is also present
+        self.pair_counts = np.zeros((k, k))
+        self.pair_means = np.zeros((k, k))
+        self.pair_m2 = np.zeros((k, k))
+        self.comoments = np.zeros((k, k))
+        self.minimum = np.full(k, np.nan)
+        self.maximum = np.full(k, np.nan)
+        self.sketches = [(np.empty(0), np.empty(0)) for _ in range(k)]
+
+    def update(self, df):
+        """
+        Add a chunk of rows (a DataFrame with the same columns as the first)
+        """
+        if self.columns is None:
+            self._init_columns(df.columns, df.select_dtypes(include=[np.number]).columns)
+        elif df.columns.tolist() != self.columns:
+            raise ValueError("Chunk columns do not match the accumulated statistics")
+        self.null_counts += df.isna().sum().to_numpy()
+        if not len(df):
+            return self
+
+        other = StreamingStats(self.sketch_size)
+        other._init_columns(self.columns, self.numerical_cols)
+        other.rows = len(df)
+
+        X = df[self.numerical_cols].to_numpy(dtype=np.float64, na_value=np.nan)
+        present = ~np.isnan(X)
+        M = present.astype(np.float64)
+        # Shift by the chunk means before taking products to keep the
+        # sums well conditioned
+        counts = M.sum(axis=0)
+        shift = np.divide(np.where(present, X, 0).sum(axis=0), counts,
+                          out=np.zeros(len(counts)), where=counts > 0)
+        Xc = np.where(present, X - shift, 0.0)
+        n = M.T @ M
+        sums = Xc.T @ M
+        safe_n = np.where(n > 0, n, 1)
+        other.pair_counts = n
+        other.pair_means = np.where(n > 0, sums / safe_n + shift[:, None], 0.0)
+        other.pair_m2 = np.where(n > 0, (Xc ** 2).T @ M - sums ** 2 / safe_n, 0.0)
+        other.comoments = np.where(n > 0, Xc.T @ Xc - sums * sums.T / safe_n, 0.0)
+
+        with np.errstate(all='ignore'):
+            other.minimum = np.where(counts > 0, np.nanmin(np.where(present, X, np.inf), axis=0), np.nan)
+            other.maximum = np.where(counts > 0, np.nanmax(np.where(present, X, -np.inf), axis=0), np.nan)
+        other.sketches = []
+        for i in range(X.shape[1]):
+            values = X[present[:, i], i]
+            other.sketches.append(_compress_sketch(values, np.ones(len(values)), self.sketch_size))
+
+        self._merge_moments(other)
+        return self
+
+    def merge(self, other):
+        """
+        Add the statistics of another accumulator over the same columns,
+        e.g. one filled by a parallel worker
+        """
+        if other.columns is None:
+            return self
+        if self.columns is None:
+            self._init_columns(other.columns, other.numerical_cols)
+        elif other.columns != self.columns or other.numerical_cols != self.numerical_cols:
+            raise ValueError("Cannot merge statistics over different columns")
+        self.null_counts = self.null_counts + other.null_counts
+        self._merge_moments(other)
+        return self
+
+    def _merge_moments(self, other):
+        na, nb = self.pair_counts, other.pair_counts
+        n = na + nb
+        safe_n = np.where(n > 0, n, 1)
+        delta = other.pair_means - self.pair_means
+        weight = na * nb / safe_n
+        self.comoments = self.comoments + other.comoments + delta * delta.T * weight
+        self.pair_m2 = self.pair_m2 + other.pair_m2 + delta ** 2 * weight
+        self.pair_means = np.where(n > 0, self.pair_means + delta * nb / safe_n, 0.0)
+        self.pair_counts = n
+        self.rows += other.rows
+        self.minimum = np.fmin(self.minimum, other.minimum)
+        self.maximum = np.fmax(self.maximum, other.maximum)
+        self.sketches = [
+            _compress_sketch(np.concatenate([va, vb]), np.concatenate([wa, wb]), self.sketch_size)
+            for (va, wa), (vb, wb) in zip(self.sketches, other.sketches)
+        ]
+
+    @property
+    def count(self):
+        return pd.Series(np.diag(self.pair_counts), index=self.numerical_cols)
+
+    @property
+    def mean(self):
+        return pd.Series(np.diag(self.pair_means), index=self.numerical_cols).where(self.count > 0)
+
+    @property
+    def var(self):
+        counts = np.diag(self.pair_counts)
+        with np.errstate(all='ignore'):
+            values = np.where(counts > 1, np.diag(self.pair_m2) / (counts - 1), np.nan)
+        return pd.Series(np.maximum(values, 0), index=self.numerical_cols)
+
+    @property
+    def std(self):
+        return np.sqrt(self.var)
+
+    @property
+    def missing_values(self):
+        return int(self.null_counts.sum()) if self.columns is not None else 0
+
+    def quantile(self, q):
+        """
+        Approximate quantiles (linear interpolation like pandas) as a
+        quantile x column DataFrame
+        """
+        q = np.atleast_1d(np.asarray(q, dtype=np.float64))
+        result = {}
+        for i, col in enumerate(self.numerical_cols):
+            values, weights = self.sketches[i]
+            if not len(values):
+                result[col] = np.full(len(q), np.nan)
+                continue
+            # A centroid of weight w covers ranks [start, start + w - 1];
+            # ranks between centroids are interpolated
+            end = np.cumsum(weights) - 1
+            start = end - weights + 1
+            ranks = np.column_stack([start, end]).ravel()
+            points = np.repeat(values, 2)
+            points[0], points[-1] = self.minimum[i], self.maximum[i]
+            result[col] = np.interp(q * end[-1], ranks, points)
+        return pd.DataFrame(result, index=q, columns=self.numerical_cols)
+
+    def corr(self):
+        """
+        Pearson correlation matrix over pairwise-complete rows, as
+        DataFrame.corr() computes it
+        """
+        with np.errstate(all='ignore'):
+            corr = self.comoments / np.sqrt(self.pair_m2 * self.pair_m2.T)
+        corr = np.where(self.pair_counts > 1, np.clip(corr, -1, 1), np.nan)
+        return pd.DataFrame(corr, index=self.numerical_cols, columns=self.numerical_cols)
+
+    def describe(self, percentiles=DEFAULT_QUANTILES):
+        """
+        Summary table in the layout of DataFrame.describe()
+        """
+        quantiles = self.quantile(percentiles)
+        quantiles.index = [f"{p * 100:g}%" for p in percentiles]
+        summary = pd.DataFrame({
+            'count': self.count,
+            'mean': self.mean,
+            'std': self.std,
+            'min': pd.Series(self.minimum, index=self.numerical_cols),
+        }).T
+        return pd.concat([summary, quantiles, pd.DataFrame([self.maximum], index=['max'],
+                                                           columns=self.numerical_cols)])
+
+    def to_dict(self):
+        def floats(values):
+            return [None if v != v else float(v) for v in np.asarray(values).ravel()]
+        return {
+            'sketch_size': self.sketch_size,
+            'rows': self.rows,
+            'columns': self.columns,
+            'numerical_cols': self.numerical_cols,
+            'null_counts': self.null_counts.tolist(),
+            'pair_counts': self.pair_counts.tolist(),
+            'pair_means': self.pair_means.tolist(),
+            'pair_m2': self.pair_m2.tolist(),
+            'comoments': self.comoments.tolist(),
+            'minimum': floats(self.minimum),
+            'maximum': floats(self.maximum),
+            'sketches': [[values.tolist(), weights.tolist()] for values, weights in self.sketches],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls(data['sketch_size'])
+        stats.rows = data['rows']
+        stats.columns = data['columns']
+        stats.numerical_cols = data['numerical_cols']
+        stats.null_counts = np.asarray(data['null_counts'], dtype=np.int64)
+        for name in ('pair_counts', 'pair_means', 'pair_m2', 'comoments'):
+            setattr(stats, name, np.asarray(data[name], dtype=np.float64).reshape(
+                len(stats.numerical_cols), len(stats.numerical_cols)))
+        stats.minimum = np.array(data['minimum'], dtype=np.float64)
+        stats.maximum = np.array(data['maximum'], dtype=np.float64)
+        stats.sketches = [(np.asarray(v, dtype=np.float64), np.asarray(w, dtype=np.float64))
+                          for v, w in data['sketches']]
+        return stats
+
+    def save(self, path):
+        import json
+        import os
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        import json
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+def get_cluster_profiles(df, cluster_col='Cluster', stats=None):
+    """
+    Generate cluster profiles with statistics
+    """
+    if stats is None:
+        stats = compute_cluster_stats(df, cluster_col)
+    return stats.profiles()
+
+def plot_cluster_distribution(df, cluster_col='Cluster', stats=None):
+    """
+    Plot cluster distribution (from precomputed cluster sizes when stats
+    is given)
+    """
+    import plotly.express as px
+    if stats is not None:
+        sizes = stats.sizes.rename('count').rename_axis(cluster_col).reset_index()
+        fig = px.bar(sizes, x=cluster_col, y='count',
+                     title='Customer Distribution Across Clusters',
+                     labels={cluster_col: 'Cluster', 'count': 'Number of Customers'},
+                     color=cluster_col, text_auto=True)
+        fig.update_layout(showlegend=False, height=400)
+        return fig
     fig = px.histogram(df, x=cluster_col, 
                        title='Customer Distribution Across Clusters',
                        labels={cluster_col: 'Cluster', 'count': 'Number of Customers'},
@@ -29,28 +433,201 @@ def plot_cluster_distribution(df, cluster_col='Cluster'):
     fig.update_layout(showlegend=False, height=400)
     return fig
 
-def plot_cluster_scatter(df, x_col, y_col, cluster_col='Cluster'):
+def _box_summary(values):
+    """
+    Tukey box-plot summary of one array: quartiles, mean and whiskers at the
+    furthest values within 1.5 IQR of the box
+    """
+    q1, median, q3 = np.quantile(values, DEFAULT_QUANTILES)
+    reach = 1.5 * (q3 - q1)
+    return {
+        'q1': float(q1), 'median': float(median), 'q3': float(q3), 'mean': float(values.mean()),
+        'lowerfence': float(values[values >= q1 - reach].min()),
+        'upperfence': float(values[values <= q3 + reach].max()),
+        'count': int(len(values)),
+    }
+
+def feature_distribution(frames, feature, value_range, cluster_col='Cluster', bins=30):
+    """
+    Histogram counts and per-cluster box-plot summaries of one feature,
+    accumulated over frames (e.g. one cluster partition at a time) so only
+    one frame is held in memory. Every cluster must lie in a single frame.
+    Returns (edges, counts, boxes).
+    """
+    low, high = value_range
+    if not high > low:
+        high = low + 1
+    edges = np.linspace(low, high, bins + 1)
+    counts = np.zeros(bins, dtype=np.int64)
+    boxes = {}
+    for df in frames:
+        for cluster, values in df.groupby(cluster_col, sort=True)[feature]:
+            values = values.dropna().to_numpy(dtype=np.float64)
+            if len(values):
+                counts += np.histogram(values, edges)[0]
+                boxes[cluster] = _box_summary(values)
+    return edges, counts, dict(sorted(boxes.items()))
+
+def plot_binned_histogram(edges, counts, feature, title=None):
+    """
+    Histogram drawn from precomputed bin counts
+    """
+    import plotly.graph_objects as go
+    fig = go.Figure(go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=counts, width=np.diff(edges),
+                           name=feature))
+    fig.update_layout(title=title or f"Distribution of {feature}", xaxis_title=feature,
+                      yaxis_title='count', bargap=0)
+    return fig
+
+def plot_box_summaries(boxes, feature, cluster_col='Cluster', title=None):
+    """
+    One box per cluster drawn from precomputed summaries (see
+    feature_distribution)
+    """
+    import plotly.graph_objects as go
+    fig = go.Figure()
+    for cluster, box in boxes.items():
+        fig.add_trace(go.Box(
+            name=str(cluster), x=[str(cluster)],
+            q1=[box['q1']], median=[box['median']], q3=[box['q3']], mean=[box['mean']],
+            lowerfence=[box['lowerfence']], upperfence=[box['upperfence']]
+        ))
+    fig.update_layout(title=title or f"{feature} by Cluster", xaxis_title=cluster_col,
+                      yaxis_title=feature, legend_title_text=cluster_col)
+    return fig
+
+def stratified_sample(df, cluster_col='Cluster', max_points=20000, min_per_cluster=50, random_state=42):
+    """
+    Downsample to at most max_points rows, keeping every cluster represented
+    in proportion to its size (with a floor of min_per_cluster rows). Rows
+    without a cluster are dropped, unless no row has one, in which case the
+    sample is uniform.
+    """
+    if len(df) <= max_points:
+        return df
+    
+    rng = np.random.default_rng(random_state)
+    codes, _ = pd.factorize(df[cluster_col], sort=True)
+    rows = np.flatnonzero(codes >= 0)
+    if not len(rows):
+        return df.iloc[np.sort(rng.choice(len(df), size=max_points, replace=False))]
+    codes = codes[rows]
+    sizes = np.bincount(codes)
+    # Every cluster gets a floor, the rest of the budget is split by size
+    base = np.minimum(sizes, min(min_per_cluster, max_points // len(sizes)))
+    spare = sizes - base
+    quota = base
+    if spare.sum() > 0:
+        quota = base + np.floor(spare * (max(max_points - base.sum(), 0) / spare.sum())).astype(int)
+    
+    # Shuffle rows within each cluster, then keep the first `quota` of each
+    order = np.lexsort((rng.random(len(codes)), codes))
+    rank = np.arange(len(order)) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+    keep = rows[order[rank < quota[codes[order]]]]
+    return df.iloc[np.sort(keep)]
+
+
+def bin_cluster_density(df, x_col, y_col, cluster_col='Cluster', bins=60):
+    """
+    Aggregate points onto a bins x bins grid per cluster.
+    
+    Returns one row per non-empty (cluster, cell) with the cell centre and
+    the number of customers it contains.
+    """
+    data = df[[x_col, y_col, cluster_col]].dropna()
+    x = data[x_col].to_numpy(dtype=float)
+    y = data[y_col].to_numpy(dtype=float)
+    codes, clusters = pd.factorize(data[cluster_col], sort=True)
+    
+    x_edges = np.linspace(x.min(), x.max(), bins + 1) if len(x) else np.zeros(bins + 1)
+    y_edges = np.linspace(y.min(), y.max(), bins + 1) if len(y) else np.zeros(bins + 1)
+    ix = np.clip(np.searchsorted(x_edges, x, side='right') - 1, 0, bins - 1)
+    iy = np.clip(np.searchsorted(y_edges, y, side='right') - 1, 0, bins - 1)
+    
+    cell = (codes.astype(np.int64) * bins + ix) * bins + iy
+    counts = np.bincount(cell, minlength=len(clusters) * bins * bins)
+    occupied = np.flatnonzero(counts)
+    cluster_idx, rest = np.divmod(occupied, bins * bins)
+    cell_x, cell_y = np.divmod(rest, bins)
+    
+    return pd.DataFrame({
+        x_col: (x_edges[cell_x] + x_edges[cell_x + 1]) / 2,
+        y_col: (y_edges[cell_y] + y_edges[cell_y + 1]) / 2,
+        cluster_col: np.asarray(clusters)[cluster_idx],
+        'count': counts[occupied]
+    })
+
+
+def plot_cluster_density(binned, x_col, y_col, cluster_col='Cluster', title=None, labels=None,
+                         webgl_threshold=5000):
+    """
+    Plot grid cells from bin_cluster_density as markers sized by the number
+    of customers they hold
+    """
+    import plotly.express as px
+    total = int(binned['count'].sum())
+    title = title or f'{y_col} vs {x_col} by Cluster'
+    fig = px.scatter(binned, x=x_col, y=y_col, color=cluster_col, size='count',
+                     title=f'{title} ({len(binned):,} cells summarising {total:,} customers)',
+                     labels=dict({cluster_col: 'Cluster', 'count': 'Customers'}, **(labels or {})),
+                     hover_data=['count'],
+                     color_continuous_scale='Viridis',
+                     render_mode='webgl' if len(binned) > webgl_threshold else 'svg')
+    fig.update_layout(height=500)
+    return fig
+
+
+def plot_cluster_scatter(df, x_col, y_col, cluster_col='Cluster', hover_cols=None,
+                         max_points=20000, mode='auto', webgl_threshold=5000,
+                         density_bins=60, random_state=42, title=None, labels=None):
     """
     Create interactive scatter plot for clusters
+    
+    mode is 'auto' (all points within max_points, otherwise a stratified
+    per-cluster sample), 'sample', 'density' (grid-binned counts) or 'full'.
+    Only hover_cols (default: CustomerID when present) are sent with each
+    point, and WebGL is used once more than webgl_threshold markers are drawn.
     """
-    fig = px.scatter(df, x=x_col, y=y_col, color=cluster_col,
-                     title=f'{y_col} vs {x_col} by Cluster',
-                     labels={cluster_col: 'Cluster'},
-                     hover_data=df.columns,
-                     color_continuous_scale='Viridis')
+    import plotly.express as px
+    title = title or f'{y_col} vs {x_col} by Cluster'
+    total = len(df)
+    
+    if mode == 'density':
+        binned = bin_cluster_density(df, x_col, y_col, cluster_col, bins=density_bins)
+        return plot_cluster_density(binned, x_col, y_col, cluster_col, title=title, labels=labels,
+                                    webgl_threshold=webgl_threshold)
+    
+    if mode == 'full' or (mode == 'auto' and total <= max_points):
+        plot_df = df
+    else:
+        plot_df = stratified_sample(df, cluster_col, max_points=max_points, random_state=random_state)
+    
+    if hover_cols is None:
+        hover_cols = ['CustomerID'] if 'CustomerID' in df.columns else []
+    hover_cols = [c for c in hover_cols if c in plot_df.columns and c not in (x_col, y_col, cluster_col)]
+    
+    if len(plot_df) < total:
+        title = f'{title} (showing {len(plot_df):,} of {total:,} customers, {len(plot_df) / total:.1%})'
+    
+    columns = list(dict.fromkeys([x_col, y_col, cluster_col] + hover_cols))
+    fig = px.scatter(plot_df[columns], x=x_col, y=y_col, color=cluster_col,
+                     title=title,
+                     labels=dict({cluster_col: 'Cluster'}, **(labels or {})),
+                     hover_data=hover_cols,
+                     color_continuous_scale='Viridis',
+                     render_mode='webgl' if len(plot_df) > webgl_threshold else 'svg')
     fig.update_traces(marker=dict(size=8, line=dict(width=0.5, color='white')))
     fig.update_layout(height=500)
     return fig
 
-def plot_cluster_heatmap(df, cluster_col='Cluster'):
+def plot_cluster_heatmap(df, cluster_col='Cluster', stats=None):
     """
     Create heatmap of cluster characteristics
     """
-    numerical_cols = df.select_dtypes(include=[np.number]).columns.tolist()
-    if cluster_col in numerical_cols:
-        numerical_cols.remove(cluster_col)
-    
-    cluster_means = df.groupby(cluster_col)[numerical_cols].mean()
+    import plotly.express as px
+    if stats is None:
+        stats = compute_cluster_stats(df, cluster_col)
+    cluster_means = stats.mean
     
     # Normalize for better visualization
     from sklearn.preprocessing import MinMaxScaler
@@ -71,15 +648,14 @@ def plot_cluster_heatmap(df, cluster_col='Cluster'):
     fig.update_layout(height=400)
     return fig
 
-def plot_radar_chart(df, cluster_col='Cluster'):
+def plot_radar_chart(df, cluster_col='Cluster', stats=None):
     """
     Create radar chart for cluster comparison
     """
-    numerical_cols = df.select_dtypes(include=[np.number]).columns.tolist()
-    if cluster_col in numerical_cols:
-        numerical_cols.remove(cluster_col)
-    
-    cluster_means = df.groupby(cluster_col)[numerical_cols].mean()
+    import plotly.graph_objects as go
+    if stats is None:
+        stats = compute_cluster_stats(df, cluster_col)
+    cluster_means = stats.mean
     
     # Normalize
     from sklearn.preprocessing import MinMaxScaler
@@ -108,12 +684,15 @@ def plot_radar_chart(df, cluster_col='Cluster'):
     )
     return fig
 
-def plot_correlation_heatmap(df):
+def plot_correlation_heatmap(df, stats=None):
     """
-    Plot correlation heatmap
+    Plot correlation heatmap; pass precomputed StreamingStats to skip
+    the pass over df
     """
-    numerical_cols = df.select_dtypes(include=[np.number]).columns
-    corr_matrix = df[numerical_cols].corr()
+    import plotly.express as px
+    if stats is None:
+        stats = StreamingStats.from_frame(df)
+    corr_matrix = stats.corr()
     
     fig = px.imshow(corr_matrix,
                     labels=dict(color="Correlation"),
@@ -125,33 +704,31 @@ def plot_correlation_heatmap(df):
     fig.update_layout(height=600)
     return fig
 
-def generate_cluster_insights(df, cluster_col='Cluster'):
+def generate_cluster_insights(df, cluster_col='Cluster', stats=None):
     """
     Generate textual insights for each cluster
     """
+    if stats is None:
+        stats = compute_cluster_stats(df, cluster_col)
     insights = {}
     
-    numerical_cols = df.select_dtypes(include=[np.number]).columns.tolist()
-    if cluster_col in numerical_cols:
-        numerical_cols.remove(cluster_col)
-    
-    for cluster_id in sorted(df[cluster_col].unique()):
-        cluster_data = df[df[cluster_col] == cluster_id]
-        cluster_size = len(cluster_data)
-        cluster_pct = (cluster_size / len(df)) * 100
+    means = stats.mean
+    medians = stats.median
+    for cluster_id, cluster_size in stats.sizes.items():
+        cluster_pct = (cluster_size / stats.n_rows) * 100
         
-        # Calculate key statistics
-        stats = {}
-        for col in numerical_cols:
-            stats[col] = {
-                'mean': cluster_data[col].mean(),
-                'median': cluster_data[col].median()
+        # Key statistics, read from the shared aggregation
+        cluster_stats = {}
+        for col in stats.numerical_cols:
+            cluster_stats[col] = {
+                'mean': means.at[cluster_id, col],
+                'median': medians.at[cluster_id, col]
             }
         
         insights[cluster_id] = {
-            'size': cluster_size,
+            'size': int(cluster_size),
             'percentage': cluster_pct,
-            'stats': stats
+            'stats': cluster_stats
         }
     
     return insights
@@ -11,18 +11,38 @@ from plotly.subplots import make_subplots
 sys.path.append('/app/customer_segmentation')
 
 from src.data_preprocessing import DataPreprocessor
+from src.features import derive_features
 from src.clustering_model import CustomerSegmentation
 from src.utils import (
     get_cluster_profiles,
     plot_cluster_distribution,
     plot_cluster_scatter,
+    plot_cluster_density,
     plot_cluster_heatmap,
     plot_radar_chart,
     plot_correlation_heatmap,
-    generate_cluster_insights
+    plot_binned_histogram,
+    plot_box_summaries,
+    generate_cluster_insights,
+    compute_cluster_stats,
+    feature_distribution,
+    ClusterStats
 )
+from src.data_store import (read_clustered_dataset, dataset_version, query_page, read_embedding,
+                            read_embedding_metadata, read_dataset_stats, list_clusters)
+from src.batch_scoring import score_csv
+from src.monitoring import DriftMonitor
 import joblib
 
+CLUSTERED_DATA_PATH = '/app/customer_segmentation/data/customers_clustered.parquet'
+CLUSTERED_CSV_PATH = '/app/customer_segmentation/data/customers_clustered.csv'
+EMBEDDING_PATH = '/app/customer_segmentation/data/customers_embedding'
+DRIFT_REFERENCE_PATH = '/app/customer_segmentation/model/drift_reference.json'
+BATCH_CHUNK_SIZE = 50000
+VIEW_CACHE_ENTRIES = 64
+EXPLORER_PAGE_SIZES = [20, 50, 100, 500]
+FEATURE_BINS = 30
+
 # Page configuration
 st.set_page_config(
     page_title="Customer Segmentation Dashboard",
@@ -91,16 +111,115 @@ def load_models():
         st.error(f"Error loading models: {e}")
         return None, None
 
-# Load clustered data
-@st.cache_data
-def load_clustered_data():
+def clustered_data_version():
+    return dataset_version(CLUSTERED_DATA_PATH, csv_path=CLUSTERED_CSV_PATH)
+
+# Load clustered data (optionally only some clusters / columns)
+@st.cache_data(max_entries=VIEW_CACHE_ENTRIES)
+def _load_clustered_data(version, clusters=None, columns=None):
     try:
-        df = pd.read_csv('/app/customer_segmentation/data/customers_clustered.csv')
+        df = read_clustered_dataset(CLUSTERED_DATA_PATH, clusters=clusters, columns=columns,
+                                    csv_path=CLUSTERED_CSV_PATH)
         return df
     except Exception as e:
         st.error(f"Error loading data: {e}")
         return None
 
+def load_clustered_data(clusters=None, columns=None):
+    return _load_clustered_data(clustered_data_version(), clusters, columns)
+
+# Per-cluster aggregates for the whole dataset, computed once per data version
+# one cluster partition at a time; any cluster selection is sliced from it
+# instead of re-aggregating
+@st.cache_resource(max_entries=4)
+def full_cluster_stats(version):
+    return ClusterStats.concat([
+        compute_cluster_stats(read_clustered_dataset(CLUSTERED_DATA_PATH, clusters=[cluster],
+                                                     csv_path=CLUSTERED_CSV_PATH))
+        for cluster in cluster_ids(version)
+    ])
+
+@st.cache_data(max_entries=VIEW_CACHE_ENTRIES)
+def cluster_selection_views(version, clusters):
+    stats = full_cluster_stats(version).select(clusters)
+    return (generate_cluster_insights(None, stats=stats),
+            plot_radar_chart(None, stats=stats),
+            get_cluster_profiles(None, stats=stats))
+
+@st.cache_data(max_entries=VIEW_CACHE_ENTRIES)
+def cluster_scatter_figure(version, clusters, x_feature, y_feature, mode):
+    columns = tuple(dict.fromkeys(('CustomerID', x_feature, y_feature, 'Cluster')))
+    df = _load_clustered_data(version, clusters, columns)
+    return plot_cluster_scatter(df, x_feature, y_feature, mode=mode)
+
+def embedding_version():
+    return dataset_version(EMBEDDING_PATH)
+
+# 2-D projection precomputed by the training pipeline; only the stored
+# coordinates (or density cells) of the selected clusters are read
+@st.cache_data(max_entries=VIEW_CACHE_ENTRIES)
+def embedding_figure(version, clusters, mode):
+    meta = read_embedding_metadata(EMBEDDING_PATH)
+    ratios = meta['explained_variance_ratio']
+    labels = {f'PC{i + 1}': f'PC{i + 1} ({r:.0%} of variance)' for i, r in enumerate(ratios)}
+    title = 'Customers on the First Two Principal Components'
+    if mode == 'density':
+        binned = read_embedding(EMBEDDING_PATH, 'density', clusters=clusters)
+        return plot_cluster_density(binned, 'PC1', 'PC2', title=title, labels=labels)
+    points = read_embedding(EMBEDDING_PATH, 'points', clusters=clusters)
+    return plot_cluster_scatter(points, 'PC1', 'PC2', title=title, labels=labels)
+
+@st.cache_data(max_entries=4)
+def embedding_loadings(version):
+    loadings = pd.DataFrame(read_embedding_metadata(EMBEDDING_PATH)['loadings'],
+                            index=['PC1', 'PC2']).T
+    return loadings.reindex(loadings.abs().max(axis=1).sort_values(ascending=False).index)
+
+# Summary and correlations come from the statistics saved with the dataset
+# (or a batched scan of older stores), so no rows are loaded here
+@st.cache_resource(max_entries=4)
+def dataset_stats(version):
+    return read_dataset_stats(CLUSTERED_DATA_PATH, csv_path=CLUSTERED_CSV_PATH)
+
+@st.cache_data(max_entries=4)
+def dataset_summary(version):
+    stats = dataset_stats(version)
+    return stats.describe(), plot_correlation_heatmap(None, stats=stats), stats.missing_values
+
+# Histogram bins and box summaries are accumulated one cluster partition at
+# a time; the figures only carry the summaries, never the rows
+@st.cache_data(max_entries=VIEW_CACHE_ENTRIES)
+def feature_distribution_figures(version, feature):
+    stats = dataset_stats(version)
+    j = stats.numerical_cols.index(feature)
+    parts = (read_clustered_dataset(CLUSTERED_DATA_PATH, clusters=[cluster], columns=(feature, 'Cluster'),
+                                    csv_path=CLUSTERED_CSV_PATH)
+             for cluster in cluster_ids(version))
+    edges, counts, boxes = feature_distribution(parts, feature, (stats.minimum[j], stats.maximum[j]),
+                                                bins=FEATURE_BINS)
+    return plot_binned_histogram(edges, counts, feature), plot_box_summaries(boxes, feature)
+
+# Cluster ids come from the partition directories; only a legacy CSV-only
+# store needs its Cluster column read
+@st.cache_data(max_entries=4)
+def cluster_ids(version):
+    if os.path.isdir(CLUSTERED_DATA_PATH):
+        return list_clusters(CLUSTERED_DATA_PATH)
+    return sorted(_load_clustered_data(version, columns=('Cluster',))['Cluster'].unique().tolist())
+
+# One page of the explorer grid; filtering and sorting run inside the scan
+@st.cache_data(max_entries=VIEW_CACHE_ENTRIES)
+def explorer_page(version, filters, sort_by, ascending, offset, limit):
+    return query_page(CLUSTERED_DATA_PATH, filters=filters, sort_by=sort_by, ascending=ascending,
+                      offset=offset, limit=limit, csv_path=CLUSTERED_CSV_PATH)
+
+def dataset_csv_bytes(version):
+    # Serve the CSV export written by the training pipeline when present
+    if os.path.exists(CLUSTERED_CSV_PATH):
+        with open(CLUSTERED_CSV_PATH, 'rb') as f:
+            return f.read()
+    return _load_clustered_data(version).to_csv(index=False).encode()
+
 # Main app
 def main():
     st.markdown('<h1 class="main-header">📊 Customer Segmentation Dashboard</h1>', unsafe_allow_html=True)
@@ -113,39 +232,43 @@ def main():
         ["Dashboard Overview", "Cluster Analysis", "Predict New Customers", "Dataset Explorer"]
     )
     
-    # Load data and models
-    df = load_clustered_data()
+    # Load models; clustered data is loaded per page, only as much as it needs
     model, preprocessor = load_models()
     
-    if df is None:
+    if clustered_data_version()[0] == 0:
         st.error("⚠️ Please run the training pipeline first to generate clustered data.")
         st.code("python /app/customer_segmentation/notebooks/EDA_and_Training.py")
         return
     
     # Page routing
     if page == "Dashboard Overview":
-        show_dashboard(df, model)
+        show_dashboard(clustered_data_version(), model)
     elif page == "Cluster Analysis":
-        show_cluster_analysis(df)
+        show_cluster_analysis(full_cluster_stats(clustered_data_version()))
     elif page == "Predict New Customers":
         show_prediction_page(model, preprocessor)
     elif page == "Dataset Explorer":
-        show_dataset_explorer(df)
+        show_dataset_explorer()
 
-def show_dashboard(df, model):
+def show_dashboard(version, model):
     st.markdown('<h2 class="sub-header">📈 Dashboard Overview</h2>', unsafe_allow_html=True)
     
+    # Everything here comes from saved or per-cluster statistics and a
+    # sampled scatter; the full dataset is never loaded
+    cluster_stats = full_cluster_stats(version)
+    means = dataset_stats(version).mean
+    
     # Key Metrics
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        st.metric("Total Customers", f"{len(df):,}")
+        st.metric("Total Customers", f"{cluster_stats.n_rows:,}")
     with col2:
-        st.metric("Number of Clusters", f"{df['Cluster'].nunique()}")
+        st.metric("Number of Clusters", f"{len(cluster_stats.clusters)}")
     with col3:
-        st.metric("Avg Customer Value", f"${df['TotalSpend'].mean():,.0f}")
+        st.metric("Avg Customer Value", f"${means['TotalSpend']:,.0f}")
     with col4:
-        st.metric("Avg Purchase Frequency", f"{df['PurchaseFrequency'].mean():.1f}")
+        st.metric("Avg Purchase Frequency", f"{means['PurchaseFrequency']:.1f}")
     
     st.markdown("---")
     
@@ -154,17 +277,17 @@ def show_dashboard(df, model):
     
     with col1:
         st.markdown('<h3 class="sub-header">Cluster Distribution</h3>', unsafe_allow_html=True)
-        fig = plot_cluster_distribution(df)
+        fig = plot_cluster_distribution(None, stats=cluster_stats)
         st.plotly_chart(fig, use_container_width=True)
     
     with col2:
         st.markdown('<h3 class="sub-header">Income vs Spending Score</h3>', unsafe_allow_html=True)
-        fig = plot_cluster_scatter(df, 'Income', 'SpendingScore')
+        fig = cluster_scatter_figure(version, tuple(cluster_stats.clusters), 'Income', 'SpendingScore', 'auto')
         st.plotly_chart(fig, use_container_width=True)
     
     # Cluster Characteristics
     st.markdown('<h3 class="sub-header">Cluster Characteristics Heatmap</h3>', unsafe_allow_html=True)
-    fig = plot_cluster_heatmap(df)
+    fig = plot_cluster_heatmap(None, stats=cluster_stats)
     st.plotly_chart(fig, use_container_width=True)
     
     # Model Performance
@@ -190,28 +313,28 @@ def show_dashboard(df, model):
                 st.write(f"- Inertia: {model.model.inertia_:.2f}")
             st.markdown('</div>', unsafe_allow_html=True)
 
-def show_cluster_analysis(df):
+def show_cluster_analysis(cluster_stats):
     st.markdown('<h2 class="sub-header">🔍 Cluster Analysis</h2>', unsafe_allow_html=True)
     
     # Sidebar filters
     st.sidebar.markdown("### Filters")
     selected_clusters = st.sidebar.multiselect(
         "Select Clusters",
-        options=sorted(df['Cluster'].unique()),
-        default=sorted(df['Cluster'].unique())
+        options=cluster_stats.clusters,
+        default=cluster_stats.clusters
     )
     
     if not selected_clusters:
         st.warning("Please select at least one cluster")
         return
     
-    df_filtered = df[df['Cluster'].isin(selected_clusters)]
+    version = clustered_data_version()
+    clusters = tuple(sorted(int(c) for c in selected_clusters))
+    insights, radar_fig, profiles = cluster_selection_views(version, clusters)
     
     # Cluster profiles
     st.markdown('<h3 class="sub-header">Cluster Profiles</h3>', unsafe_allow_html=True)
     
-    insights = generate_cluster_insights(df_filtered)
-    
     # Display cluster cards
     cols = st.columns(min(len(selected_clusters), 3))
     for idx, (cluster_id, data) in enumerate(insights.items()):
@@ -228,25 +351,39 @@ def show_cluster_analysis(df):
     
     # Radar chart
     st.markdown('<h3 class="sub-header">Cluster Comparison - Radar Chart</h3>', unsafe_allow_html=True)
-    fig = plot_radar_chart(df_filtered)
-    st.plotly_chart(fig, use_container_width=True)
+    st.plotly_chart(radar_fig, use_container_width=True)
+    
+    # Precomputed 2-D projection of all features
+    st.markdown('<h3 class="sub-header">Customer Map (PCA Projection)</h3>', unsafe_allow_html=True)
+    if embedding_version()[0] == 0:
+        st.info("Customer map not available. Re-run the training pipeline to generate it.")
+    else:
+        map_mode = st.radio("Show", ['Density', 'Points (sampled)'], horizontal=True, key='map_mode')
+        fig = embedding_figure(embedding_version(), clusters,
+                               'density' if map_mode == 'Density' else 'auto')
+        st.plotly_chart(fig, use_container_width=True)
+        with st.expander("Feature loadings"):
+            st.dataframe(embedding_loadings(embedding_version()).style.format('{:.2f}'),
+                         use_container_width=True)
     
     # Scatter plots
     st.markdown('<h3 class="sub-header">Feature Relationships</h3>', unsafe_allow_html=True)
     
-    col1, col2 = st.columns(2)
+    col1, col2, col3 = st.columns(3)
     
     with col1:
         x_feature = st.selectbox("X-axis", ['Income', 'Age', 'SpendingScore', 'PurchaseFrequency', 'AvgOrderValue', 'Recency'], key='x1')
     with col2:
         y_feature = st.selectbox("Y-axis", ['SpendingScore', 'TotalSpend', 'Income', 'PurchaseFrequency', 'AvgOrderValue'], key='y1')
+    with col3:
+        render_mode = st.selectbox("Rendering", ['Points (sampled)', 'Density'], key='render1')
     
-    fig = plot_cluster_scatter(df_filtered, x_feature, y_feature)
+    fig = cluster_scatter_figure(version, clusters, x_feature, y_feature,
+                                 'density' if render_mode == 'Density' else 'auto')
     st.plotly_chart(fig, use_container_width=True)
     
     # Detailed statistics
     st.markdown('<h3 class="sub-header">Detailed Cluster Statistics</h3>', unsafe_allow_html=True)
-    profiles = get_cluster_profiles(df_filtered)
     st.dataframe(profiles, use_container_width=True)
 
 def show_prediction_page(model, preprocessor):
@@ -272,7 +409,7 @@ def show_prediction_page(model, preprocessor):
         with col3:
             aov = st.number_input("Average Order Value ($)", min_value=50, max_value=5000, value=500, step=50)
             recency = st.number_input("Recency (days since last purchase)", min_value=0, max_value=365, value=30)
-            total_spend = purchase_freq * aov
+            total_spend = derive_features({'PurchaseFrequency': purchase_freq, 'AvgOrderValue': aov})['TotalSpend']
             st.metric("Calculated Total Spend", f"${total_spend:,.0f}")
         
         if st.button("🔮 Predict Cluster", key="predict_single"):
@@ -287,11 +424,10 @@ def show_prediction_page(model, preprocessor):
                         'Region': [region],
                         'PurchaseFrequency': [purchase_freq],
                         'AvgOrderValue': [aov],
-                        'Recency': [recency],
-                        'TotalSpend': [total_spend]
+                        'Recency': [recency]
                     })
                     
-                    # Preprocess
+                    # Preprocess (adds the derived features)
                     customer_processed = preprocessor.preprocess(customer_data, remove_outliers=False, fit=False)
                     
                     # Predict
@@ -300,8 +436,8 @@ def show_prediction_page(model, preprocessor):
                     st.success(f"### Customer belongs to Cluster {cluster}")
                     
                     # Load reference data for comparison
-                    df_ref = load_clustered_data()
-                    cluster_data = df_ref[df_ref['Cluster'] == cluster]
+                    cluster_data = load_clustered_data(clusters=(int(cluster),),
+                                                       columns=('Income', 'SpendingScore'))
                     
                     st.markdown("#### Cluster Characteristics:")
                     col1, col2, col3 = st.columns(3)
@@ -325,103 +461,188 @@ def show_prediction_page(model, preprocessor):
         
         if uploaded_file is not None:
             try:
-                df_upload = pd.read_csv(uploaded_file)
                 st.write("Preview of uploaded data:")
-                st.dataframe(df_upload.head())
+                st.dataframe(pd.read_csv(uploaded_file, nrows=5))
+                uploaded_file.seek(0)
                 
                 if st.button("🔮 Predict Clusters", key="predict_batch"):
                     if model and preprocessor:
-                        # Calculate TotalSpend if not present
-                        if 'TotalSpend' not in df_upload.columns:
-                            df_upload['TotalSpend'] = df_upload['PurchaseFrequency'] * df_upload['AvgOrderValue']
+                        progress = st.progress(0.0, text="Scoring...")
                         
-                        # Preprocess
-                        df_processed = preprocessor.preprocess(df_upload.copy(), remove_outliers=False, fit=False)
+                        def report_progress(rows, elapsed, fraction):
+                            rate = rows / elapsed if elapsed > 0 else 0
+                            progress.progress(fraction if fraction is not None else 0.0,
+                                              text=f"Scored {rows:,} rows ({rate:,.0f} rows/sec)")
                         
-                        # Predict
-                        if 'CustomerID' in df_processed.columns:
-                            df_features = df_processed.drop('CustomerID', axis=1)
-                        else:
-                            df_features = df_processed
+                        # Stream the upload through preprocess/predict chunk by chunk,
+                        # sketching its distribution against the training data
+                        monitor = None
+                        if os.path.exists(DRIFT_REFERENCE_PATH):
+                            monitor = DriftMonitor.load(DRIFT_REFERENCE_PATH)
+                        result = score_csv(uploaded_file, model, preprocessor,
+                                           chunksize=BATCH_CHUNK_SIZE,
+                                           progress_callback=report_progress,
+                                           monitor=monitor)
+                        progress.progress(1.0, text=f"Scored {result['rows']:,} rows "
+                                                    f"({result['rows_per_sec']:,.0f} rows/sec)")
                         
-                        clusters = model.predict(df_features)
-                        df_upload['Cluster'] = clusters
+                        # Keep at most one results file per session on disk
+                        previous_output = st.session_state.get('batch_output_path')
+                        if previous_output and os.path.exists(previous_output):
+                            os.remove(previous_output)
+                        st.session_state['batch_output_path'] = result['output_path']
                         
                         st.success("✅ Predictions completed!")
-                        st.dataframe(df_upload)
+                        st.write(f"Preview of the first {len(result['preview'])} of {result['rows']:,} rows:")
+                        st.dataframe(result['preview'])
                         
-                        # Download button
-                        csv = df_upload.to_csv(index=False)
-                        st.download_button(
-                            label="📥 Download Predictions",
-                            data=csv,
-                            file_name="customer_predictions.csv",
-                            mime="text/csv"
-                        )
+                        # Download button served from the temporary results file
+                        with open(result['output_path'], 'rb') as predictions_file:
+                            st.download_button(
+                                label="📥 Download Predictions",
+                                data=predictions_file,
+                                file_name="customer_predictions.csv",
+                                mime="text/csv"
+                            )
                         
                         # Show distribution
                         st.markdown("### Cluster Distribution")
-                        fig = plot_cluster_distribution(df_upload)
+                        counts = pd.DataFrame({
+                            'Cluster': list(result['cluster_counts'].keys()),
+                            'Customers': list(result['cluster_counts'].values())
+                        })
+                        fig = px.bar(counts, x='Cluster', y='Customers', color='Cluster',
+                                     title='Customer Distribution Across Clusters', text_auto=True)
+                        fig.update_layout(showlegend=False, height=400)
                         st.plotly_chart(fig, use_container_width=True)
+                        
+                        if result['drift'] is not None and result['drift']['n']:
+                            show_drift_report(result['drift'])
                     else:
                         st.error("Model not loaded.")
             except Exception as e:
                 st.error(f"Error processing file: {e}")
 
-def show_dataset_explorer(df):
+def show_drift_report(drift):
+    st.markdown("### Drift vs Training Data")
+    status = drift['status']
+    message = (f"Overall: **{status}** (max PSI {drift['max_psi']:.3f}) over {drift['n']:,} rows. "
+               "PSI below 0.1 is stable, 0.1-0.25 a moderate shift, above 0.25 significant.")
+    if status == 'significant':
+        st.warning(message)
+    else:
+        st.info(message)
+    
+    rows = [{'Input': name, 'PSI': entry['psi'], 'KS': entry.get('ks'), 'Status': entry['status']}
+            for name, entry in drift['features'].items()]
+    rows.append({'Input': 'Cluster frequencies', 'PSI': drift['clusters']['psi'], 'KS': None,
+                 'Status': drift['clusters']['status']})
+    rows.append({'Input': 'Distance to centroid', 'PSI': drift['distance']['psi'],
+                 'KS': drift['distance']['ks'], 'Status': drift['distance']['status']})
+    st.dataframe(pd.DataFrame(rows).sort_values('PSI', ascending=False),
+                 use_container_width=True, hide_index=True)
+
+def show_dataset_explorer():
     st.markdown('<h2 class="sub-header">📊 Dataset Explorer</h2>', unsafe_allow_html=True)
     
+    version = clustered_data_version()
+    summary, corr_fig, missing_values = dataset_summary(version)
+    _, total_rows = explorer_page(version, (), None, True, 0, 0)
+    columns = explorer_page(version, (), None, True, 0, 1)[0].columns.tolist()
+    
     # Dataset overview
     st.markdown("### Dataset Overview")
     col1, col2, col3 = st.columns(3)
     with col1:
-        st.metric("Total Rows", len(df))
+        st.metric("Total Rows", f"{total_rows:,}")
     with col2:
-        st.metric("Total Columns", len(df.columns))
+        st.metric("Total Columns", len(columns))
     with col3:
-        st.metric("Missing Values", df.isnull().sum().sum())
+        st.metric("Missing Values", missing_values)
     
-    # Data preview
-    st.markdown("### Data Preview")
-    st.dataframe(df.head(20), use_container_width=True)
+    # Data browser: only the visible page is read from the store
+    st.markdown("### Data Browser")
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        sort_by = st.selectbox("Sort by", ['(none)'] + columns, key='grid_sort')
+    with col2:
+        descending = st.checkbox("Descending", key='grid_desc')
+    with col3:
+        page_size = st.selectbox("Rows per page", EXPLORER_PAGE_SIZES, key='grid_page_size')
+    with col4:
+        id_search = st.text_input("CustomerID contains", key='grid_search')
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        cluster_filter = st.multiselect("Clusters", options=cluster_ids(version), key='grid_clusters')
+    with col2:
+        range_col = st.selectbox("Range filter", ['(none)'] + summary.columns.drop('Cluster', errors='ignore').tolist(),
+                                 key='grid_range_col')
+    range_bounds = None
+    if range_col != '(none)':
+        with col3:
+            low, high = float(summary.at['min', range_col]), float(summary.at['max', range_col])
+            range_bounds = st.slider(range_col, min_value=low, max_value=high, value=(low, high),
+                                     key='grid_range')
+    
+    filters = []
+    if cluster_filter:
+        filters.append(('Cluster', 'in', tuple(int(c) for c in cluster_filter)))
+    if id_search:
+        filters.append(('CustomerID', 'contains', id_search))
+    if range_bounds is not None:
+        filters.append((range_col, '>=', range_bounds[0]))
+        filters.append((range_col, '<=', range_bounds[1]))
+    filters = tuple(filters)
+    
+    _, matching_rows = explorer_page(version, filters, None, True, 0, 0)
+    n_pages = max(1, -(-matching_rows // page_size))
+    page_number = st.number_input("Page", min_value=1, max_value=n_pages, value=1, step=1, key='grid_page')
+    offset = (int(page_number) - 1) * page_size
+    
+    page_df, _ = explorer_page(version, filters, None if sort_by == '(none)' else sort_by,
+                               not descending, offset, page_size)
+    st.caption(f"Rows {offset + 1 if len(page_df) else 0:,}–{offset + len(page_df):,} "
+               f"of {matching_rows:,} matching (page {int(page_number)} of {n_pages})")
+    st.dataframe(page_df, use_container_width=True, hide_index=True)
     
     # Statistical summary
     st.markdown("### Statistical Summary")
-    st.dataframe(df.describe(), use_container_width=True)
+    st.dataframe(summary, use_container_width=True)
     
     # Correlation heatmap
     st.markdown("### Feature Correlations")
-    fig = plot_correlation_heatmap(df)
-    st.plotly_chart(fig, use_container_width=True)
+    st.plotly_chart(corr_fig, use_container_width=True)
     
     # Distribution plots
     st.markdown("### Feature Distributions")
     
-    numerical_cols = df.select_dtypes(include=[np.number]).columns.tolist()
-    if 'Cluster' in numerical_cols:
-        numerical_cols.remove('Cluster')
+    numerical_cols = summary.columns.drop('Cluster', errors='ignore').tolist()
     
     selected_feature = st.selectbox("Select Feature", numerical_cols)
+    hist_fig, box_fig = feature_distribution_figures(version, selected_feature)
     
     col1, col2 = st.columns(2)
     
     with col1:
-        fig = px.histogram(df, x=selected_feature, nbins=30, title=f"Distribution of {selected_feature}")
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(hist_fig, use_container_width=True)
     
     with col2:
-        fig = px.box(df, y=selected_feature, color='Cluster', title=f"{selected_feature} by Cluster")
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(box_fig, use_container_width=True)
     
-    # Download data
+    # Download data (the CSV is only read/built once the user asks for it)
     st.markdown("### Download Dataset")
-    csv = df.to_csv(index=False)
-    st.download_button(
-        label="📥 Download Complete Dataset",
-        data=csv,
-        file_name="customers_clustered.csv",
-        mime="text/csv"
-    )
+    if st.button("Prepare Download", key="prepare_dataset_download"):
+        st.session_state['dataset_download_ready'] = True
+    
+    if st.session_state.get('dataset_download_ready'):
+        st.download_button(
+            label="📥 Download Complete Dataset",
+            data=dataset_csv_bytes(version),
+            file_name="customers_clustered.csv",
+            mime="text/csv",
+            on_click=lambda: st.session_state.update(dataset_download_ready=False)
+        )
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,440 @@
+"""
+Concurrency load test for the FastAPI backend.
+
+Drives a mix of /api/predict_cluster, POST /api/status and GET /api/status
+requests at the backend and reports throughput, error rate and
+p50/p95/p99/p99.9 latency per endpoint. MongoDB is replaced by an in-memory
+stand-in and customers are synthetic, so a run needs no network services.
+
+Closed loop: `--concurrency` clients each send their next request as soon
+as the previous one returns. Open loop: requests arrive at `--rate` per
+second (Poisson arrivals) whether or not earlier ones have finished, and
+latency is measured from the scheduled arrival, so queueing behind a slow
+server is counted instead of hidden.
+
+    python -m tests.benchmarks.load_test --concurrency 1,8,32 --duration 10
+    python -m tests.benchmarks.load_test --mode open --rate 50,100,200 --workers 1,2,4
+    python -m tests.benchmarks.load_test --url http://localhost:8001 --mix predict=1
+
+Without --workers or --url the app runs in this process behind an ASGI
+transport, sharing one event loop and CPU with the load generator. With
+--workers each count starts `uvicorn --workers N` on a local port (the
+generator still shares the machine's CPUs).
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[2]
+SEGMENTATION_DIR = ROOT / 'customer_segmentation'
+BACKEND_DIR = ROOT / 'backend'
+
+# name -> (method, path)
+ENDPOINTS = {
+    'predict': ('POST', '/api/predict_cluster'),
+    'status_post': ('POST', '/api/status'),
+    'status_get': ('GET', '/api/status'),
+}
+DEFAULT_MIX = 'predict=8,status_post=1,status_get=1'
+PERCENTILES = (50, 95, 99, 99.9)
+PAYLOAD_POOL = 1_000
+DEFAULT_MAX_IN_FLIGHT = 1_000
+REQUEST_TIMEOUT = 30.0
+SERVER_START_TIMEOUT = 60.0
+MONGO_LATENCY_ENV = 'LOAD_TEST_MONGO_LATENCY_MS'
+
+
+# In-memory MongoDB stand-in: the subset of the motor API the backend uses
+
+class InMemoryCursor:
+    def __init__(self, docs, latency):
+        self._docs = docs
+        self._latency = latency
+
+    async def to_list(self, length=None):
+        if self._latency:
+            await asyncio.sleep(self._latency)
+        return self._docs if length is None else self._docs[:length]
+
+
+class InMemoryCollection:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.docs = []
+
+    async def insert_one(self, doc):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        # Like pymongo, the inserted document gains an _id
+        doc.setdefault('_id', len(self.docs))
+        self.docs.append(dict(doc))
+
+    def find(self, query=None, projection=None):
+        query = query or {}
+        hidden = {key for key, value in (projection or {}).items() if not value}
+        docs = [{key: value for key, value in doc.items() if key not in hidden}
+                for doc in self.docs if all(doc.get(key) == value for key, value in query.items())]
+        return InMemoryCursor(docs, self.latency)
+
+
+class InMemoryDatabase:
+    """
+    Collections created on first access, each optionally delaying every
+    operation by a fixed round trip
+    """
+    def __init__(self, latency_ms=0.0):
+        self.latency = latency_ms / 1e3
+        self._collections = {}
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return self[name]
+
+    def __getitem__(self, name):
+        if name not in self._collections:
+            self._collections[name] = InMemoryCollection(self.latency)
+        return self._collections[name]
+
+
+def create_app(mongo_latency_ms=None):
+    """
+    The backend app with its database swapped for the in-memory stand-in;
+    also the uvicorn factory used by the worker sweep
+    """
+    os.environ.setdefault('SEGMENTATION_DIR', str(SEGMENTATION_DIR))
+    # The motor client connects lazily, so these never reach a server
+    os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+    os.environ.setdefault('DB_NAME', 'load_test')
+    if str(BACKEND_DIR) not in sys.path:
+        sys.path.append(str(BACKEND_DIR))
+    import server
+    if mongo_latency_ms is None:
+        mongo_latency_ms = float(os.environ.get(MONGO_LATENCY_ENV, 0))
+    server.db = InMemoryDatabase(mongo_latency_ms)
+    return server.app
+
+
+# Request mix and payloads
+
+def parse_mix(text):
+    """
+    'predict=8,status_get=1' -> {'predict': 8.0, 'status_get': 1.0}
+    """
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint {name!r}; choose from {', '.join(ENDPOINTS)}")
+        mix[name] = float(weight) if weight else 1.0
+    if not any(weight > 0 for weight in mix.values()):
+        raise ValueError("The request mix needs at least one positive weight")
+    return mix
+
+
+def synthetic_payloads(n=PAYLOAD_POOL, seed=0):
+    """
+    CustomerInput bodies drawn uniformly from the valid ranges
+    """
+    rng = np.random.default_rng(seed)
+    genders = np.array(['Male', 'Female', 'Other'])
+    regions = np.array(['North', 'South', 'East', 'West', 'Central'])
+    columns = {
+        'age': rng.integers(18, 101, n),
+        'gender': genders[rng.integers(0, len(genders), n)],
+        'income': rng.uniform(15_000, 200_000, n).round(2),
+        'spending_score': rng.integers(1, 101, n),
+        'region': regions[rng.integers(0, len(regions), n)],
+        'purchase_frequency': rng.integers(0, 60, n),
+        'avg_order_value': rng.uniform(10, 1_000, n).round(2),
+        'recency': rng.integers(0, 366, n),
+    }
+    return [{key: values[i].item() for key, values in columns.items()} for i in range(n)]
+
+
+class RequestPicker:
+    """
+    Seeded choice of the next endpoint and its body
+    """
+    def __init__(self, mix, seed=0):
+        self.names = list(mix)
+        self.weights = [mix[name] for name in self.names]
+        self.payloads = synthetic_payloads(seed=seed)
+        self._random = random.Random(seed)
+        self._count = 0
+
+    def next(self):
+        name = self._random.choices(self.names, self.weights)[0]
+        self._count += 1
+        if name == 'predict':
+            body = self.payloads[self._count % len(self.payloads)]
+        elif name == 'status_post':
+            body = {'client_name': f"load-test-{self._count}"}
+        else:
+            body = None
+        return name, body
+
+
+# Load generation
+
+async def _send(client, name, body, scheduled, records):
+    method, path = ENDPOINTS[name]
+    try:
+        response = await client.request(method, path, json=body)
+        status = response.status_code
+    except Exception as e:
+        status = type(e).__name__
+    records.append((name, time.perf_counter() - scheduled, status))
+
+
+async def closed_loop(client, picker, concurrency, duration):
+    records = []
+    deadline = time.perf_counter() + duration
+
+    async def user():
+        while time.perf_counter() < deadline:
+            name, body = picker.next()
+            await _send(client, name, body, time.perf_counter(), records)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    return records, time.perf_counter() - start
+
+
+async def open_loop(client, picker, rate, duration, max_in_flight=DEFAULT_MAX_IN_FLIGHT, seed=0):
+    """
+    Poisson arrivals at `rate` per second. Arrivals that find max_in_flight
+    requests outstanding are recorded as 'dropped' errors.
+    """
+    records = []
+    tasks = set()
+    arrivals = random.Random(seed)
+    start = time.perf_counter()
+    scheduled = start
+    while True:
+        scheduled += arrivals.expovariate(rate)
+        if scheduled - start >= duration:
+            break
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        name, body = picker.next()
+        if len(tasks) >= max_in_flight:
+            records.append((name, time.perf_counter() - scheduled, 'dropped'))
+            continue
+        task = asyncio.create_task(_send(client, name, body, scheduled, records))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    if tasks:
+        await asyncio.gather(*tasks)
+    return records, time.perf_counter() - start
+
+
+def summarize(records, elapsed):
+    """
+    Per-endpoint and overall throughput, error rate and latency percentiles
+    (ms) over the requests that got a response. Non-2xx responses, client
+    exceptions and dropped arrivals count as errors.
+    """
+    groups = {'all': records}
+    for name in sorted({record[0] for record in records}):
+        groups[name] = [record for record in records if record[0] == name]
+
+    summary = {}
+    for name, group in groups.items():
+        statuses = Counter(str(record[2]) for record in group)
+        ok = sum(1 for record in group if isinstance(record[2], int) and record[2] < 400)
+        answered = np.array([record[1] for record in group if isinstance(record[2], int)]) * 1e3
+        summary[name] = {
+            'requests': len(group),
+            'errors': len(group) - ok,
+            'error_rate': (len(group) - ok) / len(group) if group else 0.0,
+            'throughput_rps': ok / elapsed if elapsed else 0.0,
+            'statuses': dict(statuses),
+        }
+        for p, value in zip(PERCENTILES, np.percentile(answered, PERCENTILES) if len(answered)
+                            else [None] * len(PERCENTILES)):
+            summary[name][f"p{p:g}_ms"] = float(value) if value is not None else None
+    return summary
+
+
+async def run_scenario(client, mix, mode='closed', concurrency=8, rate=50.0, duration=10.0,
+                       max_in_flight=DEFAULT_MAX_IN_FLIGHT, seed=0):
+    """
+    One warm-up request per endpoint in the mix (untimed, it absorbs the
+    model load), then `duration` seconds of load
+    """
+    picker = RequestPicker(mix, seed=seed)
+    for name in mix:
+        method, path = ENDPOINTS[name]
+        body = picker.payloads[0] if name == 'predict' else \
+            {'client_name': 'warmup'} if name == 'status_post' else None
+        await client.request(method, path, json=body)
+
+    if mode == 'closed':
+        records, elapsed = await closed_loop(client, picker, concurrency, duration)
+    else:
+        records, elapsed = await open_loop(client, picker, rate, duration, max_in_flight, seed=seed)
+    return {'elapsed': elapsed, 'endpoints': summarize(records, elapsed)}
+
+
+def _client(url=None, connections=100, mongo_latency_ms=0.0):
+    import logging
+    import httpx
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+    if url is None:
+        transport = httpx.ASGITransport(app=create_app(mongo_latency_ms))
+        return httpx.AsyncClient(transport=transport, base_url='http://load-test', timeout=REQUEST_TIMEOUT)
+    limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+    return httpx.AsyncClient(base_url=url, limits=limits, timeout=REQUEST_TIMEOUT)
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class UvicornServer:
+    """
+    `uvicorn --workers N` serving create_app() on a free local port
+    """
+    def __init__(self, workers, mongo_latency_ms=0.0):
+        self.workers = workers
+        self.mongo_latency_ms = mongo_latency_ms
+        self.port = _free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.process = None
+
+    def __enter__(self):
+        import importlib.util
+        if importlib.util.find_spec('uvicorn') is None:
+            raise ImportError("--workers needs uvicorn (pip install -r backend/requirements.txt)")
+        env = dict(os.environ, **{MONGO_LATENCY_ENV: str(self.mongo_latency_ms)})
+        env.setdefault('SEGMENTATION_DIR', str(SEGMENTATION_DIR))
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'uvicorn', 'tests.benchmarks.load_test:create_app', '--factory',
+             '--host', '127.0.0.1', '--port', str(self.port), '--workers', str(self.workers),
+             '--log-level', 'warning', '--no-access-log'],
+            cwd=str(ROOT), env=env)
+        self._wait_ready()
+        return self
+
+    def _wait_ready(self):
+        import httpx
+        deadline = time.monotonic() + SERVER_START_TIMEOUT
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with status {self.process.returncode}")
+            try:
+                if httpx.get(f"{self.url}/api/", timeout=1.0).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            time.sleep(0.2)
+        raise TimeoutError(f"uvicorn did not answer on {self.url} within {SERVER_START_TIMEOUT:.0f}s")
+
+    def __exit__(self, *exc):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+
+def run_sweep(mix, mode='closed', concurrencies=(8,), rates=(50.0,), workers=(None,), url=None,
+              duration=10.0, max_in_flight=DEFAULT_MAX_IN_FLIGHT, mongo_latency_ms=0.0, seed=0, log=print):
+    """
+    Every combination of worker count and concurrency (closed loop) or
+    arrival rate (open loop). workers=(None,) runs in process, or against
+    url when given.
+    """
+    results = []
+    levels = concurrencies if mode == 'closed' else rates
+    for worker_count in workers:
+        with contextlib.ExitStack() as stack:
+            target = url
+            if worker_count:
+                target = stack.enter_context(UvicornServer(worker_count, mongo_latency_ms)).url
+            for level in levels:
+                async def run():
+                    connections = int(level) if mode == 'closed' else max_in_flight
+                    async with _client(target, connections, mongo_latency_ms) as client:
+                        return await run_scenario(
+                            client, mix, mode=mode, concurrency=int(level), rate=float(level),
+                            duration=duration, max_in_flight=max_in_flight, seed=seed)
+                result = asyncio.run(run())
+                result.update({'mode': mode, 'workers': worker_count,
+                               'concurrency' if mode == 'closed' else 'rate': level})
+                results.append(result)
+                log(format_result(result))
+    return results
+
+
+def format_result(result):
+    target = f"workers={result['workers'] or 'in-process'}"
+    level = (f"concurrency={result['concurrency']}" if result['mode'] == 'closed'
+             else f"rate={result['rate']:g}/s")
+    lines = [f"{result['mode']} loop, {target}, {level}, {result['elapsed']:.1f}s"]
+    for name, s in result['endpoints'].items():
+        latency = ' '.join(f"{s[f'p{p:g}_ms']:>8.1f}" if s[f'p{p:g}_ms'] is not None else f"{'-':>8}"
+                           for p in PERCENTILES)
+        lines.append(f"  {name:<12}{s['requests']:>8,} req {s['throughput_rps']:>9.1f}/s "
+                     f"{s['error_rate']:>7.2%} err  {latency}")
+    return '\n'.join(lines)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrency load test for the FastAPI backend")
+    parser.add_argument('--mode', choices=['closed', 'open'], default='closed')
+    parser.add_argument('--concurrency', default='8', help="Closed loop: comma separated client counts")
+    parser.add_argument('--rate', default='50', help="Open loop: comma separated arrival rates (req/s)")
+    parser.add_argument('--duration', type=float, default=10.0, help="Seconds of load per run")
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f"Endpoint weights, default {DEFAULT_MIX}")
+    parser.add_argument('--workers', default=None,
+                        help="Comma separated uvicorn worker counts to sweep (default: in process)")
+    parser.add_argument('--url', default=None, help="Load an already running backend instead")
+    parser.add_argument('--max-in-flight', type=int, default=DEFAULT_MAX_IN_FLIGHT,
+                        help="Open loop: outstanding requests before arrivals are dropped")
+    parser.add_argument('--mongo-latency-ms', type=float, default=0.0,
+                        help="Simulated round trip of each in-memory Mongo operation")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--save', default=None, help="Write results to this JSON file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.url and args.workers:
+        raise SystemExit("--url and --workers are mutually exclusive")
+    print(f"{'':<14}{'requests':>12} {'throughput':>11} {'errors':>11}  "
+          + ' '.join(f"{f'p{p:g} ms':>8}" for p in PERCENTILES))
+    results = run_sweep(
+        parse_mix(args.mix), mode=args.mode,
+        concurrencies=[int(c) for c in args.concurrency.split(',')],
+        rates=[float(r) for r in args.rate.split(',')],
+        workers=[int(w) for w in args.workers.split(',')] if args.workers else [None],
+        url=args.url, duration=args.duration, max_in_flight=args.max_in_flight,
+        mongo_latency_ms=args.mongo_latency_ms, seed=args.seed)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results saved to {args.save}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
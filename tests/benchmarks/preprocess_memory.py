@@ -0,0 +1,146 @@
+"""
+Peak resident memory of preprocess() against the low-memory path.
+
+Each mode runs in a fresh process on the same synthetic input: the input is
+built first, the kernel's peak-RSS counter is reset, and the mode's peak RSS
+above that baseline is reported along with wall time.
+
+    python -m tests.benchmarks.preprocess_memory --rows 10M
+    python -m tests.benchmarks.preprocess_memory --rows 1M --modes default,low_memory
+"""
+import argparse
+import gc
+import json
+import subprocess
+import sys
+import time
+
+from tests.benchmarks.run_benchmarks import format_size, parse_size
+
+MODES = ('default', 'low_memory', 'low_memory_downcast')
+
+
+def _status_kb(field):
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith(field + ':'):
+                return int(line.split()[1])
+    return 0
+
+
+def _release_free_memory():
+    # Hand memory freed while building the input back to the OS, so it is
+    # not silently reused by the measured mode
+    try:
+        import ctypes
+        ctypes.CDLL('libc.so.6').malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+def _reset_peak_rss():
+    # Writing 5 to clear_refs resets VmHWM (Linux >= 4.0)
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def run_mode(mode, n_rows):
+    """
+    Run one mode in this process and return its measurements
+    """
+    from tests.benchmarks.run_benchmarks import synthetic_customers
+    from src.data_preprocessing import DataPreprocessor, downcast_numeric
+
+    df = synthetic_customers(n_rows)
+    input_mb = df.memory_usage(deep=True).sum() / 2**20
+    gc.collect()
+    _release_free_memory()
+    baseline_kb = _status_kb('VmRSS')
+    exact_peak = _reset_peak_rss()
+
+    start = time.perf_counter()
+    preprocessor = DataPreprocessor()
+    if mode == 'default':
+        X = preprocessor.preprocess(df.drop('CustomerID', axis=1), remove_outliers=True, fit=True)
+        output_mb = X.memory_usage(deep=True).sum() / 2**20
+    else:
+        if mode == 'low_memory_downcast':
+            downcast_numeric(df)
+        X, _ = preprocessor.preprocess_low_memory(df, remove_outliers=True, fit=True)
+        output_mb = X.nbytes / 2**20
+    seconds = time.perf_counter() - start
+
+    return {
+        'mode': mode,
+        'rows': n_rows,
+        'seconds': seconds,
+        'input_mb': input_mb,
+        'output_mb': output_mb,
+        'baseline_rss_mb': baseline_kb / 1024,
+        'peak_rss_mb': _status_kb('VmHWM') / 1024,
+        'peak_over_baseline_mb': (_status_kb('VmHWM') - baseline_kb) / 1024,
+        'exact_peak': exact_peak,
+    }
+
+
+def measure_mode(mode, n_rows):
+    """
+    Run a mode in a fresh interpreter so peaks never carry over
+    """
+    completed = subprocess.run(
+        [sys.executable, '-m', 'tests.benchmarks.preprocess_memory', '--child', mode,
+         '--rows', str(n_rows)],
+        capture_output=True, text=True)
+    if completed.returncode != 0:
+        return {'mode': mode, 'rows': n_rows, 'error': completed.stderr.strip().splitlines()[-1:]}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def format_results(results):
+    lines = [f"{'mode':<22}{'rows':>8}{'seconds':>9}{'input MB':>10}{'output MB':>11}"
+             f"{'peak RSS MB':>13}{'over base':>11}"]
+    for r in results:
+        if 'error' in r:
+            lines.append(f"{r['mode']:<22}{format_size(r['rows']):>8}  failed: {' '.join(r['error'])}")
+            continue
+        lines.append(f"{r['mode']:<22}{format_size(r['rows']):>8}{r['seconds']:>9.2f}{r['input_mb']:>10.0f}"
+                     f"{r['output_mb']:>11.0f}{r['peak_rss_mb']:>13.0f}{r['peak_over_baseline_mb']:>11.0f}")
+    return '\n'.join(lines)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Compare peak RSS of the preprocessing paths")
+    parser.add_argument('--rows', default='1M', help="Input rows, e.g. 1M or 10M")
+    parser.add_argument('--modes', default=','.join(MODES), help=f"Comma-separated subset of {MODES}")
+    parser.add_argument('--save', default=None, help="Write results to this JSON file")
+    parser.add_argument('--child', default=None, help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    n_rows = parse_size(args.rows)
+    if args.child:
+        with open('/dev/null', 'w') as devnull:
+            stdout, sys.stdout = sys.stdout, devnull
+            try:
+                result = run_mode(args.child, n_rows)
+            finally:
+                sys.stdout = stdout
+        print(json.dumps(result))
+        return result
+
+    results = [measure_mode(mode, n_rows) for mode in args.modes.split(',')]
+    print(format_results(results))
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main()
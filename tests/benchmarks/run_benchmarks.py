@@ -0,0 +1,440 @@
+"""
+Benchmark suite for the customer segmentation hot paths.
+
+Runs each benchmark at the requested data sizes on synthetic customers and
+records wall time, throughput and peak traced memory. Results can be saved
+as a JSON baseline and later runs compared against it; the run exits with
+status 1 when a benchmark is slower or uses more memory than the baseline
+by more than the threshold.
+
+    python -m tests.benchmarks.run_benchmarks --sizes 1k,100k --save baseline.json
+    python -m tests.benchmarks.run_benchmarks --sizes 1k,100k --baseline baseline.json
+
+Benchmarks whose cost grows quadratically (the silhouette score in the k
+sweep and in train) are capped by max_rows and reported as skipped above
+it; pass --no-limits to run them anyway.
+"""
+import argparse
+import asyncio
+import contextlib
+import gc
+import io
+import json
+import logging
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[2]
+SEGMENTATION_DIR = ROOT / 'customer_segmentation'
+BACKEND_DIR = ROOT / 'backend'
+for path in (SEGMENTATION_DIR, SEGMENTATION_DIR / 'data'):
+    if str(path) not in sys.path:
+        sys.path.append(str(path))
+
+from generate_data import generate_block, DEFAULT_BLOCK_ROWS
+from src.data_preprocessing import DataPreprocessor
+from src.clustering_model import CustomerSegmentation, build_coreset
+from src.monitoring import DriftMonitor, build_reference
+from src.utils import (compute_cluster_stats, clear_cluster_stats_cache,
+                       generate_cluster_insights, get_cluster_profiles)
+
+DEFAULT_SIZES = '1k,100k'
+DEFAULT_THRESHOLD = 0.25
+BENCH_CLUSTERS = 4
+SINGLE_PREDICT_CALLS = 200
+DRIFT_UPDATES = 10_000
+BENCH_CORESET_SIZE = 5_000
+API_REQUESTS = 200
+WARMUP_ROWS = 200
+MIN_MEASURE_SECONDS = 0.5
+MAX_RUNS = 50
+MIN_DELTA_SECONDS = 0.005
+
+SAMPLE_CUSTOMER = {
+    'age': 45, 'gender': 'Female', 'income': 85000, 'spending_score': 80,
+    'region': 'East', 'purchase_frequency': 20, 'avg_order_value': 600, 'recency': 10
+}
+
+
+def parse_size(text):
+    text = text.strip().lower()
+    factor = {'k': 1_000, 'm': 1_000_000}.get(text[-1], 1)
+    return int(float(text[:-1] if factor > 1 else text) * factor)
+
+
+def format_size(n):
+    if n >= 1_000_000 and n % 1_000_000 == 0:
+        return f"{n // 1_000_000}M"
+    if n >= 1_000 and n % 1_000 == 0:
+        return f"{n // 1_000}k"
+    return str(n)
+
+
+def synthetic_customers(n_rows, seed=42):
+    """
+    Synthetic customers built from the generator's seeded blocks
+    """
+    blocks = []
+    for block_index in range(-(-n_rows // DEFAULT_BLOCK_ROWS)):
+        rows = min(DEFAULT_BLOCK_ROWS, n_rows - block_index * DEFAULT_BLOCK_ROWS)
+        blocks.append(generate_block(block_index, rows, seed=seed, id_width=len(str(n_rows))))
+    return pd.concat(blocks, ignore_index=True) if len(blocks) > 1 else blocks[0]
+
+
+class SizeContext:
+    """
+    Lazily built inputs shared by the benchmarks of one data size; building
+    them is never part of a measurement
+    """
+    def __init__(self, n_rows):
+        self.n_rows = n_rows
+        self._cache = {}
+
+    def _get(self, name, build):
+        if name not in self._cache:
+            self._cache[name] = build()
+        return self._cache[name]
+
+    @property
+    def raw(self):
+        return self._get('raw', lambda: synthetic_customers(self.n_rows))
+
+    @property
+    def features(self):
+        return self._get('features', lambda: self.raw.drop('CustomerID', axis=1))
+
+    @property
+    def fitted(self):
+        def build():
+            preprocessor = DataPreprocessor()
+            X = preprocessor.preprocess(self.features, remove_outliers=False, fit=True)
+            return preprocessor, X
+        return self._get('fitted', build)
+
+    @property
+    def model(self):
+        def build():
+            from sklearn.cluster import KMeans
+            segmentation = CustomerSegmentation(n_clusters=BENCH_CLUSTERS)
+            segmentation.model = KMeans(n_clusters=BENCH_CLUSTERS, random_state=42, n_init=1)
+            segmentation.model.fit(self.fitted[1])
+            return segmentation
+        return self._get('model', build)
+
+    @property
+    def clustered(self):
+        def build():
+            df = self.raw.copy()
+            df['Cluster'] = self.model.predict(self.fitted[1])
+            return df
+        return self._get('clustered', build)
+
+
+    @property
+    def drift_monitor(self):
+        def build():
+            df = self.clustered
+            labels = df['Cluster'].to_numpy()
+            reference = build_reference(df, labels, np.ones(len(df)), self.fitted[0].feature_columns,
+                                        set(self.fitted[0].label_encoders), BENCH_CLUSTERS)
+            return DriftMonitor(reference)
+        return self._get('drift_monitor', build)
+
+    @property
+    def api_batch(self):
+        """
+        The customers as an Arrow IPC stream in the API's column names
+        (missing values filled, as the endpoint rejects them)
+        """
+        def build():
+            import pyarrow as pa
+            features = self.features.fillna(self.features.median(numeric_only=True))
+            table = pa.table({
+                'customer_id': self.raw['CustomerID'],
+                'age': features['Age'].round().astype('int64'),
+                'gender': features['Gender'],
+                'income': features['Income'],
+                'spending_score': features['SpendingScore'].round().astype('int64'),
+                'region': features['Region'],
+                'purchase_frequency': features['PurchaseFrequency'],
+                'avg_order_value': features['AvgOrderValue'],
+                'recency': features['Recency'],
+            })
+            sink = pa.BufferOutputStream()
+            with pa.ipc.new_stream(sink, table.schema) as writer:
+                writer.write_table(table)
+            return sink.getvalue().to_pybytes()
+        return self._get('api_batch', build)
+
+
+# Benchmark bodies: each returns the number of items processed
+
+def bench_preprocess_fit(ctx):
+    DataPreprocessor().preprocess(ctx.features, remove_outliers=True, fit=True)
+    return ctx.n_rows
+
+
+def bench_preprocess_fit_low_memory(ctx):
+    DataPreprocessor().preprocess_low_memory(ctx.raw, remove_outliers=True, fit=True)
+    return ctx.n_rows
+
+
+def bench_preprocess_transform(ctx):
+    ctx.fitted[0].preprocess(ctx.features, remove_outliers=False, fit=False)
+    return ctx.n_rows
+
+
+def bench_find_optimal_clusters(ctx):
+    CustomerSegmentation(random_state=42).find_optimal_clusters(ctx.fitted[1], max_k=6)
+    return ctx.n_rows
+
+
+def bench_coreset_sweep(ctx):
+    points, weights = build_coreset(ctx.fitted[1], BENCH_CORESET_SIZE)
+    CustomerSegmentation(random_state=42).find_optimal_clusters(points, max_k=6, sample_weight=weights)
+    return ctx.n_rows
+
+
+def bench_train(ctx):
+    CustomerSegmentation(n_clusters=BENCH_CLUSTERS, random_state=42).train(ctx.fitted[1])
+    return ctx.n_rows
+
+
+def bench_predict_batch(ctx):
+    preprocessor, _ = ctx.fitted
+    ctx.model.predict(preprocessor.preprocess(ctx.features, remove_outliers=False, fit=False))
+    return ctx.n_rows
+
+
+def bench_predict_single(ctx):
+    preprocessor, _ = ctx.fitted
+    row = ctx.features.iloc[[0]]
+    for _ in range(SINGLE_PREDICT_CALLS):
+        ctx.model.predict(preprocessor.preprocess(row, remove_outliers=False, fit=False))
+    return SINGLE_PREDICT_CALLS
+
+
+def bench_drift_update(ctx):
+    monitor = ctx.drift_monitor
+    record = ctx.features.iloc[0].to_dict()
+    for _ in range(DRIFT_UPDATES):
+        monitor.update(record, cluster=0, distance=1.0)
+    return DRIFT_UPDATES
+
+
+def bench_cluster_aggregations(ctx):
+    clear_cluster_stats_cache()
+    df = ctx.clustered
+    stats = compute_cluster_stats(df, version=ctx.n_rows)
+    generate_cluster_insights(df, stats=stats)
+    get_cluster_profiles(df, stats=stats)
+    compute_cluster_stats(df, clusters=[0, 1], version=ctx.n_rows)
+    return ctx.n_rows
+
+
+def _api_client():
+    import httpx
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+    os.environ.setdefault('SEGMENTATION_DIR', str(SEGMENTATION_DIR))
+    if str(BACKEND_DIR) not in sys.path:
+        sys.path.append(str(BACKEND_DIR))
+    import server
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url='http://bench')
+
+
+def bench_api_predict_cluster(ctx):
+    async def run():
+        async with _api_client() as client:
+            for _ in range(API_REQUESTS):
+                response = await client.post('/api/predict_cluster', json=SAMPLE_CUSTOMER)
+                response.raise_for_status()
+    asyncio.run(run())
+    return API_REQUESTS
+
+
+def bench_api_predict_arrow(ctx):
+    body = ctx.api_batch
+    async def run():
+        async with _api_client() as client:
+            response = await client.post('/api/predict_batch', content=body,
+                                         headers={'Content-Type': 'application/vnd.apache.arrow.stream'})
+            response.raise_for_status()
+    asyncio.run(run())
+    return ctx.n_rows
+
+
+# name -> (function, max_rows or None, size independent)
+BENCHMARKS = {
+    'preprocess_fit': (bench_preprocess_fit, None, False),
+    'preprocess_fit_low_memory': (bench_preprocess_fit_low_memory, None, False),
+    'preprocess_transform': (bench_preprocess_transform, None, False),
+    'find_optimal_clusters': (bench_find_optimal_clusters, 20_000, False),
+    'coreset_sweep': (bench_coreset_sweep, None, False),
+    'train': (bench_train, 20_000, False),
+    'predict_batch': (bench_predict_batch, None, False),
+    'predict_single': (bench_predict_single, None, True),
+    'cluster_aggregations': (bench_cluster_aggregations, None, False),
+    'drift_update': (bench_drift_update, None, True),
+    'api_predict_cluster': (bench_api_predict_cluster, None, True),
+    'api_predict_arrow': (bench_api_predict_arrow, None, False),
+}
+
+
+def measure(fn, ctx, repeat=1, memory=True):
+    """
+    Best wall time over `repeat` runs, plus peak traced allocation from one
+    extra run under tracemalloc (kept separate so tracing never skews time).
+    Progress printed by the code under test is swallowed.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        return _measure(fn, ctx, repeat, memory)
+
+
+def _measure(fn, ctx, repeat, memory):
+    seconds = []
+    items = 0
+    # Fast benchmarks are repeated until MIN_MEASURE_SECONDS have been timed
+    while len(seconds) < repeat or (sum(seconds) < MIN_MEASURE_SECONDS and len(seconds) < MAX_RUNS):
+        gc.collect()
+        start = time.perf_counter()
+        items = fn(ctx)
+        seconds.append(time.perf_counter() - start)
+
+    result = {'seconds': min(seconds), 'items': items, 'items_per_sec': items / min(seconds)}
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            fn(ctx)
+            result['peak_mb'] = tracemalloc.get_traced_memory()[1] / 2**20
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def run_suite(sizes, names=None, repeat=1, memory=True, limits=True, log=print):
+    results = {}
+    skipped = {}
+    done_size_independent = set()
+    names = names or list(BENCHMARKS)
+
+    # Untimed pass on a tiny frame so lazy imports and first-call setup are
+    # not charged to whichever benchmark happens to run first
+    warmup = SizeContext(WARMUP_ROWS)
+    with contextlib.redirect_stdout(io.StringIO()):
+        for name in names:
+            try:
+                BENCHMARKS[name][0](warmup)
+            except ImportError:
+                pass
+
+    for n_rows in sizes:
+        ctx = SizeContext(n_rows)
+        for name in names:
+            fn, max_rows, size_independent = BENCHMARKS[name]
+            key = name if size_independent else f"{name}@{format_size(n_rows)}"
+            if size_independent and name in done_size_independent:
+                continue
+            if limits and max_rows is not None and n_rows > max_rows:
+                skipped[key] = f"above max_rows={max_rows:,} (use --no-limits)"
+                continue
+            try:
+                results[key] = measure(fn, ctx, repeat=repeat, memory=memory)
+            except ImportError as e:
+                skipped[key] = f"missing dependency: {e}"
+                continue
+            if size_independent:
+                done_size_independent.add(name)
+            r = results[key]
+            log(f"{key:<36}{r['seconds']:>10.3f}s {r['items_per_sec']:>14,.0f}/s"
+                + (f" {r['peak_mb']:>10.1f} MB" if 'peak_mb' in r else ''))
+        del ctx
+    for key, reason in skipped.items():
+        log(f"{key:<36} skipped: {reason}")
+    return results, skipped
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD, memory_threshold=None,
+            min_delta_seconds=MIN_DELTA_SECONDS):
+    """
+    Regressions of `results` against a baseline's results: a benchmark
+    regresses when its time (or peak memory) exceeds the baseline by more
+    than the threshold fraction. Slowdowns under min_delta_seconds are
+    treated as timer noise.
+    """
+    memory_threshold = threshold if memory_threshold is None else memory_threshold
+    regressions = []
+    for key, current in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        if current['seconds'] > base['seconds'] * (1 + threshold) + min_delta_seconds:
+            regressions.append(f"{key}: {current['seconds']:.3f}s vs baseline {base['seconds']:.3f}s")
+        if 'peak_mb' in current and 'peak_mb' in base and \
+                current['peak_mb'] > base['peak_mb'] * (1 + memory_threshold):
+            regressions.append(f"{key}: {current['peak_mb']:.1f} MB vs baseline {base['peak_mb']:.1f} MB")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Customer segmentation benchmarks")
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help="Comma separated row counts, e.g. 1k,100k,1M,10M")
+    parser.add_argument('--only', default=None, help=f"Comma separated subset of: {', '.join(BENCHMARKS)}")
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--no-memory', action='store_true', help="Skip the tracemalloc run")
+    parser.add_argument('--no-limits', action='store_true', help="Ignore per-benchmark max_rows")
+    parser.add_argument('--save', default=None, help="Write results to this JSON file")
+    parser.add_argument('--baseline', default=None, help="Compare against this JSON baseline")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="Allowed slowdown as a fraction of the baseline (default 0.25)")
+    parser.add_argument('--memory-threshold', type=float, default=None,
+                        help="Allowed peak memory growth (defaults to --threshold)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    sizes = [parse_size(s) for s in args.sizes.split(',')]
+    names = args.only.split(',') if args.only else None
+    results, skipped = run_suite(sizes, names=names, repeat=args.repeat,
+                                 memory=not args.no_memory, limits=not args.no_limits)
+
+    report = {
+        'meta': {
+            'created': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'sizes': sizes,
+        },
+        'results': results,
+        'skipped': skipped,
+    }
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results saved to {args.save}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold, args.memory_threshold)
+        if regressions:
+            print("\nRegressions beyond threshold:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"\nNo regressions beyond {args.threshold:.0%} of {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,52 @@
+"""
+Smoke tests for the benchmark suite: a tiny run of the core benchmarks and
+the baseline comparison used to flag regressions.
+"""
+import pytest
+
+pytest.importorskip('sklearn')
+
+from tests.benchmarks.run_benchmarks import compare, format_size, parse_size, run_suite
+
+
+def test_parse_and_format_sizes():
+    assert [parse_size(s) for s in ['1k', '100k', '1M', '10M', '2500']] == \
+        [1_000, 100_000, 1_000_000, 10_000_000, 2_500]
+    assert format_size(100_000) == '100k'
+    assert format_size(10_000_000) == '10M'
+
+
+def test_run_suite_records_time_throughput_and_memory():
+    names = ['preprocess_fit', 'preprocess_transform', 'predict_batch', 'cluster_aggregations',
+             'find_optimal_clusters']
+    results, skipped = run_suite([500], names=names, log=lambda line: None)
+
+    assert set(results) == {f"{name}@500" for name in names}
+    assert skipped == {}
+    for result in results.values():
+        assert result['seconds'] > 0
+        assert result['items'] == 500
+        assert result['items_per_sec'] > 0
+        assert result['peak_mb'] >= 0
+
+
+def test_run_suite_skips_quadratic_benchmarks_above_limit():
+    _, skipped = run_suite([50_000], names=['train'], memory=False, log=lambda line: None)
+    assert 'train@50k' in skipped
+
+
+def test_compare_flags_time_and_memory_regressions():
+    baseline = {
+        'a': {'seconds': 1.0, 'peak_mb': 100.0},
+        'b': {'seconds': 1.0, 'peak_mb': 100.0},
+        'c': {'seconds': 0.001, 'peak_mb': 1.0},
+    }
+    results = {
+        'a': {'seconds': 1.2, 'peak_mb': 110.0},   # within 25%
+        'b': {'seconds': 1.5, 'peak_mb': 150.0},   # slower and bigger
+        'c': {'seconds': 0.003, 'peak_mb': 1.0},   # 3x, but below the noise floor
+        'new': {'seconds': 9.0, 'peak_mb': 1.0},   # not in baseline
+    }
+    regressions = compare(results, baseline, threshold=0.25)
+    assert len(regressions) == 2
+    assert all(line.startswith('b:') for line in regressions)
@@ -0,0 +1,109 @@
+"""
+CompiledModel and bulk scoring: the compiled scorer must agree with
+preprocess + predict (its one intended difference, the mean fill for
+columns without a fitted imputer, is pinned here), survive the trip through
+shared memory, and bulk scoring over row-group tasks must match one pass.
+"""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('sklearn')
+pa = pytest.importorskip('pyarrow')
+import pyarrow.parquet as pq
+
+SEGMENTATION_DIR = Path(__file__).resolve().parent.parent / 'customer_segmentation'
+sys.path.insert(0, str(SEGMENTATION_DIR))
+sys.path.insert(0, str(SEGMENTATION_DIR / 'data'))
+
+from generate_data import generate_customer_data
+from src.batch_scoring import CompiledModel
+from src.bulk_scoring import bulk_score
+from src.clustering_model import CustomerSegmentation
+from src.data_preprocessing import DataPreprocessor
+
+
+def _with_missing_categories(df, seed):
+    rng = np.random.default_rng(seed)
+    df = df.copy()
+    for col in ('Gender', 'Region'):
+        df[col] = df[col].astype(object)
+        df.loc[rng.random(len(df)) < 0.03, col] = np.nan
+    return df
+
+
+@pytest.fixture(scope='module')
+def fitted():
+    train = _with_missing_categories(generate_customer_data(4_000, n_segments=4, seed=1, missing_rate=0.05), 1)
+    preprocessor = DataPreprocessor()
+    X = preprocessor.preprocess(train.drop(columns='CustomerID'), remove_outliers=False, fit=True)
+    segmentation = CustomerSegmentation(n_clusters=4)
+    segmentation.train(X)
+    return preprocessor, segmentation, CompiledModel.from_artifacts(preprocessor, segmentation)
+
+
+@pytest.fixture(scope='module')
+def customers():
+    return _with_missing_categories(
+        generate_customer_data(6_000, n_segments=4, seed=2, missing_rate=0.05, start_id=100_000, id_width=6), 2)
+
+
+def test_compiled_model_matches_preprocess_and_predict(fitted, customers):
+    preprocessor, segmentation, compiled = fitted
+    assert customers[['Age', 'Gender', 'Region']].isna().any().all()
+
+    expected = preprocessor.preprocess(customers, remove_outliers=False, fit=False).drop(columns='CustomerID')
+    X = compiled.transform(customers)
+    assert np.allclose(X, expected.to_numpy())
+
+    labels, distances = compiled.score_matrix(X)
+    assert np.array_equal(labels, segmentation.predict(expected))
+    centers = segmentation.get_cluster_centers()
+    assert np.allclose(distances, np.linalg.norm(expected.to_numpy() - centers[labels], axis=1))
+
+    # Intended difference: a column with no fitted imputer is filled with the
+    # training mean (0 once scaled), not the batch median
+    assert 'Recency' not in preprocessor.imputers
+    gaps = customers.head(10).assign(Recency=np.nan)
+    j = compiled.columns.index('Recency')
+    assert np.allclose(compiled.transform(gaps)[:, j], 0.0)
+
+
+def test_shared_memory_round_trip(fitted, customers):
+    _, _, compiled = fitted
+    shm, spec = compiled.to_shared_memory()
+    try:
+        attached, attached_shm = CompiledModel.attach(spec)
+        try:
+            assert attached.columns == compiled.columns
+            assert attached.derived_features == compiled.derived_features
+            for a, b in zip(attached.score(customers), compiled.score(customers)):
+                assert np.array_equal(a, b)
+        finally:
+            del attached
+            attached_shm.close()
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def test_bulk_score_over_row_group_tasks_matches_single_pass(fitted, customers, tmp_path):
+    _, _, compiled = fitted
+    source = tmp_path / 'input'
+    source.mkdir()
+    pq.write_table(pa.Table.from_pandas(customers, preserve_index=False),
+                   source / 'customers.parquet', row_group_size=1_000)
+
+    summary = bulk_score([str(source)], str(tmp_path / 'scored'), compiled, workers=3,
+                         batch_rows=700, log=lambda *_: None)
+    assert summary['tasks'] == 3 and summary['rows'] == len(customers)
+
+    scored = pd.concat([pd.read_parquet(path) for path in summary['outputs']]).set_index('CustomerID')
+    labels, distances = compiled.score(customers)
+    scored = scored.loc[customers['CustomerID']]
+    assert np.array_equal(scored['Cluster'].to_numpy(), labels)
+    assert np.allclose(scored['Distance'].to_numpy(), distances, rtol=1e-6)
+    assert summary['cluster_counts'] == {i: int(c) for i, c in enumerate(np.bincount(labels)) if c}
@@ -0,0 +1,85 @@
+"""
+Per-cluster statistics: combining per-partition results equals aggregating
+the whole frame, and memoized results follow the data version. Also covers
+per-partition feature distributions and the stratified sampler's edge
+cases.
+"""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'customer_segmentation'))
+
+from src.utils import (ClusterStats, clear_cluster_stats_cache, compute_cluster_stats, feature_distribution,
+                       stratified_sample)
+
+
+def _clustered(n=5_000, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'Income': rng.normal(60_000, 15_000, n),
+        'SpendingScore': rng.integers(1, 101, n),
+        'Region': rng.choice(['North', 'South'], n),
+        'Cluster': rng.integers(0, 4, n),
+    })
+
+
+def test_concat_of_per_cluster_stats_matches_whole_frame():
+    df = _clustered()
+    whole = compute_cluster_stats(df)
+    parts = ClusterStats.concat([compute_cluster_stats(df[df['Cluster'] == c]) for c in (2, 0, 3, 1)])
+    pd.testing.assert_series_equal(parts.sizes, whole.sizes)
+    pd.testing.assert_frame_equal(parts.agg, whole.agg)
+    pd.testing.assert_frame_equal(parts.quantiles, whole.quantiles)
+    assert parts.n_rows == len(df) and parts.clusters == [0, 1, 2, 3]
+    pd.testing.assert_frame_equal(parts.select([1, 3]).mean, whole.select([1, 3]).mean)
+
+
+def test_memo_follows_the_version_not_the_frame():
+    clear_cluster_stats_cache()
+    df = _clustered(n=1_000)
+    before = compute_cluster_stats(df)
+    assert compute_cluster_stats(df, version=1) is compute_cluster_stats(df, version=1)
+
+    # Mutated in place: unversioned calls and a new version see the change
+    df['Income'] += 1_000
+    expected = before.mean['Income'] + 1_000
+    assert np.allclose(compute_cluster_stats(df).mean['Income'], expected)
+    assert np.allclose(compute_cluster_stats(df, version=2).mean['Income'], expected)
+    assert compute_cluster_stats(df, clusters=[1], version=2).clusters == [1]
+    clear_cluster_stats_cache()
+
+
+def test_feature_distribution_from_partitions_matches_whole_frame():
+    df = _clustered()
+    df.loc[::50, 'Income'] = np.nan
+    value_range = (df['Income'].min(), df['Income'].max())
+    edges, counts, boxes = feature_distribution((df[df['Cluster'] == c] for c in (3, 1, 0, 2)), 'Income',
+                                                value_range, bins=20)
+    assert np.array_equal(counts, np.histogram(df['Income'].dropna(), edges)[0])
+    assert list(boxes) == [0, 1, 2, 3]
+    for cluster, values in df.groupby('Cluster')['Income']:
+        values = values.dropna()
+        q1, q3 = values.quantile(0.25), values.quantile(0.75)
+        box = boxes[cluster]
+        assert box['count'] == len(values)
+        assert box['median'] == pytest.approx(values.median())
+        assert box['q1'] == pytest.approx(q1) and box['q3'] == pytest.approx(q3)
+        assert box['upperfence'] == values[values <= q3 + 1.5 * (q3 - q1)].max()
+
+
+def test_stratified_sample_edge_cases():
+    df = _clustered(n=3_000)
+    sample = stratified_sample(df, max_points=1_000, min_per_cluster=50)
+    assert len(sample) <= 1_000
+    assert set(sample['Cluster']) == {0, 1, 2, 3}
+
+    assert stratified_sample(df.iloc[:0], max_points=10).empty
+    unlabeled = df.assign(Cluster=np.nan)
+    assert len(stratified_sample(unlabeled, max_points=500)) == 500
+    # Few labelled rows among many unlabelled ones: all of them are kept
+    sparse = df.assign(Cluster=np.where(np.arange(len(df)) < 40, df['Cluster'], np.nan))
+    assert len(stratified_sample(sparse, max_points=500, min_per_cluster=50)) == 40
@@ -0,0 +1,50 @@
+"""
+Coreset training: the weighted summary must preserve the k-means cost of
+the full data closely enough that models trained on it are as good.
+"""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+pytest.importorskip('sklearn')
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'customer_segmentation'))
+
+from src.clustering_model import CustomerSegmentation, build_coreset, kmeans_cost
+
+
+def _blobs(n=60_000, k=5, dims=6, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(scale=6, size=(k, dims))
+    return centers[rng.integers(0, k, n)] + rng.normal(size=(n, dims))
+
+
+def test_streaming_coreset_preserves_kmeans_cost():
+    X = _blobs()
+    points, weights = build_coreset(X, 3_000, chunk_rows=7_000)
+    assert len(points) <= 3_000
+    assert abs(weights.sum() / len(X) - 1) < 0.05
+
+    segmentation = CustomerSegmentation(n_clusters=5, random_state=0)
+    segmentation.train(points, sample_weight=weights)
+    report = segmentation.coreset_report(X, weights, full_fit=True)
+    assert abs(report['cost_estimate_error']) < 0.05
+    assert report['cost_gap'] < 0.02
+    assert report['label_agreement_ari'] > 0.95
+    assert report['full_data_cost'] == pytest.approx(kmeans_cost(X, segmentation.get_cluster_centers()))
+
+
+def test_quality_scores_survive_a_single_cluster_weighted_draw():
+    # One heavy point dominates the weights, so a weighted draw of the
+    # metric rows almost surely misses the light far cluster
+    rng = np.random.default_rng(1)
+    X = np.vstack([np.zeros((11_995, 2)), 50 + rng.normal(size=(5, 2))])
+    weights = np.concatenate([np.ones(11_995), np.full(5, 1e-12)])
+
+    segmentation = CustomerSegmentation(n_clusters=2, random_state=0)
+    segmentation.train(X, sample_weight=weights)
+    assert len(np.unique(segmentation.model.labels_)) == 2
+    assert segmentation.find_optimal_clusters(X, max_k=3, sample_weight=weights) in (2, 3)
+    assert len(segmentation.silhouette_scores) == 2
@@ -0,0 +1,67 @@
+"""
+Customer index: lookups on the memory-mapped sorted keys, readers following
+CURRENT across rebuilds, and pruning of old versions.
+"""
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'customer_segmentation'))
+
+from src.customer_index import CURRENT_FILE, KEEP_VERSIONS, CustomerIndexReader, write_customer_index
+
+
+def _versions(path):
+    return sorted(v for v in os.listdir(path) if v.startswith('v'))
+
+
+def test_lookup_present_and_absent_ids(tmp_path):
+    ids = np.array([f"CUST_{i:05d}" for i in range(1_000)])[::-1]
+    labels = np.arange(1_000) % 4
+    distances = np.linspace(0, 1, 1_000)
+    write_customer_index(np.append(ids, 'CUST_00007'), np.append(labels, 3), np.append(distances, 9.0),
+                         str(tmp_path))
+
+    index = CustomerIndexReader(str(tmp_path)).current()
+    assert isinstance(index.keys, np.memmap)
+    assert len(index) == 1_000 and index.meta['duplicates'] == 1
+    assert np.all(index.keys[:-1] < index.keys[1:])
+    for position in (0, 17, 999):
+        cluster, distance = index.lookup(ids[position])
+        assert cluster == labels[position]
+        assert distance == pytest.approx(distances[position], abs=1e-6)
+    # Duplicates keep their last row, as the assignment table does
+    assert index.lookup('CUST_00007') == (3, 9.0)
+    for absent in ('CUST_01000', 'CUST_0000', 'CUST_00001X', '', 'A' * 64, 'CUST_00001\0'):
+        assert index.lookup(absent) is None
+
+
+def test_reader_follows_current_and_old_versions_are_pruned(tmp_path):
+    path = str(tmp_path)
+    write_customer_index(['A', 'B'], [0, 1], [0.5, 1.5], path)
+    reader = CustomerIndexReader(path)
+    old = reader.current()
+    assert old.lookup('B') == (1, 1.5)
+
+    write_customer_index(['A', 'B', 'C'], [2, 2, 2], [0.1, 0.2, 0.3], path)
+    # The open mapping keeps serving the old version...
+    assert old.lookup('B') == (1, 1.5) and old.lookup('C') is None
+    # ...and the reader switches to the new CURRENT on its next lookup
+    new = reader.current()
+    assert new is not old
+    assert new.lookup('C') == (2, pytest.approx(0.3))
+    with open(os.path.join(path, CURRENT_FILE)) as f:
+        assert new.directory == os.path.join(path, f.read().strip())
+
+    for i in range(3):
+        write_customer_index(['A'], [i], [0.0], path)
+    versions = _versions(path)
+    assert len(versions) == KEEP_VERSIONS
+    assert os.path.basename(reader.current().directory) == versions[-1]
+    assert reader.current().lookup('A') == (2, 0.0)
+    # Readers of a pruned version keep their mapping
+    assert old.lookup('A') == (0, 0.5)
+    assert not [name for name in os.listdir(path) if name.endswith('.tmp')]
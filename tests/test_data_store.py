@@ -0,0 +1,87 @@
+"""
+Clustered Parquet store: partition-pruned reads, paged queries with
+filters and sorting, and rewrites that swap the directory in place.
+"""
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('pyarrow')
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'customer_segmentation'))
+
+from src.data_store import query_page, read_clustered_dataset, write_clustered_dataset
+
+
+def _clustered(n=2_000, seed=0):
+    rng = np.random.default_rng(seed)
+    income = rng.normal(60_000, 15_000, n).round(2)
+    income[rng.random(n) < 0.02] = np.nan
+    return pd.DataFrame({
+        'CustomerID': [f"CUST_{i:05d}" for i in range(n)],
+        'Income': income,
+        'Region': rng.choice(['North', 'South', 'East'], n),
+        'Cluster': rng.integers(0, 4, n),
+    })
+
+
+@pytest.fixture
+def store(tmp_path):
+    df = _clustered()
+    path = str(tmp_path / 'customers_clustered.parquet')
+    write_clustered_dataset(df, path, max_rows_per_group=256)
+    return df, path
+
+
+def _key(frame):
+    return frame.sort_values('CustomerID').reset_index(drop=True)
+
+
+def test_read_selected_clusters_and_columns(store):
+    df, path = store
+    whole = read_clustered_dataset(path)
+    pd.testing.assert_frame_equal(_key(whole)[df.columns], _key(df))
+
+    part = read_clustered_dataset(path, clusters=[1, 3], columns=['CustomerID', 'Income'])
+    assert list(part.columns) == ['CustomerID', 'Income']
+    expected = df[df['Cluster'].isin([1, 3])][['CustomerID', 'Income']]
+    pd.testing.assert_frame_equal(_key(part), _key(expected))
+
+
+def test_query_page_filters_sorts_and_pages(store):
+    df, path = store
+    filters = [('Region', '==', 'North'), ('Cluster', 'in', [0, 2])]
+    matching = df[(df['Region'] == 'North') & df['Cluster'].isin([0, 2])]
+
+    pages, offset = [], 0
+    while True:
+        page, total = query_page(path, filters=filters, sort_by='Income', ascending=False,
+                                 offset=offset, limit=100)
+        assert total == len(matching)
+        if page.empty:
+            break
+        pages.append(page)
+        offset += 100
+    result = pd.concat(pages, ignore_index=True)
+
+    # Every matching row exactly once, ordered by Income with nulls last
+    assert sorted(result['CustomerID']) == sorted(matching['CustomerID'])
+    expected = matching['Income'].sort_values(ascending=False, na_position='last').to_numpy()
+    np.testing.assert_array_equal(result['Income'].to_numpy(), expected)
+
+    page, total = query_page(path, sort_by='Income', offset=10, limit=5)
+    assert total == len(df) and len(page) == 5
+    np.testing.assert_array_equal(page['Income'].to_numpy(), np.sort(df['Income'].dropna())[10:15])
+    assert query_page(path, offset=len(df) + 10)[0].empty
+
+
+def test_rewrite_replaces_the_store(store, tmp_path):
+    _, path = store
+    replacement = _clustered(n=300, seed=1)
+    write_clustered_dataset(replacement, path)
+    pd.testing.assert_frame_equal(_key(read_clustered_dataset(path))[replacement.columns], _key(replacement))
+    assert sorted(os.listdir(tmp_path)) == ['customers_clustered.parquet']
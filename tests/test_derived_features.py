@@ -0,0 +1,76 @@
+"""
+Derived-feature registry: one definition evaluated on frames, arrays and
+single records, and applied the same way by preprocess, the low-memory path
+and the compiled batch scorer.
+"""
+import pickle
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+pytest.importorskip('sklearn')
+
+SEGMENTATION_DIR = Path(__file__).resolve().parent.parent / 'customer_segmentation'
+sys.path.insert(0, str(SEGMENTATION_DIR))
+sys.path.insert(0, str(SEGMENTATION_DIR / 'data'))
+
+from generate_data import generate_customer_data
+from src.batch_scoring import CompiledModel
+from src.clustering_model import CustomerSegmentation
+from src.data_preprocessing import DataPreprocessor
+from src.features import derive_features
+
+
+@pytest.fixture(scope='module')
+def raw():
+    return generate_customer_data(3_000, n_segments=4, seed=3).drop(columns=['CustomerID', 'TotalSpend'])
+
+
+def test_registry_evaluates_frames_arrays_and_records(raw):
+    expected = (raw['PurchaseFrequency'] * raw['AvgOrderValue']).to_numpy()
+    arrays = {col: raw[col].to_numpy() for col in raw.columns}
+    assert np.array_equal(derive_features(raw)['TotalSpend'].to_numpy(), expected)
+    assert np.array_equal(derive_features(arrays)['TotalSpend'], expected)
+    assert derive_features({'PurchaseFrequency': 3, 'AvgOrderValue': 25}) == {'TotalSpend': 75}
+    assert derive_features({'Age': 40}) == {}
+
+    chained = {'TotalSpend': ('mul', ('PurchaseFrequency', 'AvgOrderValue')),
+               'SpendPerDay': ('div', ('TotalSpend', 'Recency'))}
+    assert np.allclose(derive_features(raw, chained)['SpendPerDay'], expected / raw['Recency'])
+
+    # A model using only the chained feature still derives its intermediate
+    # and reads the raw inputs behind it
+    compiled = CompiledModel(['Age', 'SpendPerDay'], {}, np.zeros(2), np.zeros(2), np.ones(2),
+                             np.zeros((1, 2)), chained)
+    assert list(compiled.derived_features) == ['TotalSpend', 'SpendPerDay']
+    assert compiled.input_columns == ['Age', 'PurchaseFrequency', 'AvgOrderValue', 'Recency']
+    X = compiled.transform(raw[compiled.input_columns])
+    assert np.allclose(X[:, 1], expected / raw['Recency'])
+
+
+def test_training_batch_and_single_record_paths_agree(raw):
+    preprocessor = DataPreprocessor()
+    X = preprocessor.preprocess(raw, remove_outliers=False, fit=True)
+    assert preprocessor.feature_columns[-1] == 'TotalSpend'
+
+    low_memory = DataPreprocessor()
+    X_low, _ = low_memory.preprocess_low_memory(raw, remove_outliers=False, fit=True)
+    assert low_memory.feature_columns == preprocessor.feature_columns
+    assert np.allclose(X_low, X.to_numpy(), atol=1e-4)
+
+    segmentation = CustomerSegmentation(n_clusters=4)
+    segmentation.train(X)
+    compiled = CompiledModel.from_artifacts(preprocessor, segmentation)
+    assert np.allclose(compiled.transform(raw), X.to_numpy())
+
+    # One record, columns in any order, no TotalSpend supplied
+    record = raw.iloc[[7]][raw.columns[::-1]]
+    single = preprocessor.preprocess(record, remove_outliers=False, fit=False)
+    assert np.allclose(single.to_numpy(), X.iloc[[7]].to_numpy())
+
+    # Preprocessors pickled before the registry existed still derive TotalSpend
+    legacy = pickle.loads(pickle.dumps(preprocessor))
+    del legacy.derived_features
+    assert np.allclose(legacy.preprocess(raw, remove_outliers=False, fit=False).to_numpy(), X.to_numpy())
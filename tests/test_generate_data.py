@@ -0,0 +1,34 @@
+"""
+Data generator: the rows depend only on the seed, the row count and the
+block size, so one file and many shards concatenate to the same frame.
+"""
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'customer_segmentation' / 'data'))
+
+from generate_data import generate_dataset, plan_shards
+
+
+def _read(written, file_format):
+    reader = pd.read_parquet if file_format == 'parquet' else pd.read_csv
+    return pd.concat([reader(path) for path, _ in written], ignore_index=True)
+
+
+@pytest.mark.parametrize('file_format', ['csv', 'parquet'])
+def test_one_shard_and_many_shards_give_the_same_rows(tmp_path, file_format):
+    if file_format == 'parquet':
+        pytest.importorskip('pyarrow')
+    options = dict(seed=7, block_rows=250, file_format=file_format)
+    single = generate_dataset(1_900, output_dir=str(tmp_path / 'single'), n_shards=1, **options)
+    sharded = generate_dataset(1_900, output_dir=str(tmp_path / 'sharded'), n_shards=4, workers=2,
+                               **options)
+
+    assert len(single) == 1 and len(sharded) == 4
+    assert [rows for _, rows in sharded] == [sum(n for _, n in blocks) for blocks in plan_shards(1_900, 4, 250)]
+    expected = _read(single, file_format)
+    assert len(expected) == 1_900 and expected['CustomerID'].is_unique
+    pd.testing.assert_frame_equal(_read(sharded, file_format), expected)
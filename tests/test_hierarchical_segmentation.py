@@ -0,0 +1,69 @@
+"""
+Two-level segmentation: sub-cluster models fitted per parent in worker
+processes recover nested structure, predict in two stages and persist.
+"""
+import sys
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pytest
+
+pytest.importorskip('sklearn')
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'customer_segmentation'))
+
+from src.clustering_model import CustomerSegmentation
+
+
+def _nested_blobs(sub_counts=(2, 3, 4), n_per_blob=300, seed=0):
+    rng = np.random.default_rng(seed)
+    points = []
+    for parent, n_sub in enumerate(sub_counts):
+        parent_center = np.zeros(4)
+        parent_center[parent] = 100
+        for sub in range(n_sub):
+            offset = np.zeros(4)
+            offset[sub % 4] = 12 * (1 + sub // 4)
+            points.append(parent_center + offset + rng.normal(size=(n_per_blob, 4)))
+    return np.vstack(points)
+
+
+def test_sub_clusters_are_found_per_parent_and_persisted(tmp_path):
+    X = _nested_blobs()
+    segmentation = CustomerSegmentation(n_clusters=3, random_state=0)
+    segmentation.train(X)
+    segmentation.train_hierarchy(X, max_sub_k=6, workers=2)
+
+    parents, sub_clusters = segmentation.predict_hierarchy(X)
+    order = np.argsort([segmentation.get_cluster_centers()[p].argmax() for p in range(3)])
+    assert [segmentation.n_sub_clusters[p] for p in order] == [2, 3, 4]
+    for parent, model in enumerate(segmentation.sub_models):
+        rows = parents == parent
+        np.testing.assert_array_equal(sub_clusters[rows], model.predict(X[rows]))
+
+    # Given parent labels (as the compiled batch scorer passes), only the
+    # sub-centres are searched
+    given = segmentation.predict_hierarchy(X, parents=parents)
+    np.testing.assert_array_equal(given[1], sub_clusters)
+    shifted = (parents + 1) % 3
+    for parent, model in enumerate(segmentation.sub_models):
+        rows = shifted == parent
+        np.testing.assert_array_equal(segmentation.predict_hierarchy(X, parents=shifted)[1][rows],
+                                      model.predict(X[rows]))
+
+    path = str(tmp_path / 'model.pkl')
+    segmentation.save_model(path)
+    loaded = CustomerSegmentation.load_model(path)
+    assert loaded.n_sub_clusters == segmentation.n_sub_clusters
+    for expected, actual in zip(segmentation.predict_hierarchy(X), loaded.predict_hierarchy(X)):
+        np.testing.assert_array_equal(expected, actual)
+
+    # Models saved before two-level segmentation load as flat models
+    data = joblib.load(path)
+    del data['sub_models'], data['sub_sweeps']
+    joblib.dump(data, path)
+    flat = CustomerSegmentation.load_model(path)
+    assert flat.sub_models is None and flat.n_sub_clusters == []
+    with pytest.raises(ValueError):
+        flat.predict_hierarchy(X)
@@ -0,0 +1,111 @@
+"""
+Import-time benchmark for the serving path.
+
+Each check runs in a fresh interpreter so module caching from other tests
+cannot hide an eager import. The serving path (model/preprocessor loading
+and predict, plus the FastAPI endpoint) must never import a plotting
+library.
+"""
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+SEGMENTATION_DIR = ROOT / 'customer_segmentation'
+BACKEND_DIR = ROOT / 'backend'
+PLOTTING_MODULES = ('matplotlib', 'seaborn', 'plotly')
+
+SERVING_SNIPPET = """
+import json, sys, time
+sys.path.insert(0, {segmentation_dir!r})
+start = time.perf_counter()
+import joblib
+import pandas as pd
+from src.clustering_model import CustomerSegmentation
+from src.data_preprocessing import DataPreprocessor
+from src.data_store import read_clustered_dataset
+import src.utils
+import_seconds = time.perf_counter() - start
+
+model = CustomerSegmentation.load_model({model_path!r})
+preprocessor = joblib.load({preprocessor_path!r})
+row = pd.DataFrame({{
+    'Age': [45], 'Gender': ['Female'], 'Income': [85000], 'SpendingScore': [80],
+    'Region': ['East'], 'PurchaseFrequency': [20], 'AvgOrderValue': [600],
+    'Recency': [10], 'TotalSpend': [12000]
+}})
+model.predict(preprocessor.preprocess(row, remove_outliers=False, fit=False))
+total_seconds = time.perf_counter() - start
+
+print(json.dumps({{
+    'import_seconds': import_seconds,
+    'total_seconds': total_seconds,
+    'plotting': sorted(m for m in {plotting!r} if m in sys.modules)
+}}))
+"""
+
+BACKEND_SNIPPET = """
+import json, sys, time
+sys.path.insert(0, {backend_dir!r})
+start = time.perf_counter()
+import server
+from fastapi.testclient import TestClient
+import_seconds = time.perf_counter() - start
+
+client = TestClient(server.app)
+response = client.post('/api/predict_cluster', json={{
+    'age': 45, 'gender': 'Female', 'income': 85000, 'spending_score': 80,
+    'region': 'East', 'purchase_frequency': 20, 'avg_order_value': 600, 'recency': 10
+}})
+print(json.dumps({{
+    'status': response.status_code,
+    'import_seconds': import_seconds,
+    'total_seconds': time.perf_counter() - start,
+    'plotting': sorted(m for m in {plotting!r} if m in sys.modules)
+}}))
+"""
+
+
+def _run(snippet, cwd, env=None):
+    result = subprocess.run(
+        [sys.executable, '-c', snippet],
+        cwd=cwd, env=env, capture_output=True, text=True, timeout=300
+    )
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_serving_path_does_not_import_plotting():
+    pytest.importorskip('sklearn')
+    pytest.importorskip('pyarrow')
+    report = _run(SERVING_SNIPPET.format(
+        segmentation_dir=str(SEGMENTATION_DIR),
+        model_path=str(SEGMENTATION_DIR / 'model' / 'kmeans_model.pkl'),
+        preprocessor_path=str(SEGMENTATION_DIR / 'model' / 'preprocessor.pkl'),
+        plotting=PLOTTING_MODULES
+    ), cwd=str(SEGMENTATION_DIR))
+
+    print(f"serving imports: {report['import_seconds']:.3f}s, "
+          f"first prediction: {report['total_seconds']:.3f}s")
+    assert report['plotting'] == []
+
+
+def test_backend_predict_does_not_import_plotting():
+    pytest.importorskip('fastapi')
+    pytest.importorskip('httpx')
+    pytest.importorskip('motor')
+    pytest.importorskip('dotenv')
+    env = dict(os.environ, SEGMENTATION_DIR=str(SEGMENTATION_DIR))
+    report = _run(BACKEND_SNIPPET.format(
+        backend_dir=str(BACKEND_DIR),
+        plotting=PLOTTING_MODULES
+    ), cwd=str(BACKEND_DIR), env=env)
+
+    print(f"backend imports: {report['import_seconds']:.3f}s, "
+          f"first request: {report['total_seconds']:.3f}s")
+    assert report['status'] == 200
+    assert report['plotting'] == []
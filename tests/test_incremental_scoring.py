@@ -0,0 +1,64 @@
+"""
+Incremental rescoring: only new and changed customers are scored, the result
+matches a full rescore, and a model change rescores everyone.
+"""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('sklearn')
+
+SEGMENTATION_DIR = Path(__file__).resolve().parent.parent / 'customer_segmentation'
+sys.path.insert(0, str(SEGMENTATION_DIR))
+
+from src.data_preprocessing import DataPreprocessor
+from src.clustering_model import CustomerSegmentation
+from src.incremental_scoring import rescore
+
+
+@pytest.fixture(scope='module')
+def fitted():
+    df = pd.read_csv(SEGMENTATION_DIR / 'data' / 'customers.csv')
+    preprocessor = DataPreprocessor()
+    X = preprocessor.preprocess(df.drop(columns='CustomerID'), fit=True)
+    model = CustomerSegmentation(n_clusters=4, random_state=0)
+    model.train(X)
+    return df, model, preprocessor
+
+
+def test_only_new_and_changed_rows_are_rescored(fitted):
+    df, model, preprocessor = fitted
+    previous, changes, summary = rescore(df, model, preprocessor, 'v1')
+    assert summary['full_rescore'] and summary['rescored'] == len(df)
+
+    updated = df.iloc[5:].copy()
+    updated.loc[updated.index[:4], 'Recency'] += 30
+    extra = df.iloc[:3].copy()
+    extra['CustomerID'] = extra['CustomerID'].astype(str) + '-new'
+    updated = pd.concat([updated, extra], ignore_index=True)
+
+    assignments, changes, summary = rescore(updated, model, preprocessor, 'v1', previous)
+    assert not summary['full_rescore']
+    assert (summary['new'], summary['changed'], summary['removed']) == (3, 4, 5)
+    assert summary['rescored'] == 7 and summary['reused'] == len(updated) - 7
+    assert changes['Change'].value_counts().to_dict() == {'removed': 5, 'changed': 4, 'new': 3}
+
+    full, _, _ = rescore(updated, model, preprocessor, 'v1')
+    np.testing.assert_array_equal(assignments['Cluster'], full['Cluster'])
+    np.testing.assert_allclose(assignments['Distance'], full['Distance'], rtol=1e-6)
+    unchanged = assignments['CustomerID'].isin(df['CustomerID'].astype(str).iloc[9:])
+    assert (assignments.loc[unchanged, 'ScoredAt'] == previous['ScoredAt'].iloc[0]).all()
+
+
+def test_model_version_change_rescores_everything(fitted):
+    df, model, preprocessor = fitted
+    previous, _, _ = rescore(df, model, preprocessor, 'v1')
+    previous['Cluster'] = (previous['Cluster'] + 1) % 4
+    assignments, changes, summary = rescore(df, model, preprocessor, 'v2', previous)
+    assert summary['full_rescore'] and summary['rescored'] == len(df)
+    assert summary['reassigned'] == len(df)
+    assert set(changes['Change']) == {'reassigned'}
+    assert (assignments['ModelVersion'] == 'v2').all()
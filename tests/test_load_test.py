@@ -0,0 +1,49 @@
+"""
+Smoke tests for the load-test harness: a short in-process run against the
+backend with the in-memory Mongo stand-in, and the latency summary.
+"""
+import asyncio
+
+import pytest
+
+pytest.importorskip('sklearn')
+pytest.importorskip('httpx')
+
+from tests.benchmarks.load_test import _client, parse_mix, run_scenario, summarize
+
+
+def test_summary_percentiles_and_errors():
+    records = [('predict', i / 1000, 200) for i in range(1, 1001)]
+    records += [('predict', 0.5, 500), ('status_get', 0.0, 'ConnectTimeout'), ('status_get', 0.0, 'dropped')]
+    summary = summarize(records, elapsed=2.0)
+
+    predict = summary['predict']
+    assert predict['requests'] == 1001 and predict['errors'] == 1
+    assert predict['throughput_rps'] == 500
+    assert predict['p50_ms'] == pytest.approx(500, abs=1)
+    assert predict['p99.9_ms'] == pytest.approx(999, abs=1)
+    assert summary['status_get']['error_rate'] == 1.0
+    assert summary['status_get']['p50_ms'] is None
+    assert summary['all']['statuses'] == {'200': 1000, '500': 1, 'ConnectTimeout': 1, 'dropped': 1}
+
+    with pytest.raises(ValueError):
+        parse_mix('predict=1,unknown=2')
+
+
+@pytest.mark.parametrize('mode', ['closed', 'open'])
+def test_scenario_runs_offline_against_the_backend(mode):
+    mix = parse_mix('predict=2,status_post=1,status_get=1')
+
+    async def run():
+        async with _client() as client:
+            result = await run_scenario(client, mix, mode=mode, concurrency=4, rate=40, duration=0.5)
+            stored = (await client.get('/api/status')).json()
+        return result, stored
+
+    result, stored = asyncio.run(run())
+    endpoints = result['endpoints']
+    assert endpoints['all']['requests'] > 0
+    assert endpoints['all']['errors'] == 0
+    assert set(endpoints) == {'all', 'predict', 'status_post', 'status_get'}
+    # Warm-up plus timed status posts all landed in the stand-in
+    assert len(stored) == endpoints['status_post']['requests'] + 1
@@ -0,0 +1,75 @@
+"""
+ModelStore: byte-bounded LRU residency, coalesced cold loads and reloads
+when a model's files change.
+"""
+import os
+import shutil
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip('sklearn')
+
+SEGMENTATION_DIR = Path(__file__).resolve().parent.parent / 'customer_segmentation'
+sys.path.insert(0, str(SEGMENTATION_DIR))
+
+from src.model_store import MODEL_FILE, PREPROCESSOR_FILE, ModelStore
+
+
+@pytest.fixture
+def store_dir(tmp_path):
+    for model_id in ('brand_a', 'brand_b'):
+        os.makedirs(tmp_path / model_id)
+        for name in (MODEL_FILE, PREPROCESSOR_FILE):
+            shutil.copy(SEGMENTATION_DIR / 'model' / name, tmp_path / model_id / name)
+    return tmp_path
+
+
+def test_lru_stays_within_byte_budget(store_dir):
+    one_model = sum(os.path.getsize(store_dir / 'brand_a' / name) for name in (MODEL_FILE, PREPROCESSOR_FILE))
+    store = ModelStore(str(store_dir), max_bytes=one_model)
+    assert store.list_models() == ['brand_a', 'brand_b']
+
+    store.get('brand_a')
+    store.get('brand_b')
+    stats = store.stats()
+    assert stats['resident_models'] == ['brand_b']
+    assert stats['resident_bytes'] <= one_model
+    assert stats['models']['brand_a']['evictions'] == 1
+
+    with pytest.raises(KeyError):
+        store.get('../brand_a')
+    with pytest.raises(KeyError):
+        store.get('missing')
+
+
+def test_concurrent_cold_loads_are_coalesced(store_dir):
+    store = ModelStore(str(store_dir))
+    load = store._load
+
+    def slow_load(*args):
+        time.sleep(0.2)
+        return load(*args)
+
+    store._load = slow_load
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(store.get('brand_a'))) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = store.stats()['models']['brand_a']
+    assert len({id(entry) for entry in results}) == 1
+    assert stats['loads'] == 1 and stats['coalesced'] == 5
+    assert stats['last_load_ms'] >= 200
+
+    # A retrain replacing the files triggers one reload
+    first = results[0]
+    os.utime(store_dir / 'brand_a' / MODEL_FILE, ns=(0, 0))
+    assert store.get('brand_a') is not first
+    assert store.get('brand_a') is store.get('brand_a')
+    assert store.stats()['models']['brand_a']['loads'] == 2
@@ -0,0 +1,102 @@
+"""
+Drift monitor: same-distribution traffic stays stable, a shifted column is
+flagged, merged per-worker monitors equal one monitor over every row, and
+rows without a distance do not dilute the per-cluster mean distance.
+"""
+import pickle
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'customer_segmentation'))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'customer_segmentation' / 'data'))
+
+from generate_data import generate_customer_data
+from src.monitoring import DriftMonitor, build_reference, ks_binned, psi
+
+COLUMNS = ['Age', 'Gender', 'Income', 'SpendingScore', 'Region', 'Recency']
+N_CLUSTERS = 3
+
+
+def _assignments(df, seed):
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, N_CLUSTERS, len(df)), rng.gamma(2.0, 1.0, len(df))
+
+
+@pytest.fixture(scope='module')
+def reference():
+    train = generate_customer_data(20_000, seed=1)
+    labels, distances = _assignments(train, 1)
+    return build_reference(train, labels, distances, COLUMNS, {'Gender', 'Region'}, N_CLUSTERS)
+
+
+def test_psi_and_ks_on_counts():
+    assert psi([10, 20, 30], [20, 40, 60]) == pytest.approx(0.0)
+    assert ks_binned([10, 20, 30], [20, 40, 60]) == pytest.approx(0.0)
+    assert psi([10, 20, 30], [30, 20, 10]) > 0.25
+    assert ks_binned([1, 0], [0, 1]) == pytest.approx(1.0)
+    assert psi([1, 2], [0, 0]) is None
+
+
+def test_same_distribution_is_stable_and_shift_alerts(reference):
+    current = generate_customer_data(20_000, seed=2)
+    labels, distances = _assignments(current, 2)
+    monitor = DriftMonitor(reference)
+    monitor.update_batch(current, labels, distances)
+    report = monitor.report()
+    assert report['n'] == len(current)
+    assert report['status'] == 'stable'
+    assert all(entry['psi'] < 0.02 for entry in report['features'].values())
+    assert report['clusters']['psi'] < 0.02 and report['distance']['psi'] < 0.02
+
+    shifted = current.assign(Income=current['Income'] * 1.5)
+    monitor = DriftMonitor(reference)
+    monitor.update_batch(shifted, labels, distances)
+    report = monitor.report()
+    assert report['status'] == 'significant'
+    assert report['features']['Income']['status'] == 'significant'
+    assert report['features']['Income']['ks'] > 0.2
+    assert report['features']['Age']['status'] == 'stable'
+
+
+def test_merged_halves_equal_one_monitor(reference):
+    current = generate_customer_data(10_001, seed=3)
+    labels, distances = _assignments(current, 3)
+    whole = DriftMonitor(reference)
+    whole.update_batch(current, labels, distances)
+
+    # As bulk scoring does: each worker sketches its part, pickled back
+    half = len(current) // 2
+    first, second = DriftMonitor(reference), DriftMonitor(reference)
+    first.update_batch(current.iloc[:half], labels[:half], distances[:half])
+    for record, label, distance in zip(current.iloc[half:].to_dict('records'), labels[half:], distances[half:]):
+        second.update(record, cluster=int(label), distance=float(distance))
+    merged = DriftMonitor(reference).merge(pickle.loads(pickle.dumps(first))).merge(second)
+
+    assert merged.n == whole.n
+    assert merged.feature_counts == whole.feature_counts
+    assert merged.cluster_counts == whole.cluster_counts
+    assert merged.distance_counts == whole.distance_counts
+    assert merged.distance_cluster_counts == whole.distance_cluster_counts
+    assert np.allclose(merged.distance_sums, whole.distance_sums)
+    merged_report, whole_report = merged.report(), whole.report()
+    assert merged_report['features'] == whole_report['features']
+
+
+def test_labels_without_distances_leave_cluster_mean_distance_alone(reference):
+    current = generate_customer_data(2_000, seed=4)
+    labels, distances = _assignments(current, 4)
+    monitor = DriftMonitor(reference)
+    monitor.update_batch(current, labels, distances)
+    expected = monitor.report()['clusters']['frequencies']
+
+    # More traffic with labels only, in a batch and one record at a time
+    monitor.update_batch(current, labels)
+    monitor.update(current.iloc[0].to_dict(), cluster=int(labels[0]))
+    frequencies = monitor.report()['clusters']['frequencies']
+    for c in range(N_CLUSTERS):
+        assert frequencies[str(c)]['current_mean_distance'] == pytest.approx(
+            expected[str(c)]['current_mean_distance'])
+        assert frequencies[str(c)]['current_mean_distance'] == pytest.approx(distances[labels == c].mean())
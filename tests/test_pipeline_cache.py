@@ -0,0 +1,99 @@
+"""
+Training pipeline stage cache: a second run reuses cached stages, a changed
+parameter re-runs only the stages downstream of it, and input hashes are
+remembered per (path, size, mtime). Also trains on input without derived
+columns and checks the exported baseline against incremental rescoring.
+"""
+import hashlib
+import json
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip('sklearn')
+
+SEGMENTATION_DIR = Path(__file__).resolve().parent.parent / 'customer_segmentation'
+sys.path.insert(0, str(SEGMENTATION_DIR))
+sys.path.insert(0, str(SEGMENTATION_DIR / 'data'))
+
+import joblib
+import pandas as pd
+
+from generate_data import generate_customer_data
+from src.clustering_model import CustomerSegmentation
+from src.incremental_scoring import model_version, read_assignments, rescore
+from src.pipeline import StageCache, TrainingPipeline
+
+
+@pytest.fixture
+def config(tmp_path):
+    path = tmp_path / 'customers.csv'
+    generate_customer_data(600, n_segments=3, seed=5).to_csv(path, index=False)
+    return {'input': str(path), 'cache_dir': str(tmp_path / 'cache'), 'model_dir': str(tmp_path / 'model'),
+            'data_dir': str(tmp_path / 'data'), 'n_clusters': 3}
+
+
+def _run(config, until='train'):
+    pipeline = TrainingPipeline(config)
+    pipeline.run(until=until)
+    return {stage: status for stage, status, _ in pipeline.timings}
+
+
+def test_rerun_reuses_stages_and_parameter_change_invalidates_downstream(config):
+    first = _run(config)
+    assert first == {stage: 'ran' for stage in ('load', 'preprocess', 'coreset', 'sweep', 'train')}
+
+    # Only the leaf is looked up; fresh upstream results are never loaded
+    assert _run(config) == {'train': 'cached'}
+
+    changed = _run(dict(config, n_clusters=4))
+    assert changed == {'preprocess': 'cached', 'sweep': 'ran', 'coreset': 'cached', 'train': 'ran'}
+
+    # Stages after train reuse the cached train result
+    assert _run(dict(config, n_clusters=4), until='assign') == {
+        'load': 'cached', 'preprocess': 'cached', 'train': 'cached', 'assign': 'ran'}
+
+    # New input data invalidates everything
+    generate_customer_data(600, n_segments=3, seed=6).to_csv(config['input'], index=False)
+    assert set(_run(config).values()) == {'ran'}
+
+
+def test_file_hash_is_remembered_by_path_size_and_mtime(config):
+    cache = StageCache(config['cache_dir'])
+    path = config['input']
+    with open(path, 'rb') as f:
+        expected = hashlib.sha256(f.read()).hexdigest()
+    assert cache.file_hash(path) == expected
+
+    # Persisted across instances, and trusted while size and mtime match
+    index_path = os.path.join(config['cache_dir'], 'file_hashes.json')
+    with open(index_path) as f:
+        index = json.load(f)
+    index[os.path.abspath(path)]['sha256'] = 'remembered'
+    with open(index_path, 'w') as f:
+        json.dump(index, f)
+    assert StageCache(config['cache_dir']).file_hash(path) == 'remembered'
+
+    # A new mtime means the file is read again
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert StageCache(config['cache_dir']).file_hash(path) == expected
+
+
+def test_training_without_derived_columns_exports_a_reusable_baseline(config):
+    raw = pd.read_csv(config['input']).drop(columns='TotalSpend')
+    raw.to_csv(config['input'], index=False)
+    outputs = TrainingPipeline(config).run()['export']['outputs']
+
+    clustered = pd.read_parquet(outputs['clustered_parquet'])
+    assert (clustered['TotalSpend'] == clustered['PurchaseFrequency'] * clustered['AvgOrderValue']).all()
+
+    model = CustomerSegmentation.load_model(outputs['model'])
+    preprocessor = joblib.load(outputs['preprocessor'])
+    version = model_version(outputs['model'], outputs['preprocessor'])
+    previous = read_assignments(outputs['assignments'])
+    for _ in range(2):
+        previous, _, summary = rescore(raw, model, preprocessor, version, previous)
+        assert summary['reused'] == len(raw) and summary['rescored'] == 0
@@ -0,0 +1,59 @@
+"""
+Low-memory preprocessing: with missing values and outlier removal it must
+keep the same rows, fit the same artifacts and produce the same features
+as preprocess.
+"""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+pytest.importorskip('sklearn')
+
+SEGMENTATION_DIR = Path(__file__).resolve().parent.parent / 'customer_segmentation'
+sys.path.insert(0, str(SEGMENTATION_DIR))
+sys.path.insert(0, str(SEGMENTATION_DIR / 'data'))
+
+from generate_data import generate_customer_data
+from src.data_preprocessing import DataPreprocessor
+
+
+@pytest.fixture(scope='module')
+def raw():
+    df = generate_customer_data(5_000, n_segments=4, seed=11, missing_rate=0.05).drop(columns='CustomerID')
+    rng = np.random.default_rng(11)
+    df['Region'] = df['Region'].astype(object)
+    df.loc[rng.random(len(df)) < 0.03, 'Region'] = np.nan
+    # A few extreme rows so outlier removal has something to drop
+    df.loc[df.sample(25, random_state=11).index, 'Income'] *= 12
+    return df
+
+
+def test_low_memory_matches_preprocess_with_outliers_and_missing_values(raw):
+    assert raw.isna().any().sum() >= 3
+
+    reference = DataPreprocessor()
+    expected = reference.preprocess(raw, remove_outliers=True, fit=True)
+    low_memory = DataPreprocessor()
+    X, index = low_memory.preprocess_low_memory(raw, remove_outliers=True, fit=True, chunk_rows=700)
+
+    assert len(index) < len(raw)
+    assert list(index) == list(expected.index)
+    assert low_memory.feature_columns == reference.feature_columns == list(expected.columns)
+    assert X.dtype == np.float32 and X.flags['C_CONTIGUOUS']
+    assert np.allclose(X, expected.to_numpy(), atol=1e-4)
+
+    assert set(low_memory.imputers) == set(reference.imputers)
+    for col, imputer in reference.imputers.items():
+        assert low_memory.imputers[col].statistics_[0] == imputer.statistics_[0]
+    for col, encoder in reference.label_encoders.items():
+        assert list(low_memory.label_encoders[col].classes_) == list(encoder.classes_)
+    assert np.allclose(low_memory.scaler.mean_, reference.scaler.mean_, rtol=1e-5)
+    assert np.allclose(low_memory.scaler.scale_, reference.scaler.scale_, rtol=1e-5)
+
+    # Either fitted preprocessor transforms new data the same way
+    fresh = generate_customer_data(500, n_segments=4, seed=12, missing_rate=0.05).drop(columns='CustomerID')
+    X_new, _ = low_memory.preprocess_low_memory(fresh, remove_outliers=True, fit=False)
+    assert len(X_new) == len(fresh)
+    assert np.allclose(X_new, reference.preprocess(fresh, remove_outliers=True, fit=False).to_numpy(), atol=1e-4)
@@ -0,0 +1,72 @@
+"""
+Profiler: spans nest per thread, concurrent threads do not corrupt each
+other's nesting, and the saved file is a valid Chrome trace.
+"""
+import json
+import sys
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'customer_segmentation'))
+
+from src import profiling
+from src.profiling import Profiler
+
+
+def _contains(outer, inner):
+    return outer['ts'] <= inner['ts'] and inner['ts'] + inner['dur'] <= outer['ts'] + outer['dur'] + 0.2
+
+
+def test_nested_spans_and_trace_file(tmp_path):
+    assert profiling.span('off') is profiling._NOOP
+    with Profiler() as profiler:
+        assert profiling.is_enabled()
+        with profiling.span('pipeline.run', rows=10) as outer:
+            with profiling.span('pipeline.step') as inner:
+                inner.set(rows=4)
+                data = [0] * 200_000
+            del data
+    assert not profiling.is_enabled()
+
+    events = {event['name']: event for event in profiler.events}
+    assert set(events) == {'pipeline.run', 'pipeline.step'}
+    assert _contains(events['pipeline.run'], events['pipeline.step'])
+    assert events['pipeline.step']['args']['rows'] == 4
+    assert events['pipeline.step']['args']['peak_alloc_mb'] > 1
+    # A child's peak counts towards its parent's
+    assert events['pipeline.run']['args']['peak_alloc_mb'] >= events['pipeline.step']['args']['peak_alloc_mb']
+    assert profiler.summary()['pipeline.run']['rows'] == 10
+
+    with open(profiler.save(str(tmp_path / 'trace.json'))) as f:
+        trace = json.load(f)
+    assert [event['name'] for event in trace['traceEvents']] == ['pipeline.run', 'pipeline.step']
+    assert all(event['ph'] == 'X' and event['cat'] == 'pipeline' for event in trace['traceEvents'])
+
+
+def test_threads_keep_their_own_span_stacks():
+    barrier = threading.Barrier(4)
+    depths = []
+
+    def work(i):
+        with profiling.span(f"worker.outer{i}"):
+            barrier.wait()
+            with profiling.span(f"worker.inner{i}"):
+                barrier.wait()
+                depths.append([s.name for s in profiler._stack()])
+
+    with Profiler(trace_memory=False) as profiler:
+        threads = [threading.Thread(target=work, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    # Each thread only ever sees its own open spans
+    assert sorted(depths) == [[f"worker.outer{i}", f"worker.inner{i}"] for i in range(4)]
+    events = {event['name']: event for event in profiler.events}
+    assert len(events) == 8
+    for i in range(4):
+        outer, inner = events[f"worker.outer{i}"], events[f"worker.inner{i}"]
+        assert outer['tid'] == inner['tid']
+        assert _contains(outer, inner)
+    assert len({events[f"worker.outer{i}"]['tid'] for i in range(4)}) == 4
@@ -0,0 +1,54 @@
+"""
+Bootstrap stability: replicate labels are aligned to the reference model,
+results are deterministic across worker counts and cached replicates are
+reused when a run is extended.
+"""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+pytest.importorskip('sklearn')
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'customer_segmentation'))
+
+from src.clustering_model import CustomerSegmentation
+from src.stability import align_labels
+
+
+def _blobs(n=1_500, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = np.array([[0, 0], [10, 0], [0, 10]])
+    return centers[rng.integers(0, len(centers), n)] + rng.normal(size=(n, 2))
+
+
+def test_align_labels_undoes_a_permutation():
+    reference = np.array([0, 0, 1, 1, 2, 2, 2])
+    np.testing.assert_array_equal(align_labels(reference, (reference + 1) % 3, 3), reference)
+
+
+def test_separated_clusters_are_stable_and_replicates_are_cached(tmp_path):
+    X = _blobs()
+    segmentation = CustomerSegmentation(n_clusters=3, random_state=0)
+    segmentation.train(X)
+    options = {'cache_dir': str(tmp_path), 'n_init': 2, 'log': lambda line: None}
+
+    parallel = segmentation.stability_analysis(X, 6, workers=2, **options)
+    assert parallel['replicates'] == 6 and parallel['replicates_cached'] == 0
+    assert len(parallel['confidence']) == len(X)
+    assert ((parallel['confidence'] >= 0) & (parallel['confidence'] <= 1)).all()
+    assert all(stats['status'] == 'stable' and stats['jaccard_mean'] > 0.95
+               for stats in parallel['clusters'].values())
+    assert parallel['ari']['mean'] > 0.95
+
+    extended = segmentation.stability_analysis(X, 8, workers=1, **options)
+    assert extended['replicates'] == 8 and extended['replicates_cached'] == 6
+
+    # Fresh serial fits of the same replicates give the same answer
+    serial = segmentation.stability_analysis(X, 8, workers=1, **dict(options, cache_dir=None))
+    assert serial['ari'] == pytest.approx(extended['ari'])
+    np.testing.assert_allclose(serial['confidence'], extended['confidence'])
+
+    budgeted = segmentation.stability_analysis(X, 50, time_budget=0, **options)
+    assert budgeted['replicates'] == 8 and budgeted['budget_exhausted']
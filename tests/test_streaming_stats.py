@@ -0,0 +1,53 @@
+"""
+StreamingStats must agree with pandas' describe() and corr() whether the
+rows arrive in one frame, in chunks or as merged partial results.
+"""
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'customer_segmentation'))
+
+from src.utils import StreamingStats
+
+
+def _frame(n=20_000, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'Age': rng.integers(18, 80, n).astype(float),
+        'Income': rng.normal(60_000, 15_000, n),
+        'Spend': rng.normal(1e6, 1e3, n),
+        'Region': rng.choice(['North', 'South', None], n),
+    })
+    df.loc[rng.random(n) < 0.1, 'Age'] = np.nan
+    df.loc[rng.random(n) < 0.2, 'Income'] = np.nan
+    return df
+
+
+def test_chunked_and_merged_statistics_match_pandas():
+    df = _frame()
+    parts = [StreamingStats.from_frame(df.iloc[i:i + 6_000], chunk_rows=2_500)
+             for i in range(0, len(df), 6_000)]
+    merged = StreamingStats()
+    for part in parts:
+        merged.merge(part)
+    merged = StreamingStats.from_dict(json.loads(json.dumps(merged.to_dict())))
+
+    expected = df.describe()
+    summary = merged.describe()
+    assert list(summary.index) == list(expected.index)
+    moments = ['count', 'mean', 'std', 'min', 'max']
+    np.testing.assert_allclose(summary.loc[moments], expected.loc[moments], rtol=1e-9)
+    np.testing.assert_allclose(merged.corr(), df.select_dtypes('number').corr(), atol=1e-12)
+    assert merged.missing_values == int(df.isna().sum().sum())
+
+    # Few distinct values: exact; continuous columns: within the sketch's rank error
+    np.testing.assert_allclose(summary['Age'], expected['Age'], rtol=1e-12)
+    for column in ['Income', 'Spend']:
+        values = df[column].dropna().sort_values().to_numpy()
+        for q in (0.25, 0.5, 0.75):
+            rank = np.searchsorted(values, summary.at[f"{q * 100:g}%", column]) / len(values)
+            assert abs(rank - q) < 2 / merged.sketch_size